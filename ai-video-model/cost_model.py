@@ -0,0 +1,160 @@
+"""
+Job cost model for the video worker
+Predicts GPU seconds from resolution, frame count, steps and LoRA count
+"""
+
+import os
+import json
+import threading
+import logging
+from typing import Optional, Dict, Any, List
+
+logger = logging.getLogger(__name__)
+
+# Work is measured in giga pixel-frame-steps to keep coefficients readable
+WORK_UNIT = 1e9
+
+# Rough prior used until enough jobs have been recorded (480x832, 81 frames, 10 steps ~ 180s)
+DEFAULT_COEFFICIENTS = [30.0, 460.0, 25.0]
+
+
+def job_work(width: int, height: int, length: int, steps: int) -> float:
+    """Pixels x frames x steps, in WORK_UNITs"""
+    return float(width) * float(height) * float(length) * float(steps) / WORK_UNIT
+
+
+class CostModel:
+    """
+    Linear cost model: seconds = a + b * work + c * work * lora_count
+
+    Samples are appended to a JSONL file so the model survives worker restarts
+    (point COST_MODEL_PATH at the network volume to share it between workers).
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        coefficients: Optional[List[float]] = None,
+        min_samples: int = 5,
+        max_samples: int = 2000
+    ):
+        """
+        Initialize cost model
+
+        Args:
+            path: JSONL file with recorded samples (None = in-memory only)
+            coefficients: Starting coefficients [a, b, c]
+            min_samples: Samples required before the fitted model replaces the prior
+            max_samples: Most recent samples kept for fitting
+        """
+        self.path = path
+        self.coefficients = list(coefficients or DEFAULT_COEFFICIENTS)
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.samples: List[Dict[str, float]] = []
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load()
+
+    @staticmethod
+    def features(width: int, height: int, length: int, steps: int, lora_count: int = 0) -> List[float]:
+        work = job_work(width, height, length, steps)
+        return [1.0, work, work * lora_count]
+
+    def predict(self, width: int, height: int, length: int, steps: int, lora_count: int = 0) -> float:
+        """
+        Predict GPU seconds for a job
+
+        Returns:
+            Estimated seconds (never below the fitted intercept floor of 1s)
+        """
+        x = self.features(width, height, length, steps, lora_count)
+        return max(1.0, sum(c * v for c, v in zip(self.coefficients, x)))
+
+    def record(self, width: int, height: int, length: int, steps: int, lora_count: int, seconds: float):
+        """Store an observed job duration and refit the model"""
+        sample = {
+            "width": width, "height": height, "length": length,
+            "steps": steps, "lora_count": lora_count, "seconds": round(float(seconds), 3),
+        }
+        with self._lock:
+            self.samples.append(sample)
+            self.samples = self.samples[-self.max_samples:]
+            if self.path:
+                try:
+                    os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                    with open(self.path, 'a') as f:
+                        f.write(json.dumps(sample) + "\n")
+                except OSError as e:
+                    logger.warning(f"⚠️ Could not persist cost sample: {e}")
+            self._fit()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"coefficients": self.coefficients, "samples": len(self.samples), "work_unit": WORK_UNIT}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CostModel":
+        return cls(coefficients=data.get("coefficients"))
+
+    @staticmethod
+    def group_by_cost(jobs: List[Dict[str, Any]], ratio: float = 1.5) -> List[List[Dict[str, Any]]]:
+        """
+        Group jobs whose estimated cost is within `ratio` of each other
+
+        Args:
+            jobs: Job dicts carrying an "estimated_seconds" key
+            ratio: Max ratio between the most and least expensive job in a group
+
+        Returns:
+            List of groups, cheapest first
+        """
+        groups: List[List[Dict[str, Any]]] = []
+        for job in sorted(jobs, key=lambda j: j["estimated_seconds"]):
+            if groups and job["estimated_seconds"] <= groups[-1][0]["estimated_seconds"] * ratio:
+                groups[-1].append(job)
+            else:
+                groups.append([job])
+        return groups
+
+    def _load(self):
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    self.samples.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        self.samples = self.samples[-self.max_samples:]
+        self._fit()
+        logger.info(f"📈 Cost model loaded {len(self.samples)} samples: {self.coefficients}")
+
+    def _fit(self):
+        """Least squares via the normal equations (3x3, small ridge term for stability)"""
+        if len(self.samples) < self.min_samples:
+            return
+        n = 3
+        xtx = [[0.0] * n for _ in range(n)]
+        xty = [0.0] * n
+        for s in self.samples:
+            x = self.features(s["width"], s["height"], s["length"], s["steps"], s.get("lora_count", 0))
+            for i in range(n):
+                xty[i] += x[i] * s["seconds"]
+                for j in range(n):
+                    xtx[i][j] += x[i] * x[j]
+        for i in range(n):
+            xtx[i][i] += 1e-6
+
+        # Gaussian elimination with partial pivoting
+        m = [row[:] + [xty[i]] for i, row in enumerate(xtx)]
+        for col in range(n):
+            pivot = max(range(col, n), key=lambda r: abs(m[r][col]))
+            if abs(m[pivot][col]) < 1e-12:
+                return
+            m[col], m[pivot] = m[pivot], m[col]
+            for r in range(col + 1, n):
+                factor = m[r][col] / m[col][col]
+                for c in range(col, n + 1):
+                    m[r][c] -= factor * m[col][c]
+        coef = [0.0] * n
+        for i in reversed(range(n)):
+            coef[i] = (m[i][n] - sum(m[i][j] * coef[j] for j in range(i + 1, n))) / m[i][i]
+        self.coefficients = coef
@@ -3,56 +3,91 @@
 # Exit immediately if a command exits with a non-zero status.
 set -e
 
-# Start ComfyUI in the background with output logging
-echo "Starting ComfyUI in the background..."
+# One ComfyUI instance per GPU, on consecutive ports starting at 8188.
+# Override the instance count with COMFY_INSTANCES (defaults to the number of visible GPUs).
+if [ -z "$COMFY_INSTANCES" ]; then
+    COMFY_INSTANCES=$(nvidia-smi -L 2>/dev/null | wc -l)
+fi
+if [ -z "$COMFY_INSTANCES" ] || [ "$COMFY_INSTANCES" -lt 1 ]; then
+    COMFY_INSTANCES=1
+fi
+BASE_PORT=8188
+
+# Start ComfyUI instances in the background with output logging
+COMFYUI_PIDS=()
+COMFY_PORTS=""
 cd /ComfyUI
-python main.py --listen > /tmp/comfyui.log 2>&1 &
-COMFYUI_PID=$!
+for ((i = 0; i < COMFY_INSTANCES; i++)); do
+    port=$((BASE_PORT + i))
+    if [ "$COMFY_INSTANCES" -eq 1 ]; then
+        echo "Starting ComfyUI in the background..."
+        python main.py --listen --port $port > /tmp/comfyui.log 2>&1 &
+    else
+        echo "Starting ComfyUI on GPU $i (port $port) in the background..."
+        mkdir -p /ComfyUI/output/gpu$i
+        CUDA_VISIBLE_DEVICES=$i python main.py --listen --port $port \
+            --output-directory /ComfyUI/output/gpu$i > /tmp/comfyui_$i.log 2>&1 &
+    fi
+    COMFYUI_PIDS+=($!)
+    COMFY_PORTS="${COMFY_PORTS:+$COMFY_PORTS,}$port"
+done
+export COMFY_PORTS
 
-# Function to check if ComfyUI process is still running
+log_file_for() {
+    if [ "$COMFY_INSTANCES" -eq 1 ]; then
+        echo /tmp/comfyui.log
+    else
+        echo /tmp/comfyui_$1.log
+    fi
+}
+
+# Function to check if a ComfyUI process is still running
 check_comfyui_process() {
-    if ! kill -0 $COMFYUI_PID 2>/dev/null; then
-        echo "ERROR: ComfyUI process died!"
+    if ! kill -0 ${COMFYUI_PIDS[$1]} 2>/dev/null; then
+        echo "ERROR: ComfyUI process $1 died!"
         echo "Last 50 lines of ComfyUI log:"
-        tail -50 /tmp/comfyui.log || true
+        tail -50 $(log_file_for $1) || true
         return 1
     fi
     return 0
 }
 
-# Wait for ComfyUI to be ready
-echo "Waiting for ComfyUI to be ready..."
-max_wait=300  # Increased to 5 minutes (models may need to load from network volume)
-wait_count=0
-while [ $wait_count -lt $max_wait ]; do
-    # Check if process is still running
-    if ! check_comfyui_process; then
+# Wait for every ComfyUI instance to be ready
+for ((i = 0; i < COMFY_INSTANCES; i++)); do
+    port=$((BASE_PORT + i))
+    echo "Waiting for ComfyUI instance $i (port $port) to be ready..."
+    max_wait=300  # Increased to 5 minutes (models may need to load from network volume)
+    wait_count=0
+    while [ $wait_count -lt $max_wait ]; do
+        # Check if process is still running
+        if ! check_comfyui_process $i; then
+            exit 1
+        fi
+
+        # Check if HTTP endpoint is responding
+        if curl -s http://127.0.0.1:$port/ > /dev/null 2>&1; then
+            # Give ComfyUI a few more seconds to load all custom nodes
+            echo "ComfyUI HTTP endpoint is up, waiting for custom nodes to load..."
+            sleep 5
+            echo "ComfyUI instance $i is ready!"
+            break
+        fi
+        echo "Waiting for ComfyUI... ($wait_count/$max_wait)"
+        sleep 2
+        wait_count=$((wait_count + 2))
+    done
+
+    if [ $wait_count -ge $max_wait ]; then
+        echo "Error: ComfyUI instance $i failed to start within $max_wait seconds"
+        echo "ComfyUI process status:"
+        ps aux | grep -i comfy || echo "ComfyUI process not found"
+        echo ""
+        echo "Last 100 lines of ComfyUI log:"
+        tail -100 $(log_file_for $i) || true
         exit 1
     fi
-    
-    # Check if HTTP endpoint is responding
-    if curl -s http://127.0.0.1:8188/ > /dev/null 2>&1; then
-        # Give ComfyUI a few more seconds to load all custom nodes
-        echo "ComfyUI HTTP endpoint is up, waiting for custom nodes to load..."
-        sleep 5
-        echo "ComfyUI is ready!"
-        break
-    fi
-    echo "Waiting for ComfyUI... ($wait_count/$max_wait)"
-    sleep 2
-    wait_count=$((wait_count + 2))
 done
 
-if [ $wait_count -ge $max_wait ]; then
-    echo "Error: ComfyUI failed to start within $max_wait seconds"
-    echo "ComfyUI process status:"
-    ps aux | grep -i comfy || echo "ComfyUI process not found"
-    echo ""
-    echo "Last 100 lines of ComfyUI log:"
-    tail -100 /tmp/comfyui.log || true
-    exit 1
-fi
-
 # Start the handler in the foreground
-echo "Starting the handler..."
-exec python /handler.py
\ No newline at end of file
+echo "Starting the handler (ComfyUI ports: $COMFY_PORTS)..."
+exec python /handler.py
@@ -11,6 +11,7 @@ import time
 import base64
 from typing import Optional, Dict, Any, List, Union
 import logging
+from cost_model import CostModel
 
 # Logging configuration
 logging.basicConfig(level=logging.INFO)
@@ -41,6 +42,9 @@ class GenerateVideoClient:
             'Content-Type': 'application/json'
         })
         
+        # Cost model, refreshed from the coefficients the worker returns with each job
+        self.cost_model = CostModel()
+        
         logger.info(f"GenerateVideoClient initialized - Endpoint: {runpod_endpoint_id}")
     
     def encode_file_to_base64(self, file_path: str) -> Optional[str]:
@@ -69,6 +73,65 @@ class GenerateVideoClient:
             logger.error(f"❌ File base64 encoding failed: {e}")
             return None
     
+    def estimate_seconds(
+        self,
+        width: int = 480,
+        height: int = 832,
+        length: int = 81,
+        steps: int = 10,
+        lora_pairs: Optional[List[Dict[str, Any]]] = None
+    ) -> float:
+        """
+        Estimate GPU seconds for a job using the current cost model
+        
+        Args:
+            width: Output width
+            height: Output height
+            length: Number of frames
+            steps: Number of steps
+            lora_pairs: LoRA settings list
+        
+        Returns:
+            Estimated GPU seconds
+        """
+        # The worker rounds dimensions to multiples of 16
+        width = max(16, int(round(width / 16.0) * 16))
+        height = max(16, int(round(height / 16.0) * 16))
+        return self.cost_model.predict(width, height, length, steps, min(len(lora_pairs or []), 4))
+    
+    def poll_schedule(self, estimated_seconds: float) -> Dict[str, int]:
+        """
+        Pick a status poll interval and wait deadline for an estimated job time
+        
+        Args:
+            estimated_seconds: Estimated GPU seconds
+        
+        Returns:
+            Dictionary with check_interval and max_wait_time (seconds)
+        """
+        return {
+            "check_interval": int(min(30, max(2, estimated_seconds / 10))),
+            "max_wait_time": int(max(1800, estimated_seconds * 3 + 300)),
+        }
+    
+    def plan_batches(self, jobs: List[Dict[str, Any]], ratio: float = 1.5) -> List[List[Dict[str, Any]]]:
+        """
+        Group job inputs with similar estimated cost so they can be submitted together
+        
+        Args:
+            jobs: API input dictionaries (width, height, length, steps, lora_pairs)
+            ratio: Max cost ratio within a group
+        
+        Returns:
+            List of groups (cheapest first); each job gains an "estimated_seconds" key
+        """
+        for job in jobs:
+            job["estimated_seconds"] = self.estimate_seconds(
+                job.get("width", 480), job.get("height", 832), job.get("length", 81),
+                job.get("steps", 10), job.get("lora_pairs")
+            )
+        return CostModel.group_by_cost(jobs, ratio)
+    
     def submit_job(self, input_data: Dict[str, Any]) -> Optional[str]:
         """
         Submit job to RunPod
@@ -128,6 +191,9 @@ class GenerateVideoClient:
                 
                 if status == 'COMPLETED':
                     logger.info("✅ Job completed!")
+                    output = status_data.get('output') or {}
+                    if isinstance(output, dict) and output.get('cost_model'):
+                        self.cost_model = CostModel.from_dict(output['cost_model'])
                     return {
                         'status': 'COMPLETED',
                         'output': status_data.get('output'),
@@ -213,7 +279,8 @@ class GenerateVideoClient:
         seed: int = 42,
         cfg: float = 2.0,
         context_overlap: int = 48,
-        lora_pairs: Optional[List[Dict[str, Any]]] = None
+        lora_pairs: Optional[List[Dict[str, Any]]] = None,
+        deadline_seconds: Optional[float] = None
     ) -> Dict[str, Any]:
         """
         Generate video from image
@@ -230,6 +297,7 @@ class GenerateVideoClient:
             cfg: CFG scale
             context_overlap: Context overlap
             lora_pairs: LoRA settings list (max 4)
+            deadline_seconds: Reject the job on the worker if its estimated time exceeds this
         
         Returns:
             Job result dictionary
@@ -270,13 +338,20 @@ class GenerateVideoClient:
         # Add negative_prompt if provided
         if negative_prompt:
             input_data["negative_prompt"] = negative_prompt
+        if deadline_seconds is not None:
+            input_data["deadline_seconds"] = deadline_seconds
+        
+        # Poll interval and timeout follow the estimated job cost
+        estimated_seconds = self.estimate_seconds(width, height, length, steps, lora_pairs)
+        schedule = self.poll_schedule(estimated_seconds)
+        logger.info(f"⏱️ Estimated GPU time: {estimated_seconds:.0f}s, polling every {schedule['check_interval']}s")
         
         # Submit job and wait
         job_id = self.submit_job(input_data)
         if not job_id:
             return {"error": "Job submission failed"}
         
-        result = self.wait_for_completion(job_id)
+        result = self.wait_for_completion(job_id, **schedule)
         return result
     
     def batch_process_images(
@@ -11,15 +11,40 @@ import urllib.parse
 import binascii # Import for Base64 error handling
 import subprocess
 import time
-import requests
 import glob
+import shutil
+import hashlib
+import threading
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from storage import get_storage_backend
+from cost_model import CostModel
 # Logging configuration
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 server_address = os.getenv('SERVER_ADDRESS', '127.0.0.1')
-client_id = str(uuid.uuid4())
+# One ComfyUI instance per GPU, each on its own port (set by entrypoint.sh)
+comfy_ports = [int(p) for p in os.getenv('COMFY_PORTS', '8188').split(',') if p.strip()]
+
+# Base64 inputs are decoded directly into ComfyUI's input directory, 1 MiB of text at a time
+COMFY_INPUT_DIR = os.getenv('COMFY_INPUT_DIR', '/ComfyUI/input')
+BASE64_CHUNK_SIZE = 1024 * 1024  # must be a multiple of 4
+
+# Post-processing defaults (used when a job sets "postprocess": true)
+DEFAULT_POSTPROCESS = {"faststart": True, "renditions": [], "poster": False}
+UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', '4'))
+
+# Storage backend selected by STORAGE_BACKEND (bunny, s3, local)
+storage = get_storage_backend()
+
+# GPU-seconds cost model, persisted on the network volume when available
+cost_model = CostModel(path=os.getenv(
+    'COST_MODEL_PATH',
+    '/runpod-volume/cost_model/samples.jsonl' if os.path.isdir('/runpod-volume') else '/tmp/cost_model/samples.jsonl'
+))
+
 def to_nearest_multiple_of_16(value):
     """Round the given value to the nearest multiple of 16, minimum 16 guaranteed"""
     try:
@@ -45,7 +70,7 @@ def process_input(input_data, temp_dir, output_filename, input_type):
     elif input_type == "base64":
         # Decode and save Base64
         logger.info(f"🔢 Processing Base64 input")
-        return save_base64_to_file(input_data, temp_dir, output_filename)
+        return save_base64_to_file(input_data, output_filename)
     else:
         raise Exception(f"Unsupported input type: {input_type}")
 
@@ -72,92 +97,278 @@ def download_file_from_url(url, output_path):
         raise Exception(f"Error during download: {e}")
 
 
-def save_base64_to_file(base64_data, temp_dir, output_filename):
-    """Save Base64 data to file"""
+def save_base64_to_file(base64_data, output_filename):
+    """
+    Decode Base64 data straight into ComfyUI's input directory
+
+    The string is hashed and decoded in fixed-size chunks so no full-size bytes
+    copy is ever held in memory. The file is named after the content hash, so a
+    repeated input is detected before decoding and reused as-is.
+    Returns the filename relative to the ComfyUI input directory (what LoadImage expects).
+    """
     try:
-        # Decode Base64 string
-        decoded_data = base64.b64decode(base64_data)
-        
-        # Create directory if it doesn't exist
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        # Save to file
-        file_path = os.path.abspath(os.path.join(temp_dir, output_filename))
-        with open(file_path, 'wb') as f:
-            f.write(decoded_data)
-        
+        # Skip a "data:image/...;base64," prefix without copying the string
+        start = base64_data.find(',', 0, 256) + 1 if base64_data.startswith('data:') else 0
+        ext = os.path.splitext(output_filename)[1] or '.png'
+
+        hasher = hashlib.sha256()
+        for offset in range(start, len(base64_data), BASE64_CHUNK_SIZE):
+            hasher.update(base64_data[offset:offset + BASE64_CHUNK_SIZE].encode('ascii'))
+        filename = f"{hasher.hexdigest()[:32]}{ext}"
+        file_path = os.path.join(COMFY_INPUT_DIR, filename)
+
+        if os.path.exists(file_path):
+            logger.info(f"♻️ Base64 input already decoded, reusing '{file_path}'.")
+            return filename
+
+        os.makedirs(COMFY_INPUT_DIR, exist_ok=True)
+        tmp_path = f"{file_path}.{uuid.uuid4().hex}.part"
+        try:
+            carry = ''
+            with open(tmp_path, 'wb') as f:
+                for offset in range(start, len(base64_data), BASE64_CHUNK_SIZE):
+                    chunk = carry + ''.join(base64_data[offset:offset + BASE64_CHUNK_SIZE].split())
+                    # Only decode whole 4-character groups; carry the rest into the next chunk
+                    usable = len(chunk) - len(chunk) % 4
+                    f.write(base64.b64decode(chunk[:usable], validate=True))
+                    carry = chunk[usable:]
+            if carry:
+                raise binascii.Error("Incorrect padding")
+            os.replace(tmp_path, file_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
         logger.info(f"✅ Saved Base64 input to file '{file_path}'.")
-        return file_path
+        return filename
     except (binascii.Error, ValueError) as e:
         logger.error(f"❌ Base64 decoding failed: {e}")
         raise Exception(f"Base64 decoding failed: {e}")
 
-def upload_to_bunny_storage(video_path, folder, filename):
+def run_ffmpeg(args, timeout=300):
+    """Run an ffmpeg command, raising on non-zero exit"""
+    cmd = ['ffmpeg', '-y', '-hide_banner', '-loglevel', 'error'] + args
+    logger.debug(f"Running ffmpeg: {' '.join(cmd)}")
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        logger.error("❌ ffmpeg timeout")
+        raise Exception("ffmpeg timeout")
+    if result.returncode != 0:
+        logger.error(f"❌ ffmpeg failed: {result.stderr}")
+        raise Exception(f"ffmpeg failed: {result.stderr}")
+
+
+def remux_faststart(video_path, output_path):
+    """Remux without re-encoding so the moov atom sits at the front of the file"""
+    run_ffmpeg(['-i', video_path, '-c', 'copy', '-map', '0', '-movflags', '+faststart', output_path])
+    logger.info(f"⚡ Faststart remux complete: {output_path}")
+    return output_path
+
+
+def transcode_rendition(video_path, output_path, height):
+    """Encode a smaller H.264 rendition scaled to the given height (aspect preserved)"""
+    run_ffmpeg([
+        '-i', video_path,
+        '-vf', f'scale=-2:{int(height)}',
+        '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23', '-pix_fmt', 'yuv420p',
+        '-an', '-movflags', '+faststart',
+        output_path
+    ])
+    logger.info(f"🎞️ {height}p rendition complete: {output_path}")
+    return output_path
+
+
+def extract_poster(video_path, output_path):
+    """Grab the first frame as a JPEG poster image"""
+    run_ffmpeg(['-i', video_path, '-frames:v', '1', '-q:v', '3', output_path])
+    logger.info(f"🖼️ Poster frame extracted: {output_path}")
+    return output_path
+
+
+def resolve_postprocess_options(value, source_height):
+    """Normalise the job's "postprocess" input into an options dict (None = disabled)"""
+    if not value:
+        return None
+    options = dict(DEFAULT_POSTPROCESS)
+    if isinstance(value, dict):
+        options.update(value)
+    elif value is not True:
+        raise Exception(f"Unsupported postprocess value: {value}")
+    options["renditions"] = sorted({int(h) for h in options.get("renditions") or []}, reverse=True)
+    # libx264 with yuv420p needs even dimensions, and upscaling past the generated video only wastes bytes
+    for height in options["renditions"]:
+        if height <= 0 or height % 2:
+            raise Exception(f"Rendition height must be a positive even number: {height}")
+        if height > source_height:
+            raise Exception(f"Rendition height {height} exceeds the video height {source_height}")
+    return options
+
+
+def postprocess_video(video_path, work_dir, task_id, options):
     """
-    Upload video file to Bunny CDN storage
-    Hardcoded credentials for testing purposes
+    Run the post-processing stage on a generated video
+
+    Returns a list of (key, local_path, remote_filename, content_type) to upload.
+    The "video" entry is always present; it is the faststart remux when enabled,
+    otherwise the original file.
     """
-    logger.info(f"📤 Starting Bunny CDN upload...")
-    logger.debug(f"Video path: {video_path}")
-    logger.debug(f"Folder: {folder}")
-    logger.debug(f"Filename: {filename}")
-    
-    try:
-        # Hardcoded Bunny CDN credentials (TESTING ONLY)
-        STORAGE_ZONE_NAME = "mesulo"
-        STORAGE_KEY = "c624d050-d61f-4306-968c05d196ba-bd76-40e8"
-        CDN_URL = "mesulo.b-cdn.net"
-        
-        logger.info(f"📦 Storage Zone: {STORAGE_ZONE_NAME}")
-        logger.info(f"🌐 CDN URL: {CDN_URL}")
-        
-        # Read the video file
-        logger.debug(f"Reading video file: {video_path}")
-        with open(video_path, 'rb') as f:
-            file_data = f.read()
-        
-        file_size_mb = len(file_data) / (1024 * 1024)
-        logger.info(f"📊 File size: {file_size_mb:.2f} MB")
-        
-        # Construct upload URL
-        upload_url = f"https://storage.bunnycdn.com/{STORAGE_ZONE_NAME}/{folder}/{filename}"
-        logger.debug(f"Upload URL: {upload_url}")
-        
-        # Upload to Bunny storage
-        logger.info(f"⬆️  Uploading to Bunny CDN...")
-        response = requests.put(
-            upload_url,
-            data=file_data,
-            headers={
-                'AccessKey': STORAGE_KEY,
-                'Content-Type': 'video/mp4'
-            },
-            timeout=300  # 5 minute timeout
-        )
-        
-        logger.debug(f"Response status code: {response.status_code}")
-        logger.debug(f"Response text: {response.text}")
-        
-        if response.status_code in [200, 201]:
-            # Construct CDN URL
-            cdn_url = f"https://{CDN_URL}/{folder}/{filename}"
-            logger.info(f"✅ Upload successful!")
-            logger.info(f"🔗 CDN URL: {cdn_url}")
-            return cdn_url
-        else:
-            error_msg = f"Upload failed with status code {response.status_code}: {response.text}"
-            logger.error(f"❌ {error_msg}")
-            raise Exception(error_msg)
-            
-    except Exception as e:
-        logger.error(f"❌ Upload to Bunny CDN failed: {str(e)}")
-        logger.exception("Full exception details:")
-        raise
-    
-def queue_prompt(prompt):
-    url = f"http://{server_address}:8188/prompt"
+    os.makedirs(work_dir, exist_ok=True)
+    outputs = []
+
+    primary_path = video_path
+    if options.get("faststart", True):
+        primary_path = remux_faststart(video_path, os.path.join(work_dir, f"{task_id}.mp4"))
+    outputs.append(("video", primary_path, f"{task_id}.mp4", "video/mp4"))
+
+    # Renditions and poster are independent ffmpeg runs, so encode them in parallel
+    jobs = []
+    with ThreadPoolExecutor(max_workers=max(1, len(options["renditions"]) + 1)) as pool:
+        for height in options["renditions"]:
+            filename = f"{task_id}_{height}p.mp4"
+            future = pool.submit(transcode_rendition, primary_path, os.path.join(work_dir, filename), height)
+            jobs.append((f"{height}p", future, filename, "video/mp4"))
+        if options.get("poster"):
+            filename = f"{task_id}.jpg"
+            future = pool.submit(extract_poster, primary_path, os.path.join(work_dir, filename))
+            jobs.append(("poster", future, filename, "image/jpeg"))
+
+    for key, future, filename, content_type in jobs:
+        outputs.append((key, future.result(), filename, content_type))
+    return outputs
+
+
+def upload_outputs(outputs, folder):
+    """Upload all post-processed files in parallel and return a manifest of CDN URLs"""
+    logger.info(f"📤 Uploading {len(outputs)} file(s) in parallel to {storage.name} storage...")
+    uploaded = storage.upload_many(
+        [(path, f"{folder}/{filename}", content_type) for _, path, filename, content_type in outputs],
+        max_workers=UPLOAD_WORKERS,
+    )
+    urls = {key: uploaded[f"{folder}/{filename}"] for key, _, filename, _ in outputs}
+    logger.info(f"📊 Upload metrics ({storage.name}): {storage.metrics.snapshot()}")
+
+    manifest = {"video": urls.pop("video")}
+    if "poster" in urls:
+        manifest["poster"] = urls.pop("poster")
+    if urls:
+        manifest["renditions"] = urls
+    return manifest
+
+class ComfyInstance:
+    """A ComfyUI server on one GPU, with its own client id and persistent WebSocket"""
+
+    def __init__(self, index, address, port, output_dir):
+        self.index = index
+        self.address = address
+        self.port = port
+        self.output_dir = output_dir
+        self.client_id = str(uuid.uuid4())
+        self.ws = None
+        self.in_flight = 0
+        # Only one job drives an instance (and reads its WebSocket) at a time
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://{self.address}:{self.port}"
+
+    def __repr__(self):
+        return f"ComfyInstance(gpu={self.index}, {self.address}:{self.port})"
+
+    def connect(self):
+        """Wait for the HTTP endpoint, then open the WebSocket (reused across jobs)"""
+        if self.ws is not None and self.ws.connected:
+            return self.ws
+
+        ws_url = f"ws://{self.address}:{self.port}/ws?clientId={self.client_id}"
+        logger.info(f"Connecting to WebSocket: {ws_url}")
+
+        # First check if HTTP connection is possible
+        http_url = f"{self.base_url}/"
+        logger.info(f"Checking HTTP connection to: {http_url}")
+
+        # Check HTTP connection (max 3 minutes)
+        max_http_attempts = 180
+        for http_attempt in range(max_http_attempts):
+            try:
+                urllib.request.urlopen(http_url, timeout=5)
+                logger.info(f"HTTP connection successful (attempt {http_attempt+1})")
+                break
+            except Exception as e:
+                logger.warning(f"HTTP connection failed (attempt {http_attempt+1}/{max_http_attempts}): {e}")
+                if http_attempt == max_http_attempts - 1:
+                    raise Exception("Cannot connect to ComfyUI server. Please check if the server is running.")
+                time.sleep(1)
+
+        ws = websocket.WebSocket()
+        # Attempt WebSocket connection (max 3 minutes)
+        max_attempts = int(180/5)  # 3 minutes (try every 5 seconds)
+        for attempt in range(max_attempts):
+            try:
+                ws.connect(ws_url)
+                logger.info(f"WebSocket connection successful (attempt {attempt+1})")
+                break
+            except Exception as e:
+                logger.warning(f"WebSocket connection failed (attempt {attempt+1}/{max_attempts}): {e}")
+                if attempt == max_attempts - 1:
+                    raise Exception("WebSocket connection timeout (3 minutes)")
+                time.sleep(5)
+        self.ws = ws
+        return ws
+
+    def disconnect(self):
+        if self.ws is not None:
+            try:
+                self.ws.close()
+            except Exception:
+                pass
+            self.ws = None
+            logger.info(f"🔌 WebSocket connection closed ({self})")
+
+
+instances = [
+    ComfyInstance(
+        i, server_address, port,
+        "/ComfyUI/output" if len(comfy_ports) == 1 else f"/ComfyUI/output/gpu{i}"
+    )
+    for i, port in enumerate(comfy_ports)
+]
+instances_lock = threading.Lock()
+
+
+def remote_queue_depth(instance):
+    """Number of prompts running or pending on the ComfyUI server"""
+    queue_status = get_queue_status(instance)
+    if not queue_status:
+        return 0
+    return len(queue_status.get('queue_running', [])) + len(queue_status.get('queue_pending', []))
+
+
+def acquire_instance():
+    """Pick the ComfyUI instance with the shallowest queue and reserve a slot on it"""
+    depths = {instance.index: remote_queue_depth(instance) for instance in instances} if len(instances) > 1 else {}
+    with instances_lock:
+        instance = min(instances, key=lambda inst: (inst.in_flight + depths.get(inst.index, 0), inst.index))
+        instance.in_flight += 1
+    logger.info(f"🖥️ Assigned job to {instance} (queue depths: {depths or 'single instance'})")
+    return instance
+
+
+def release_instance(instance):
+    with instances_lock:
+        instance.in_flight -= 1
+
+
+def concurrency_modifier(current_concurrency):
+    """Let RunPod keep one job in flight per ComfyUI instance"""
+    return len(instances)
+
+
+def queue_prompt(prompt, instance):
+    url = f"{instance.base_url}/prompt"
     logger.info(f"Queueing prompt to: {url}")
-    p = {"prompt": prompt, "client_id": client_id}
+    p = {"prompt": prompt, "client_id": instance.client_id}
     data = json.dumps(p).encode('utf-8')
     req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
     try:
@@ -169,33 +380,34 @@ def queue_prompt(prompt):
         logger.error(f"Prompt keys: {list(prompt.keys())[:10]}...")  # Log first 10 node IDs
         raise Exception(f"ComfyUI HTTP Error {e.code}: {error_body}")
 
-def get_image(filename, subfolder, folder_type):
-    url = f"http://{server_address}:8188/view"
+def get_image(filename, subfolder, folder_type, instance):
+    url = f"{instance.base_url}/view"
     logger.info(f"Getting image from: {url}")
     data = {"filename": filename, "subfolder": subfolder, "type": folder_type}
     url_values = urllib.parse.urlencode(data)
     with urllib.request.urlopen(f"{url}?{url_values}") as response:
         return response.read()
 
-def get_history(prompt_id):
-    url = f"http://{server_address}:8188/history/{prompt_id}"
+def get_history(prompt_id, instance):
+    url = f"{instance.base_url}/history/{prompt_id}"
     logger.info(f"Getting history from: {url}")
     with urllib.request.urlopen(url) as response:
         return json.loads(response.read())
 
-def get_queue_status():
+def get_queue_status(instance):
     """Get current queue status from ComfyUI"""
-    url = f"http://{server_address}:8188/queue"
+    url = f"{instance.base_url}/queue"
     logger.info(f"Getting queue status from: {url}")
     try:
-        with urllib.request.urlopen(url) as response:
+        with urllib.request.urlopen(url, timeout=5) as response:
             return json.loads(response.read())
     except Exception as e:
         logger.error(f"Error getting queue status: {e}")
         return None
 
-def get_videos(ws, prompt):
-    logger.info("🎬 Starting get_videos function")
+def get_videos(instance, prompt):
+    logger.info(f"🎬 Starting get_videos function on {instance}")
+    ws = instance.ws
     
     # Verify critical nodes are in the prompt
     critical_nodes = ['131', '612', '540']
@@ -205,7 +417,7 @@ def get_videos(ws, prompt):
         else:
             logger.error(f"❌ Node {node_id} is MISSING from workflow!")
     
-    prompt_id = queue_prompt(prompt)['prompt_id']
+    prompt_id = queue_prompt(prompt, instance)['prompt_id']
     logger.info(f"📋 Prompt queued with ID: {prompt_id}")
     output_videos = {}
     
@@ -236,7 +448,7 @@ def get_videos(ws, prompt):
                             time.sleep(5)
                             
                             # Check queue status for any errors
-                            queue_status = get_queue_status()
+                            queue_status = get_queue_status(instance)
                             if queue_status:
                                 logger.info(f"📊 Queue status: {json.dumps(queue_status, indent=2)[:500]}")
                             
@@ -270,7 +482,7 @@ def get_videos(ws, prompt):
         logger.warning(f"⚠️ Workflow execution did not complete within {max_wait} seconds")
     
     logger.info(f"📖 Retrieving execution history for prompt_id: {prompt_id}")
-    history_data = get_history(prompt_id)
+    history_data = get_history(prompt_id, instance)
     logger.info(f"📚 History data keys: {list(history_data.keys())}")
     
     if prompt_id not in history_data:
@@ -333,7 +545,7 @@ def get_videos(ws, prompt):
     # If no videos found in outputs, check ComfyUI output directory
     if not any(output_videos.values()):
         logger.info("🔍 No videos in history outputs, checking ComfyUI output directory...")
-        output_dir = "/ComfyUI/output"
+        output_dir = instance.output_dir
         if os.path.exists(output_dir):
             logger.info(f"📁 Output directory exists: {output_dir}")
             # Look for recently created video files
@@ -423,6 +635,33 @@ def get_videos(ws, prompt):
     logger.info(f"🎬 get_videos complete. Found videos in {len([v for v in output_videos.values() if v])} node(s)")
     return output_videos
 
+def positive_number(job_input, name, default=None, cast=int):
+    """Read a numeric job field, raising ValueError with the field name when it isn't a positive number"""
+    value = job_input.get(name, default)
+    try:
+        if isinstance(value, bool):
+            raise TypeError
+        number = cast(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a positive number, got {value!r}")
+    if number <= 0:
+        raise ValueError(f"{name} must be a positive number, got {value!r}")
+    return number
+
+def estimate_job(job_input):
+    """Return (estimated GPU seconds, cost parameters) for a job input; raises ValueError on bad fields"""
+    lora_pairs = job_input.get("lora_pairs", [])
+    if not isinstance(lora_pairs, list):
+        raise ValueError(f"lora_pairs must be a list, got {lora_pairs!r}")
+    params = {
+        "width": to_nearest_multiple_of_16(positive_number(job_input, "width", 480, float)),
+        "height": to_nearest_multiple_of_16(positive_number(job_input, "height", 832, float)),
+        "length": positive_number(job_input, "length", 81),
+        "steps": positive_number(job_input, "steps", 10),
+        "lora_count": min(len(lora_pairs), 4),
+    }
+    return cost_model.predict(**params), params
+
 def load_workflow(workflow_path):
     with open(workflow_path, 'r') as file:
         return json.load(file)
@@ -433,10 +672,31 @@ def handler(job):
     logger.info("=" * 60)
     
     job_input = job.get("input", {})
-    logger.info(f"📥 Received job input: {job_input}")
+    # Don't log (and copy) multi-megabyte base64 payloads
+    loggable_input = {k: (f"<{len(v)} chars>" if k.endswith("_base64") else v) for k, v in job_input.items()}
+    logger.info(f"📥 Received job input: {loggable_input}")
     task_id = f"task_{uuid.uuid4()}"
     logger.info(f"🆔 Generated task ID: {task_id}")
 
+    # Predict GPU time before doing any work (this also validates the numeric inputs)
+    try:
+        estimated_seconds, cost_params = estimate_job(job_input)
+        deadline_seconds = job_input.get("deadline_seconds")
+        if deadline_seconds is not None:
+            deadline_seconds = positive_number(job_input, "deadline_seconds", cast=float)
+    except ValueError as e:
+        logger.error(f"❌ Invalid job input: {e}")
+        return {"error": f"Invalid job input: {e}"}
+    logger.info(f"⏱️ Estimated GPU time: {estimated_seconds:.1f}s for {cost_params}")
+    if job_input.get("action") == "estimate":
+        return {"estimated_seconds": round(estimated_seconds, 1), "cost_model": cost_model.to_dict()}
+    if deadline_seconds is not None and estimated_seconds > deadline_seconds:
+        logger.error(f"❌ Estimated {estimated_seconds:.1f}s exceeds deadline {deadline_seconds}s")
+        return {
+            "error": f"Estimated generation time {estimated_seconds:.0f}s exceeds deadline {deadline_seconds}s",
+            "estimated_seconds": round(estimated_seconds, 1),
+        }
+
     # Process image input (use only one of: image_path, image_url, image_base64)
     image_path = None
     if "image_path" in job_input:
@@ -452,7 +712,8 @@ def handler(job):
     elif "image_url" in job_input:
         image_path = process_input(job_input["image_url"], task_id, "input_image.jpg", "url")
     elif "image_base64" in job_input:
-        image_path = process_input(job_input["image_base64"], task_id, "input_image.jpg", "base64")
+        # pop() drops the job's reference so the string can be freed once decoded
+        image_path = process_input(job_input.pop("image_base64"), task_id, "input_image.jpg", "base64")
     else:
         # Use default value
         image_path = "/example_image.png"
@@ -473,7 +734,7 @@ def handler(job):
     elif "end_image_url" in job_input:
         end_image_path_local = process_input(job_input["end_image_url"], task_id, "end_image.jpg", "url")
     elif "end_image_base64" in job_input:
-        end_image_path_local = process_input(job_input["end_image_base64"], task_id, "end_image.jpg", "base64")
+        end_image_path_local = process_input(job_input.pop("end_image_base64"), task_id, "end_image.jpg", "base64")
     
     # Check LoRA configuration - process as array
     lora_pairs = job_input.get("lora_pairs", [])
@@ -493,10 +754,15 @@ def handler(job):
     prompt = load_workflow(workflow_file)
     logger.info(f"✅ Workflow loaded. Contains {len(prompt)} nodes")
     
-    length = job_input.get("length", 81)
-    steps = job_input.get("steps", 10)
+    # Validated (and converted to int) by estimate_job
+    length = cost_params["length"]
+    steps = cost_params["steps"]
     logger.info(f"⚙️ Generation parameters - Length: {length} frames, Steps: {steps}")
 
+    # Validate post-processing options up front so a bad value fails before generation
+    postprocess_options = resolve_postprocess_options(
+        job_input.get("postprocess"), to_nearest_multiple_of_16(job_input.get("height", 832)))
+
     # Validate required nodes exist
     logger.info("🔍 Validating workflow nodes...")
     required_nodes = ["244", "541", "135", "220", "540", "235", "236", "498"]
@@ -589,44 +855,30 @@ def handler(job):
     else:
         logger.info("ℹ️ No LoRA pairs configured")
 
-    ws_url = f"ws://{server_address}:8188/ws?clientId={client_id}"
-    logger.info(f"Connecting to WebSocket: {ws_url}")
-    
-    # First check if HTTP connection is possible
-    http_url = f"http://{server_address}:8188/"
-    logger.info(f"Checking HTTP connection to: {http_url}")
-    
-    # Check HTTP connection (max 1 minute)
-    max_http_attempts = 180
-    for http_attempt in range(max_http_attempts):
-        try:
-            response = urllib.request.urlopen(http_url, timeout=5)
-            logger.info(f"HTTP connection successful (attempt {http_attempt+1})")
-            break
-        except Exception as e:
-            logger.warning(f"HTTP connection failed (attempt {http_attempt+1}/{max_http_attempts}): {e}")
-            if http_attempt == max_http_attempts - 1:
-                raise Exception("Cannot connect to ComfyUI server. Please check if the server is running.")
-            time.sleep(1)
-    
-    ws = websocket.WebSocket()
-    # Attempt WebSocket connection (max 3 minutes)
-    max_attempts = int(180/5)  # 3 minutes (try once per second)
-    for attempt in range(max_attempts):
-        try:
-            ws.connect(ws_url)
-            logger.info(f"WebSocket connection successful (attempt {attempt+1})")
-            break
-        except Exception as e:
-            logger.warning(f"WebSocket connection failed (attempt {attempt+1}/{max_attempts}): {e}")
-            if attempt == max_attempts - 1:
-                raise Exception("WebSocket connection timeout (3 minutes)")
-            time.sleep(5)
-    logger.info("🎬 Starting video generation process...")
-    videos = get_videos(ws, prompt)
+    instance = acquire_instance()
+    try:
+        with instance.lock:
+            instance.connect()
+            logger.info("🎬 Starting video generation process...")
+            generation_start = time.time()
+            try:
+                videos = get_videos(instance, prompt)
+            except Exception:
+                # Drop a possibly broken WebSocket so the next job reconnects
+                instance.disconnect()
+                raise
+            gpu_seconds = time.time() - generation_start
+    finally:
+        release_instance(instance)
     logger.info(f"📹 Videos retrieved: {videos}")
-    ws.close()
-    logger.info("🔌 WebSocket connection closed")
+    logger.info(f"⏱️ GPU time: {gpu_seconds:.1f}s (estimated {estimated_seconds:.1f}s)")
+    if any(videos.values()):
+        cost_model.record(seconds=gpu_seconds, **cost_params)
+    timing = {
+        "gpu_seconds": round(gpu_seconds, 1),
+        "estimated_seconds": round(estimated_seconds, 1),
+        "cost_model": cost_model.to_dict(),
+    }
 
     # Handle case when video is not found
     logger.info(f"🔍 Processing {len(videos)} output source(s) for videos...")
@@ -649,15 +901,33 @@ def handler(job):
             # Generate unique filename
             unique_filename = f"{task_id}.mp4"
             folder = "ai-videos"  # You can change this folder name
-            logger.info(f"📤 Preparing to upload video to Bunny CDN: {folder}/{unique_filename}")
-            
-            # Upload to Bunny CDN
+            logger.info(f"📤 Preparing to upload video to {storage.name} storage: {folder}/{unique_filename}")
+
+            # Optional post-processing: faststart remux, renditions, poster
+            if postprocess_options:
+                try:
+                    logger.info(f"🛠️ Post-processing video with options: {postprocess_options}")
+                    outputs = postprocess_video(video_path, task_id, task_id, postprocess_options)
+                    manifest = upload_outputs(outputs, folder)
+                    logger.info(f"✅ Upload successful! Manifest: {manifest}")
+                    video_found = True
+                    return {"video_url": manifest["video"], "manifest": manifest, **timing}
+                except Exception as e:
+                    logger.error(f"❌ Failed to post-process/upload video: {str(e)}")
+                    logger.exception("Full post-processing error traceback:")
+                    return {"error": f"Failed to post-process video: {str(e)}"}
+                finally:
+                    # The remux, renditions and poster are on the CDN now (or failed); don't fill the disk
+                    shutil.rmtree(task_id, ignore_errors=True)
+
+            # Upload to storage backend
             try:
-                logger.info("⬆️ Starting Bunny CDN upload...")
-                cdn_url = upload_to_bunny_storage(video_path, folder, unique_filename)
+                logger.info(f"⬆️ Starting {storage.name} upload...")
+                cdn_url = storage.upload_file(video_path, f"{folder}/{unique_filename}", "video/mp4")
                 logger.info(f"✅ Upload successful! CDN URL: {cdn_url}")
+                logger.info(f"📊 Upload metrics ({storage.name}): {storage.metrics.snapshot()}")
                 video_found = True
-                return {"video_url": cdn_url}
+                return {"video_url": cdn_url, **timing}
             except Exception as e:
                 logger.error(f"❌ Failed to upload video: {str(e)}")
                 logger.exception("Full upload error traceback:")
@@ -672,4 +942,9 @@ def handler(job):
             logger.error(f"  Node {node_id}: {node_videos}")
         return {"error": "Video not found."}
 
-runpod.serverless.start({"handler": handler})
\ No newline at end of file
+async def async_handler(job):
+    """Run the blocking handler in a thread so RunPod can keep several jobs in flight"""
+    return await asyncio.to_thread(handler, job)
+
+
+runpod.serverless.start({"handler": async_handler, "concurrency_modifier": concurrency_modifier})
\ No newline at end of file
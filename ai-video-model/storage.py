@@ -0,0 +1,285 @@
+"""
+Storage backends for the video worker
+Uploads generated files to Bunny CDN, an S3-compatible store or the local filesystem
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple, BinaryIO
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class UploadMetrics:
+    """Thread-safe upload counters for a single backend"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.uploads = 0
+        self.failures = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def record(self, size: int, seconds: float, ok: bool = True):
+        with self._lock:
+            if ok:
+                self.uploads += 1
+                self.bytes += size
+                self.seconds += seconds
+            else:
+                self.failures += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Return a copy of the counters
+
+        Returns:
+            Dictionary with upload count, failures, bytes, seconds and MB/s
+        """
+        with self._lock:
+            throughput = (self.bytes / (1024 * 1024)) / self.seconds if self.seconds > 0 else 0.0
+            return {
+                "uploads": self.uploads,
+                "failures": self.failures,
+                "bytes": self.bytes,
+                "seconds": round(self.seconds, 3),
+                "throughput_mb_s": round(throughput, 2),
+            }
+
+
+class StorageBackend:
+    """Base class for storage backends (put-stream, exists, url-for)"""
+
+    name = "base"
+
+    def __init__(self):
+        self.metrics = UploadMetrics()
+
+    def put_stream(self, stream: BinaryIO, key: str, content_type: str, size: Optional[int] = None) -> str:
+        """
+        Write a stream to the given key
+
+        Args:
+            stream: Binary file-like object to read from
+            key: Object key, e.g. "ai-videos/task_abc.mp4"
+            content_type: MIME type of the object
+            size: Size in bytes if known
+
+        Returns:
+            Public URL of the stored object
+        """
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        """Return True if an object is already stored under key"""
+        raise NotImplementedError
+
+    def url_for(self, key: str) -> str:
+        """Return the public URL for key"""
+        raise NotImplementedError
+
+    def upload_file(self, path: str, key: str, content_type: str = "video/mp4") -> str:
+        """
+        Stream a local file to the backend and record throughput
+
+        Args:
+            path: Local file path
+            key: Object key
+            content_type: MIME type of the object
+
+        Returns:
+            Public URL of the stored object
+        """
+        size = os.path.getsize(path)
+        logger.info(f"⬆️  [{self.name}] Uploading {key} ({size / (1024 * 1024):.2f} MB)")
+        start = time.perf_counter()
+        try:
+            with open(path, 'rb') as f:
+                url = self.put_stream(f, key, content_type, size=size)
+        except Exception:
+            self.metrics.record(size, time.perf_counter() - start, ok=False)
+            raise
+        elapsed = time.perf_counter() - start
+        self.metrics.record(size, elapsed)
+        logger.info(f"✅ [{self.name}] Uploaded {key} in {elapsed:.2f}s -> {url}")
+        return url
+
+    def upload_many(self, items: List[Tuple[str, str, str]], max_workers: int = 4) -> Dict[str, str]:
+        """
+        Upload several files in parallel
+
+        Args:
+            items: List of (local_path, key, content_type)
+            max_workers: Maximum concurrent uploads
+
+        Returns:
+            Dictionary mapping key to public URL
+        """
+        if not items:
+            return {}
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as pool:
+            futures = {
+                key: pool.submit(self.upload_file, path, key, content_type)
+                for path, key, content_type in items
+            }
+            return {key: future.result() for key, future in futures.items()}
+
+
+class BunnyStorage(StorageBackend):
+    """Bunny CDN edge storage"""
+
+    name = "bunny"
+
+    def __init__(self, zone: str, access_key: str, cdn_host: str, region: Optional[str] = None, timeout: int = 300):
+        super().__init__()
+        self.zone = zone
+        self.access_key = access_key
+        self.cdn_host = cdn_host
+        # Regional endpoints look like "uk.storage.bunnycdn.com"; default is Falkenstein
+        self.storage_host = f"{region}.storage.bunnycdn.com" if region else "storage.bunnycdn.com"
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({'AccessKey': access_key})
+
+    def _storage_url(self, key: str) -> str:
+        return f"https://{self.storage_host}/{self.zone}/{key}"
+
+    def put_stream(self, stream, key, content_type, size=None):
+        headers = {'Content-Type': content_type}
+        if size is not None:
+            headers['Content-Length'] = str(size)
+        response = self.session.put(self._storage_url(key), data=stream, headers=headers, timeout=self.timeout)
+        if response.status_code not in [200, 201]:
+            raise Exception(f"Upload failed with status code {response.status_code}: {response.text}")
+        return self.url_for(key)
+
+    def exists(self, key):
+        response = self.session.head(self._storage_url(key), timeout=30)
+        return response.status_code == 200
+
+    def url_for(self, key):
+        return f"https://{self.cdn_host}/{key}"
+
+
+class S3Storage(StorageBackend):
+    """S3-compatible object storage (AWS, RunPod S3, R2, MinIO, ...)"""
+
+    name = "s3"
+
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        public_base_url: Optional[str] = None
+    ):
+        super().__init__()
+        try:
+            import boto3
+        except ImportError:
+            raise Exception("boto3 is required for STORAGE_BACKEND=s3 (pip install boto3)")
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.public_base_url = public_base_url
+        self.client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region)
+
+    def put_stream(self, stream, key, content_type, size=None):
+        self.client.upload_fileobj(stream, self.bucket, key, ExtraArgs={'ContentType': content_type})
+        return self.url_for(key)
+
+    def exists(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError:
+            return False
+
+    def url_for(self, key):
+        if self.public_base_url:
+            return f"{self.public_base_url.rstrip('/')}/{key}"
+        if self.endpoint_url:
+            return f"{self.endpoint_url.rstrip('/')}/{self.bucket}/{key}"
+        return f"https://{self.bucket}.s3.amazonaws.com/{key}"
+
+
+class LocalStorage(StorageBackend):
+    """Local filesystem stand-in for offline testing and benchmarking"""
+
+    name = "local"
+
+    def __init__(self, root: str, base_url: Optional[str] = None):
+        super().__init__()
+        self.root = os.path.abspath(root)
+        self.base_url = base_url
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.root, *key.split('/'))
+
+    def put_stream(self, stream, key, content_type, size=None):
+        path = self._path_for(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # A unique temp file per write, so concurrent uploads of the same key never share one
+        with tempfile.NamedTemporaryFile(dir=directory, prefix=".upload-", suffix=".part", delete=False) as out:
+            tmp_path = out.name
+            try:
+                shutil.copyfileobj(stream, out, length=1024 * 1024)
+            except Exception:
+                out.close()
+                os.remove(tmp_path)
+                raise
+        os.replace(tmp_path, path)
+        return self.url_for(key)
+
+    def exists(self, key):
+        return os.path.isfile(self._path_for(key))
+
+    def url_for(self, key):
+        if self.base_url:
+            return f"{self.base_url.rstrip('/')}/{key}"
+        return f"file://{self._path_for(key)}"
+
+
+def get_storage_backend(backend: Optional[str] = None) -> StorageBackend:
+    """
+    Create the storage backend selected by STORAGE_BACKEND (bunny, s3 or local)
+
+    Args:
+        backend: Backend name, overrides the STORAGE_BACKEND environment variable
+
+    Returns:
+        Configured StorageBackend instance
+    """
+    backend = (backend or os.getenv('STORAGE_BACKEND', 'bunny')).lower()
+
+    if backend == "bunny":
+        access_key = os.getenv('BUNNY_STORAGE_KEY')
+        if not access_key:
+            raise Exception("BUNNY_STORAGE_KEY is required for STORAGE_BACKEND=bunny")
+        return BunnyStorage(
+            zone=os.getenv('BUNNY_STORAGE_ZONE', 'mesulo'),
+            access_key=access_key,
+            cdn_host=os.getenv('BUNNY_CDN_HOST', 'mesulo.b-cdn.net'),
+            region=os.getenv('BUNNY_STORAGE_REGION'),
+        )
+    if backend == "s3":
+        return S3Storage(
+            bucket=os.environ['STORAGE_S3_BUCKET'],
+            endpoint_url=os.getenv('STORAGE_S3_ENDPOINT'),
+            region=os.getenv('STORAGE_S3_REGION'),
+            public_base_url=os.getenv('STORAGE_PUBLIC_BASE_URL'),
+        )
+    if backend == "local":
+        return LocalStorage(
+            root=os.getenv('STORAGE_LOCAL_ROOT', '/tmp/video-storage'),
+            base_url=os.getenv('STORAGE_PUBLIC_BASE_URL'),
+        )
+    raise Exception(f"Unsupported storage backend: {backend}")
@@ -1,6 +1,10 @@
 """
 Example queries for the analytics knowledge graph.
 
+Event counts are read from the GameDaily rollups (kg_intel.rollups) rather
+than counted over every AnalyticsEvent node, and games visited together from
+the precomputed CO_VISITED relationships (kg_intel.covisitation).
+
 Usage:
     python query_analytics_graph.py
 """
@@ -48,8 +52,9 @@ def main():
     # ── 2. Events per game ──
 
     run_query(kg, "Events per game (top 10)", """
-        MATCH (e:AnalyticsEvent)-[:ON_GAME]->(g:Game)
-        RETURN g.friendlyName AS game, count(e) AS events
+        MATCH (gd:GameDaily {source: 'analytics'})
+        MATCH (g:Game {cmsId: gd.cmsId})
+        RETURN g.friendlyName AS game, sum(gd.count) AS events
         ORDER BY events DESC
         LIMIT 10
     """)
@@ -57,16 +62,16 @@ def main():
     # ── 3. Event type breakdown ──
 
     run_query(kg, "Event type breakdown", """
-        MATCH (e:AnalyticsEvent)
-        RETURN e.eventType AS eventType, count(e) AS count
+        MATCH (gd:GameDaily {source: 'analytics'})
+        RETURN gd.eventType AS eventType, sum(gd.count) AS count
         ORDER BY count DESC
     """)
 
     # ── 4. Asset type breakdown ──
 
     run_query(kg, "Asset type breakdown", """
-        MATCH (e:AnalyticsEvent)
-        RETURN e.assetType AS assetType, count(e) AS count
+        MATCH (gd:GameDaily {source: 'analytics'})
+        RETURN gd.assetType AS assetType, sum(gd.count) AS count
         ORDER BY count DESC
     """)
 
@@ -81,8 +86,8 @@ def main():
     # ── 6. Device breakdown ──
 
     run_query(kg, "Device breakdown across all events", """
-        MATCH (e:AnalyticsEvent)
-        RETURN e.device AS device, count(e) AS events
+        MATCH (gd:GameDaily {source: 'analytics'})
+        RETURN gd.device AS device, sum(gd.count) AS events
         ORDER BY events DESC
     """)
 
@@ -102,22 +107,24 @@ def main():
     # ── 8. Video engagement funnel ──
 
     run_query(kg, "Video engagement funnel per game", """
-        MATCH (e:AnalyticsEvent)-[:ON_GAME]->(g:Game)
-        WHERE e.eventType IN ['video_play', 'video_pause', 'video_click']
+        MATCH (gd:GameDaily {source: 'analytics'})
+        WHERE gd.eventType IN ['video_play', 'video_pause', 'video_click']
+        MATCH (g:Game {cmsId: gd.cmsId})
         RETURN g.friendlyName AS game,
-               e.eventType AS eventType,
-               count(e) AS count
+               gd.eventType AS eventType,
+               sum(gd.count) AS count
         ORDER BY game, count DESC
     """)
 
     # ── 9. Games visited together in the same session ──
 
     run_query(kg, "Games visited together in same session", """
-        MATCH (g1:Game)<-[:VISITED]-(s:Session)-[:VISITED]->(g2:Game)
+        MATCH (g1:Game)-[r:CO_VISITED]->(g2:Game)
         WHERE g1.cmsId < g2.cmsId
         RETURN g1.friendlyName AS game1,
                g2.friendlyName AS game2,
-               count(s) AS sharedSessions
+               r.count AS sharedSessions,
+               round(r.jaccard, 3) AS jaccard
         ORDER BY sharedSessions DESC
         LIMIT 10
     """)
@@ -125,11 +132,12 @@ def main():
     # ── 10. Impression to click conversion by game ──
 
     run_query(kg, "Impression to click conversion by game", """
-        MATCH (e:AnalyticsEvent)-[:ON_GAME]->(g:Game)
-        WHERE e.eventType IN ['impression', 'image_impression', 'video_click', 'button_click']
+        MATCH (gd:GameDaily {source: 'analytics'})
+        WHERE gd.eventType IN ['impression', 'image_impression', 'video_click', 'button_click']
+        MATCH (g:Game {cmsId: gd.cmsId})
         WITH g.friendlyName AS game,
-             sum(CASE WHEN e.eventType IN ['impression', 'image_impression'] THEN 1 ELSE 0 END) AS impressions,
-             sum(CASE WHEN e.eventType IN ['video_click', 'button_click'] THEN 1 ELSE 0 END) AS clicks
+             sum(CASE WHEN gd.eventType IN ['impression', 'image_impression'] THEN gd.count ELSE 0 END) AS impressions,
+             sum(CASE WHEN gd.eventType IN ['video_click', 'button_click'] THEN gd.count ELSE 0 END) AS clicks
         WHERE impressions > 0
         RETURN game, impressions, clicks,
                round(toFloat(clicks) / impressions * 100, 1) AS conversionRate
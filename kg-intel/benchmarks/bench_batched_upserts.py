@@ -0,0 +1,169 @@
+"""
+Benchmark: per-entity MERGE round-trips vs batched UNWIND upserts.
+
+Writes synthetic Game, ABTest/Variant and Promotion/PromoGame entities twice —
+once the way the builders used to (one run_cypher + session per statement,
+per entity) and once through kg_intel.ingest.upsert_rows — and reports
+round-trips and wall time for each. Synthetic keys are prefixed with "bench-"
+and removed afterwards; point NEO4J_URI at a scratch database anyway.
+
+Usage:
+    python benchmarks/bench_batched_upserts.py [--games 3000] [--batch-size 1000]
+"""
+
+import os
+import sys
+import time
+import argparse
+from dotenv import load_dotenv
+from neo4j import GraphDatabase
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from kg_intel.mappings import GAME_UPSERT, ABTEST_UPSERT, PROMOTION_UPSERT
+from kg_intel.ingest import upsert_rows
+
+load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
+
+PREFIX = "bench-"
+
+
+def synthetic_rows(n_games):
+    games = [{
+        "cmsId": f"{PREFIX}game-{i}", "friendlyName": f"Bench Game {i}", "group": "bench",
+        "publishedType": "default", "animate": False, "hover": False, "analytics": True,
+        "mongoId": f"{PREFIX}{i}",
+    } for i in range(n_games)]
+    tests = [{
+        "testId": f"{PREFIX}test-{i}", "name": f"Bench Test {i}", "description": "synthetic",
+        "startDate": "2024-01-01", "endDate": "2024-02-01", "startTime": "00:00", "endTime": "23:59",
+        "published": True, "group": "bench", "gameId": f"{PREFIX}game-{i}",
+        "imageA": "a.png", "videoA": "a.mp4", "imageB": "b.png", "videoB": "b.mp4",
+        "mongoId": f"{PREFIX}t{i}",
+    } for i in range(n_games // 3)]
+    promos = [{
+        "promoId": f"{PREFIX}promo-{i}", "name": f"Bench Promo {i}", "description": "synthetic",
+        "group": "bench", "startDate": "2024-01-01", "endDate": "2024-02-01", "published": True,
+        "mongoId": f"{PREFIX}p{i}",
+        "games": [{"gameCmsId": f"{PREFIX}game-{(i * 5 + j) % n_games}", "friendlyName": "", "promoVideo": ""}
+                  for j in range(5)],
+    } for i in range(n_games // 10)]
+    return games, tests, promos
+
+
+class CountingRunner:
+    """The old builders' run_cypher: a new session and auto-commit query per call."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.round_trips = 0
+
+    def __call__(self, query, params):
+        self.round_trips += 1
+        with self.driver.session() as session:
+            session.run(query, params).consume()
+
+
+def legacy_ingest(driver, games, tests, promos):
+    run = CountingRunner(driver)
+    for g in games:
+        run("""
+            MERGE (g:Game {cmsId: $cmsId})
+            SET g.friendlyName = $friendlyName, g.group = $group, g.publishedType = $publishedType,
+                g.animate = $animate, g.hover = $hover, g.analytics = $analytics
+        """, g)
+    for t in tests:
+        run("""
+            MERGE (t:ABTest {testId: $testId})
+            SET t.name = $name, t.description = $description, t.startDate = $startDate,
+                t.endDate = $endDate, t.startTime = $startTime, t.endTime = $endTime,
+                t.published = $published, t.group = $group
+        """, t)
+        run("MERGE (v:Variant {testId: $testId, type: 'A'}) SET v.image = $imageA, v.video = $videoA", t)
+        run("MERGE (v:Variant {testId: $testId, type: 'B'}) SET v.image = $imageB, v.video = $videoB", t)
+        run("""
+            MATCH (t:ABTest {testId: $testId}), (g:Game {cmsId: $gameId})
+            MERGE (t)-[:TESTS]->(g)
+        """, t)
+        run("""
+            MATCH (t:ABTest {testId: $testId}), (v:Variant {testId: $testId})
+            MERGE (t)-[:HAS_VARIANT]->(v)
+        """, t)
+    for p in promos:
+        run("""
+            MERGE (p:Promotion {promoId: $promoId})
+            SET p.name = $name, p.description = $description, p.group = $group,
+                p.startDate = $startDate, p.endDate = $endDate, p.published = $published
+        """, p)
+        for entry in p["games"]:
+            entry = {**entry, "promoId": p["promoId"]}
+            run("""
+                MERGE (pg:PromoGame {promoId: $promoId, gameCmsId: $gameCmsId})
+                SET pg.friendlyName = $friendlyName, pg.promoVideo = $promoVideo
+            """, entry)
+            run("""
+                MATCH (p:Promotion {promoId: $promoId}), (pg:PromoGame {promoId: $promoId, gameCmsId: $gameCmsId})
+                MERGE (p)-[:INCLUDES]->(pg)
+            """, entry)
+            run("""
+                MATCH (pg:PromoGame {promoId: $promoId, gameCmsId: $gameCmsId}), (g:Game {cmsId: $gameCmsId})
+                MERGE (pg)-[:FOR_GAME]->(g)
+            """, entry)
+    return run.round_trips
+
+
+def batched_ingest(driver, games, tests, promos, batch_size):
+    round_trips = 0
+    for query, rows in ((GAME_UPSERT, games), (ABTEST_UPSERT, tests), (PROMOTION_UPSERT, promos)):
+        upsert_rows(driver, query, rows, batch_size=batch_size)
+        round_trips += -(-len(rows) // batch_size)
+    return round_trips
+
+
+def cleanup(driver):
+    with driver.session() as session:
+        for label, key in (("PromoGame", "promoId"), ("Promotion", "promoId"), ("Variant", "testId"),
+                           ("ABTest", "testId"), ("Game", "cmsId")):
+            session.run(f"""
+                MATCH (n:{label}) WHERE n.{key} STARTS WITH $prefix
+                CALL {{ WITH n DETACH DELETE n }} IN TRANSACTIONS OF 5000 ROWS
+            """, {"prefix": PREFIX}).consume()
+
+
+def timed(label, fn, *args):
+    cleanup(args[0])
+    start = time.perf_counter()
+    round_trips = fn(*args)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<10} {round_trips:>8} round-trips  {elapsed:8.2f} s")
+    return round_trips, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-entity vs batched UNWIND upsert benchmark")
+    parser.add_argument("--games", type=int, default=3000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--skip-legacy", action="store_true", help="Only time the batched path")
+    args = parser.parse_args()
+
+    driver = GraphDatabase.driver(os.environ["NEO4J_URI"],
+                                  auth=(os.environ["NEO4J_USERNAME"], os.environ["NEO4J_PASSWORD"]))
+    driver.verify_connectivity()
+    games, tests, promos = synthetic_rows(args.games)
+    print(f"{len(games)} games, {len(tests)} AB tests, {len(promos)} promotions "
+          f"({sum(len(p['games']) for p in promos)} promo games)")
+
+    try:
+        results = {}
+        if not args.skip_legacy:
+            results["legacy"] = timed("legacy", legacy_ingest, driver, games, tests, promos)
+        results["batched"] = timed("batched", batched_ingest, driver, games, tests, promos, args.batch_size)
+        if "legacy" in results:
+            (lr, lt), (br, bt) = results["legacy"], results["batched"]
+            print(f"  {lr / br:.0f}x fewer round-trips, {lt / bt:.1f}x faster")
+    finally:
+        cleanup(driver)
+        driver.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark: /api/graph payload with and without server-side projection.
+
+"before" reads every node with properties(n) and drops the embedding keys in
+Python, the way the server used to; "after" is kg_intel.graph_api, which
+projects the NODE_PROPERTIES allow-list in Cypher. For each path the script
+reports the fetch latency, the size of the node properties as they came off
+Bolt (approximated by their JSON encoding, vectors included), and the size
+of the response body as JSON and as to_columnar() JSON, raw and gzipped.
+
+Usage:
+    python benchmarks/bench_graph_payload.py [--runs 5] [--lod | --no-lod]
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from kg_intel.connections import load_env, get_driver, close_connections
+from kg_intel.graph_api import graph_labels, display_name, fetch_graph, to_columnar
+
+
+def fetch_unprojected(driver, lod):
+    """The pre-projection export: full properties over Bolt, vectors filtered afterwards."""
+    graph = {"nodes": [], "links": [], "cursor": None}
+    wire_bytes = 0
+    with driver.session() as session:
+        labels = graph_labels(driver, lod=lod)
+        for label in labels:
+            for r in session.run(f"MATCH (n:`{label}`) RETURN id(n) AS id, properties(n) AS props"):
+                wire_bytes += len(json.dumps(r["props"], default=str))
+                props = {k: v for k, v in r["props"].items() if not k.endswith("Embedding")}
+                graph["nodes"].append({"id": r["id"], "label": label, "name": display_name(label, props),
+                                       "props": props})
+        for r in session.run("""
+            MATCH (a)-[r]->(b) WHERE any(l IN labels(a) WHERE l IN $labels) AND any(l IN labels(b) WHERE l IN $labels)
+            RETURN id(a) AS source, id(b) AS target, type(r) AS type
+        """, {"labels": labels}):
+            graph["links"].append({"source": r["source"], "target": r["target"], "type": r["type"]})
+    return graph, wire_bytes
+
+
+def sizes(payload):
+    raw = json.dumps(payload, default=str).encode("utf-8")
+    return len(raw), len(gzip.compress(raw))
+
+
+def kb(n):
+    return f"{n / 1024:10.1f} KB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Graph payload size and latency before/after projection")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--lod", action=argparse.BooleanOptionalAction, default=True,
+                        help="Leave event nodes out, as the browser's first load does")
+    args = parser.parse_args()
+
+    load_env()
+    driver = get_driver()
+    try:
+        timings = {"before": [], "after": []}
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            before, wire_bytes = fetch_unprojected(driver, args.lod)
+            timings["before"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            after = fetch_graph(driver, lod=args.lod)
+            timings["after"].append(time.perf_counter() - start)
+
+        projected_bytes = sum(len(json.dumps(n["props"], default=str)) for n in after["nodes"])
+        print(f"{len(after['nodes'])} nodes, {len(after['links'])} links, lod={'on' if args.lod else 'off'}, "
+              f"{args.runs} runs")
+        for name in ("before", "after"):
+            print(f"  fetch {name:<7} median {statistics.median(timings[name]) * 1000:8.1f} ms")
+        print(f"  node properties over Bolt   before {kb(wire_bytes)}   after {kb(projected_bytes)}")
+
+        raw, gz = sizes(before)
+        print(f"  response json (before)      {kb(raw)}   gzip {kb(gz)}")
+        raw, gz = sizes(after)
+        print(f"  response json (after)       {kb(raw)}   gzip {kb(gz)}")
+        raw, gz = sizes(to_columnar(after))
+        print(f"  response columnar (after)   {kb(raw)}   gzip {kb(gz)}")
+    finally:
+        close_connections()
+
+
+if __name__ == "__main__":
+    main()
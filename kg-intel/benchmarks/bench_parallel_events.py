@@ -0,0 +1,69 @@
+"""
+Benchmark: ABTestEvent ingestion throughput by writer count.
+
+Loads the same synthetic events through kg_intel.ingest.ParallelLoader with
+1, 2, 4 and 8 workers (partitioned by gameId) and prints rows/s, retried
+transactions and the batch sizes the writers settled on. Synthetic keys are
+prefixed with "bench-" and removed between runs; use a scratch database.
+
+Usage:
+    python benchmarks/bench_parallel_events.py [--games 200] [--events 50000] [--workers 1,2,4,8]
+"""
+
+import os
+import sys
+import time
+import argparse
+from dotenv import load_dotenv
+from neo4j import GraphDatabase
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from kg_intel.mappings import GAME_UPSERT, ABTEST_UPSERT, ABTEST_EVENT_UPSERT
+from kg_intel.ingest import upsert_rows, ParallelLoader
+from kg_intel.schema import ensure_schema
+from bench_schema import ROLLUP_KEYS, synthetic_rows, cleanup, delete_prefixed
+
+load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
+
+
+def delete_events(driver):
+    # Rollups go too, so every run creates the same rows
+    delete_prefixed(driver, (("ABTestEvent", "eventId"), *ROLLUP_KEYS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Event ingestion throughput by writer count")
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--workers", default="1,2,4,8", help="Comma-separated writer counts to try")
+    args = parser.parse_args()
+
+    driver = GraphDatabase.driver(os.environ["NEO4J_URI"],
+                                  auth=(os.environ["NEO4J_USERNAME"], os.environ["NEO4J_PASSWORD"]))
+    driver.verify_connectivity()
+    games, tests, events = synthetic_rows(args.games, args.events)
+    print(f"{len(games)} games, {len(events)} events")
+
+    try:
+        ensure_schema(driver)
+        upsert_rows(driver, GAME_UPSERT, games)
+        upsert_rows(driver, ABTEST_UPSERT, tests)
+
+        baseline = None
+        for workers in (int(w) for w in args.workers.split(",")):
+            delete_events(driver)
+            loader = ParallelLoader(driver, ABTEST_EVENT_UPSERT, "gameId",
+                                    workers=workers, batch_size=args.batch_size, unique_key="eventId")
+            start = time.perf_counter()
+            loader.load(iter(events))
+            rate = len(events) / (time.perf_counter() - start)
+            baseline = baseline or rate
+            print(f"  {workers} workers: {rate:8.0f} rows/s  ({rate / baseline:.1f}x)")
+    finally:
+        cleanup(driver)
+        driver.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark: event ingestion with and without the kg_intel.schema constraints.
+
+Ingests synthetic games, AB tests and ABTestEvents through the shared UNWIND
+statements twice — first with the schema dropped, then after ensure_schema()
+— and reports total time plus the first/last batch time, which shows the
+label-scan slowdown as the graph grows. Synthetic keys are prefixed with
+"bench-" and removed afterwards, together with the GameDaily / VariantDaily
+rollups the events bump; run it against a scratch database since the schema
+is dropped for the first pass (ensure_schema restores it).
+
+Usage:
+    python benchmarks/bench_schema.py [--games 500] [--events 20000] [--batch-size 1000]
+"""
+
+import os
+import sys
+import time
+import argparse
+from dotenv import load_dotenv
+from neo4j import GraphDatabase
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from kg_intel.mappings import GAME_UPSERT, ABTEST_UPSERT, ABTEST_EVENT_UPSERT
+from kg_intel.ingest import iter_batches, upsert_rows
+from kg_intel.schema import ensure_schema, drop_schema
+
+load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
+
+PREFIX = "bench-"
+# Rollup rows (see kg_intel.rollups) the event upserts create for the synthetic games and tests
+ROLLUP_KEYS = (("GameDaily", "cmsId"), ("VariantDaily", "testId"))
+
+
+def synthetic_rows(n_games, n_events):
+    games = [{
+        "cmsId": f"{PREFIX}game-{i}", "friendlyName": f"Bench Game {i}", "group": "bench",
+        "publishedType": "default", "animate": False, "hover": False, "analytics": True, "mongoId": "",
+    } for i in range(n_games)]
+    tests = [{
+        "testId": f"{PREFIX}test-{i}", "name": "", "description": "", "startDate": "", "endDate": "",
+        "startTime": "", "endTime": "", "published": True, "group": "bench", "gameId": f"{PREFIX}game-{i}",
+        "imageA": "", "videoA": "", "imageB": "", "videoB": "", "mongoId": "",
+    } for i in range(n_games)]
+    events = []
+    for i in range(n_events):
+        ts = f"2024-01-{i % 28 + 1:02d}T00:00:{i % 60:02d}"
+        # "date" is part of the rollup MERGE keys, which reject nulls (see abtest_event_params)
+        events.append({
+            "eventId": f"{PREFIX}evt-{i}", "eventType": "impression" if i % 4 else "click", "device": "desktop",
+            "timestamp": ts, "date": ts[:10], "distributionWeight": 50,
+            "variantType": "A" if i % 2 else "B", "gameId": f"{PREFIX}game-{i % n_games}", "mongoId": "",
+        })
+    return games, tests, events
+
+
+def delete_prefixed(driver, labels_and_keys):
+    with driver.session() as session:
+        for label, key in labels_and_keys:
+            session.run(f"""
+                MATCH (n:{label}) WHERE n.{key} STARTS WITH $prefix
+                CALL {{ WITH n DETACH DELETE n }} IN TRANSACTIONS OF 5000 ROWS
+            """, {"prefix": PREFIX}).consume()
+
+
+def cleanup(driver):
+    delete_prefixed(driver, (("ABTestEvent", "eventId"), *ROLLUP_KEYS, ("Variant", "testId"),
+                             ("ABTest", "testId"), ("Game", "cmsId")))
+
+
+def ingest(driver, games, tests, events, batch_size):
+    start = time.perf_counter()
+    upsert_rows(driver, GAME_UPSERT, games, batch_size=batch_size)
+    upsert_rows(driver, ABTEST_UPSERT, tests, batch_size=batch_size)
+    batch_times = []
+    for batch in iter_batches(events, batch_size):
+        batch_start = time.perf_counter()
+        upsert_rows(driver, ABTEST_EVENT_UPSERT, batch, batch_size=batch_size)
+        batch_times.append(time.perf_counter() - batch_start)
+    return time.perf_counter() - start, batch_times
+
+
+def report(label, total, batch_times):
+    print(f"  {label:<16} total {total:8.2f} s   first batch {batch_times[0] * 1000:7.0f} ms   "
+          f"last batch {batch_times[-1] * 1000:7.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestion time with and without schema constraints")
+    parser.add_argument("--games", type=int, default=500)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    driver = GraphDatabase.driver(os.environ["NEO4J_URI"],
+                                  auth=(os.environ["NEO4J_USERNAME"], os.environ["NEO4J_PASSWORD"]))
+    driver.verify_connectivity()
+    games, tests, events = synthetic_rows(args.games, args.events)
+    print(f"{len(games)} games, {len(tests)} AB tests, {len(events)} events, batch size {args.batch_size}")
+
+    try:
+        cleanup(driver)
+        drop_schema(driver)
+        before = ingest(driver, games, tests, events, args.batch_size)
+        report("without schema", *before)
+
+        cleanup(driver)
+        ensure_schema(driver)
+        after = ingest(driver, games, tests, events, args.batch_size)
+        report("with schema", *after)
+        print(f"  {before[0] / after[0]:.1f}x faster with constraints and indexes")
+    finally:
+        cleanup(driver)
+        ensure_schema(driver)
+        driver.close()
+
+
+if __name__ == "__main__":
+    main()
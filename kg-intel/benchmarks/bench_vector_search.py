@@ -0,0 +1,111 @@
+"""
+Benchmark: semantic top-k search in Neo4j vs the local kg_intel.vector_index.
+
+Exports an index from the graph (or generates --synthetic vectors), then
+runs the same query vectors through db.index.vector.queryNodes (vector
+passed as a parameter, so no embedding call is timed), the local exact
+scan and the local IVF search. Reports p50 / p95 latency per path and the
+recall@k of IVF against the exact results. Query vectors are stored vectors
+with noise added, so every query has a true nearest neighbour.
+
+Usage:
+    python benchmarks/bench_vector_search.py [--index abtest_desc_embeddings] [--queries 200] [--k 10]
+    python benchmarks/bench_vector_search.py --synthetic 100000 [--dimensions 1536] [--n-probe 8]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from kg_intel.connections import load_env, get_driver, close_connections
+from kg_intel.vector_index import (VECTOR_INDEXES, PUBLISHED_LABELS, DEFAULT_N_PROBE, LocalVectorIndex,
+                                   export_index, build_ivf)
+
+
+def percentiles(samples):
+    ms = np.array(samples) * 1000
+    return f"p50 {np.percentile(ms, 50):7.2f} ms   p95 {np.percentile(ms, 95):7.2f} ms"
+
+
+def timed(fn, queries):
+    samples, results = [], []
+    for q in queries:
+        start = time.perf_counter()
+        results.append(fn(q))
+        samples.append(time.perf_counter() - start)
+    return samples, results
+
+
+def write_synthetic(directory, index, n, dimensions):
+    import json
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(n, dimensions)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.save(os.path.join(directory, f"{index}.npy"), vectors)
+    label, key, _, display = VECTOR_INDEXES[index]
+    with open(os.path.join(directory, f"{index}.json"), "w") as f:
+        json.dump({"index": index, "label": label, "key": key, "keys": [f"syn-{i}" for i in range(n)],
+                   "group": ["bench"] * n, "published": [True] * n if label in PUBLISHED_LABELS else None,
+                   "display": {p: [""] * n for p in display}}, f)
+    centroids, order, offsets = build_ivf(vectors)
+    np.savez(os.path.join(directory, f"{index}.ivf.npz"), centroids=centroids, order=order, offsets=offsets)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Neo4j vs local vector search latency")
+    parser.add_argument("--index", default="abtest_desc_embeddings", choices=sorted(VECTOR_INDEXES))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--synthetic", type=int, help="Skip Neo4j and benchmark N random local vectors")
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--n-probe", type=int, default=DEFAULT_N_PROBE, help="IVF lists scanned per query")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="kg-vectors-")
+    driver = None
+    if args.synthetic:
+        write_synthetic(directory, args.index, args.synthetic, args.dimensions)
+    else:
+        load_env()
+        driver = get_driver()
+        export_index(driver, args.index, directory, ivf=True)
+
+    try:
+        local = LocalVectorIndex(args.index, directory)
+        rng = np.random.default_rng(1)
+        picks = rng.integers(0, len(local), args.queries)
+        queries = [np.asarray(local.vectors[i]) + rng.normal(0, 0.02, local.vectors.shape[1]).astype(np.float32)
+                   for i in picks]
+        print(f"{len(local)} vectors, {args.queries} queries, k={args.k}, "
+              f"IVF {'on' if local.ivf is not None else 'off (too few vectors)'}")
+
+        if driver is not None:
+            def neo4j_search(q):
+                with driver.session() as session:
+                    return [r["key"] for r in session.run(f"""
+                        CALL db.index.vector.queryNodes($index, $k, $vector) YIELD node, score
+                        RETURN node.{VECTOR_INDEXES[args.index][1]} AS key
+                    """, {"index": args.index, "k": args.k, "vector": q.tolist()})]
+
+            samples, _ = timed(neo4j_search, queries)
+            print(f"  neo4j queryNodes   {percentiles(samples)}")
+
+        samples, exact = timed(lambda q: [h["key"] for h in local.search(q, k=args.k, exact=True)], queries)
+        print(f"  local exact        {percentiles(samples)}")
+        if local.ivf is not None:
+            samples, approx = timed(
+                lambda q: [h["key"] for h in local.search(q, k=args.k, n_probe=args.n_probe)], queries)
+            recall = np.mean([len(set(a) & set(e)) / len(e) for a, e in zip(approx, exact) if e])
+            print(f"  local IVF          {percentiles(samples)}   recall@{args.k} {recall:.3f}")
+    finally:
+        if driver is not None:
+            close_connections()
+
+
+if __name__ == "__main__":
+    main()
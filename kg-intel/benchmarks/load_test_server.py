@@ -0,0 +1,118 @@
+"""
+Load test: do concurrent visualization-server users still queue behind each other?
+
+Starts --slow clients that keep one long /api/query running each (a Cypher
+UNWIND of --slow-rows rows, or /api/nl-query with --nl), and --fast clients
+that repeatedly fetch the page and /api/graph over keep-alive connections.
+While the slow requests are in flight the fast requests should keep their
+idle latency; with a single-threaded server they wait for every slow one.
+Reports p50 / p95 / max latency per request kind plus status code counts
+(503 means an endpoint's concurrency limit turned the request away).
+
+Start the server first (python experiments/visualize_server.py).
+
+Usage:
+    python benchmarks/load_test_server.py [--url http://localhost:7475] [--slow 4] [--fast 16]
+                                          [--duration 20] [--slow-rows 5000000] [--nl]
+"""
+
+import json
+import time
+import argparse
+import threading
+import http.client
+import statistics
+from collections import Counter, defaultdict
+from urllib.parse import urlparse
+
+results = defaultdict(list)
+statuses = Counter()
+lock = threading.Lock()
+
+
+def request(conn, method, path, body=None):
+    headers = {"Accept-Encoding": "gzip"}
+    if body is not None:
+        body = json.dumps(body)
+        headers["Content-Type"] = "application/json"
+    start = time.perf_counter()
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    elapsed = time.perf_counter() - start
+    with lock:
+        statuses[f"{method} {path.split('?')[0]} {response.status}"] += 1
+    return elapsed, response
+
+
+def client(host, port, deadline, kind, calls):
+    conn = http.client.HTTPConnection(host, port, timeout=300)
+    while time.monotonic() < deadline:
+        for method, path, body in calls:
+            try:
+                elapsed, response = request(conn, method, path, body)
+            except (OSError, http.client.HTTPException):
+                # Server closed the connection (e.g. after a streamed response); reconnect
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=300)
+                continue
+            if response.getheader("Connection", "").lower() == "close":
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=300)
+            with lock:
+                results[kind].append(elapsed)
+    conn.close()
+
+
+def summary(samples):
+    ms = sorted(s * 1000 for s in samples)
+    p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+    return f"n={len(ms):5d}   p50 {statistics.median(ms):8.1f} ms   p95 {p95:8.1f} ms   max {ms[-1]:8.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for visualize_server.py")
+    parser.add_argument("--url", default="http://localhost:7475")
+    parser.add_argument("--slow", type=int, default=4, help="Clients each holding a long request open")
+    parser.add_argument("--fast", type=int, default=16, help="Clients fetching the page and /api/graph")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--slow-rows", type=int, default=5_000_000, help="Rows the slow Cypher unwinds")
+    parser.add_argument("--nl", action="store_true", help="Use /api/nl-query (OpenAI + Cypher) as the slow call")
+    args = parser.parse_args()
+
+    url = urlparse(args.url)
+    host, port = url.hostname, url.port or 80
+
+    # Warm up so the graph snapshot exists and the first fetch isn't counted
+    warm = http.client.HTTPConnection(host, port, timeout=300)
+    request(warm, "GET", "/api/graph")
+    warm.close()
+    statuses.clear()
+
+    if args.nl:
+        slow_call = ("POST", "/api/nl-query", {"question": "Which variant won each A/B test by impressions?"})
+    else:
+        slow_call = ("POST", "/api/query",
+                     {"query": "UNWIND range(1, $n) AS x RETURN sum(x % 7) AS s", "params": {"n": args.slow_rows}})
+    fast_calls = [("GET", "/", None), ("GET", "/api/graph", None)]
+
+    deadline = time.monotonic() + args.duration
+    threads = [threading.Thread(target=client, args=(host, port, deadline, "slow", [slow_call]))
+               for _ in range(args.slow)]
+    threads += [threading.Thread(target=client, args=(host, port, deadline, "fast", fast_calls))
+                for _ in range(args.fast)]
+    print(f"{args.slow} slow + {args.fast} fast clients for {args.duration:.0f}s against {args.url}")
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    for kind in ("fast", "slow"):
+        if results[kind]:
+            print(f"  {kind:<5} {summary(results[kind])}")
+    for key, count in sorted(statuses.items()):
+        print(f"  {key:<32} {count}")
+
+
+if __name__ == "__main__":
+    main()
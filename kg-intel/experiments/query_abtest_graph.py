@@ -1,7 +1,14 @@
 import os
+import sys
+import argparse
 from dotenv import load_dotenv
 from langchain_neo4j import Neo4jGraph
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from kg_intel.vector_index import INDEX_DIR
+from kg_intel.embeddings import OpenAIEmbedder
+from kg_intel.query_embeddings import QueryEmbeddingCache
+
 ENV_PATH = os.path.join(os.path.dirname(__file__), '..', '.env')
 load_dotenv(ENV_PATH)
 
@@ -24,7 +31,23 @@ def run_query(kg, title, cypher, params=None):
     return results
 
 
+def local_semantic_search(index_dir, index, question_vector, top_k):
+    """Search an exported kg_intel.vector_index instead of the Neo4j vector index."""
+    from kg_intel.vector_index import LocalVectorIndex
+
+    return LocalVectorIndex(index, index_dir).search(question_vector, k=top_k)
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Run the canned A/B test graph queries")
+    parser.add_argument("--local-index", nargs="?", const=INDEX_DIR, metavar="DIR",
+                        help="Answer the semantic searches from a local vector index export "
+                             "(python -m kg_intel.vector_index export)")
+    args = parser.parse_args()
+
+    # Questions are embedded once and then served from the LRU / on-disk cache
+    question_cache = QueryEmbeddingCache(OpenAIEmbedder(api_key=OPENAI_API_KEY, endpoint=OPENAI_ENDPOINT))
+
     kg = Neo4jGraph(
         url=NEO4J_URI,
         username=NEO4J_USERNAME,
@@ -58,47 +81,50 @@ def main():
     """)
 
     # ── 3. Variant performance comparison ──
+    # Event counts come from the VariantDaily / GameDaily rollups (kg_intel.rollups),
+    # not from counting every ABTestEvent node
 
     run_query(kg, "Variant performance: event counts by variant and type", """
-        MATCH (e:ABTestEvent)-[:FOR_VARIANT]->(v:Variant),
-              (e)-[:FOR_TEST]->(t:ABTest)-[:TESTS]->(g:Game)
+        MATCH (g:Game)<-[:TESTS]-(t:ABTest)-[:HAS_VARIANT]->(v:Variant)
+        MATCH (vd:VariantDaily {testId: t.testId, variant: v.type})
         RETURN g.friendlyName AS game,
                t.name AS test,
                v.type AS variant,
-               e.eventType AS eventType,
-               count(e) AS events
+               vd.eventType AS eventType,
+               sum(vd.count) AS events
         ORDER BY game, test, variant, events DESC
     """)
 
     # ── 4. Device breakdown per variant ──
 
     run_query(kg, "Device breakdown per variant", """
-        MATCH (e:ABTestEvent)-[:FOR_VARIANT]->(v:Variant),
-              (e)-[:FOR_TEST]->(t:ABTest)-[:TESTS]->(g:Game)
+        MATCH (g:Game)<-[:TESTS]-(t:ABTest)-[:HAS_VARIANT]->(v:Variant)
+        MATCH (vd:VariantDaily {testId: t.testId, variant: v.type})
         RETURN g.friendlyName AS game,
                t.name AS test,
                v.type AS variant,
-               e.device AS device,
-               count(e) AS events
+               vd.device AS device,
+               sum(vd.count) AS events
         ORDER BY game, test, variant, device
     """)
 
     # ── 5. Games with the most A/B test activity ──
 
     run_query(kg, "Games ranked by total A/B test events", """
-        MATCH (e:ABTestEvent)-[:ON_GAME]->(g:Game)
+        MATCH (gd:GameDaily {source: 'abtest'})
+        MATCH (g:Game {cmsId: gd.cmsId})
         RETURN g.friendlyName AS game,
                g.cmsId AS cmsId,
-               count(e) AS totalEvents
+               sum(gd.count) AS totalEvents
         ORDER BY totalEvents DESC
     """)
 
     # ── 6. Head-to-head: Variant A vs B win rate by event type ──
 
     run_query(kg, "Head-to-head: Variant A vs B per test", """
-        MATCH (e:ABTestEvent)-[:FOR_VARIANT]->(v:Variant),
-              (e)-[:FOR_TEST]->(t:ABTest)-[:TESTS]->(g:Game)
-        WITH g.friendlyName AS game, t.name AS test, v.type AS variant, count(e) AS events
+        MATCH (g:Game)<-[:TESTS]-(t:ABTest)-[:HAS_VARIANT]->(v:Variant)
+        MATCH (vd:VariantDaily {testId: t.testId, variant: v.type})
+        WITH g.friendlyName AS game, t.name AS test, v.type AS variant, sum(vd.count) AS events
         ORDER BY game, test, variant
         RETURN game, test,
                collect({variant: variant, events: events}) AS variants
@@ -111,31 +137,22 @@ def main():
     print(f"  Semantic search: \"{question}\"")
     print(f"{'─' * 60}")
 
-    embed_params = {
-        "openAiApiKey": OPENAI_API_KEY,
-        "openAiEndpoint": OPENAI_ENDPOINT,
-        "question": question,
-        "top_k": 5,
-    }
-
-    results = kg.query("""
-        WITH ai.text.embed(
-            $question,
-            "OpenAI",
-            {
-                token: $openAiApiKey,
-                endpoint: $openAiEndpoint,
-                model: "text-embedding-3-small"
-            }) AS question_embedding
-        CALL db.index.vector.queryNodes(
-            'abtest_desc_embeddings',
-            $top_k,
-            question_embedding
-        ) YIELD node AS abtest, score
-        RETURN abtest.name AS name,
-               abtest.description AS description,
-               score
-    """, params=embed_params)
+    question_embedding = question_cache.embed(question)
+    if args.local_index:
+        results = [{"name": hit["name"], "description": hit["description"], "score": hit["score"]}
+                   for hit in local_semantic_search(args.local_index, "abtest_desc_embeddings",
+                                                    question_embedding, 5)]
+    else:
+        results = kg.query("""
+            CALL db.index.vector.queryNodes(
+                'abtest_desc_embeddings',
+                $top_k,
+                $question_embedding
+            ) YIELD node AS abtest, score
+            RETURN abtest.name AS name,
+                   abtest.description AS description,
+                   score
+        """, params={"question_embedding": question_embedding, "top_k": 5})
 
     for row in results:
         print(f"  [{row['score']:.4f}] {row['name']}: {row['description']}")
@@ -147,33 +164,27 @@ def main():
     print(f"  Semantic search (games): \"{game_question}\"")
     print(f"{'─' * 60}")
 
-    game_results = kg.query("""
-        WITH ai.text.embed(
-            $question,
-            "OpenAI",
-            {
-                token: $openAiApiKey,
-                endpoint: $openAiEndpoint,
-                model: "text-embedding-3-small"
-            }) AS question_embedding
-        CALL db.index.vector.queryNodes(
-            'game_name_embeddings',
-            $top_k,
-            question_embedding
-        ) YIELD node AS game, score
-        RETURN game.friendlyName AS name,
-               game.cmsId AS cmsId,
-               score
-    """, params={
-        "openAiApiKey": OPENAI_API_KEY,
-        "openAiEndpoint": OPENAI_ENDPOINT,
-        "question": game_question,
-        "top_k": 5,
-    })
+    game_embedding = question_cache.embed(game_question)
+    if args.local_index:
+        game_results = [{"name": hit["friendlyName"], "cmsId": hit["key"], "score": hit["score"]}
+                        for hit in local_semantic_search(args.local_index, "game_name_embeddings",
+                                                         game_embedding, 5)]
+    else:
+        game_results = kg.query("""
+            CALL db.index.vector.queryNodes(
+                'game_name_embeddings',
+                $top_k,
+                $question_embedding
+            ) YIELD node AS game, score
+            RETURN game.friendlyName AS name,
+                   game.cmsId AS cmsId,
+                   score
+        """, params={"question_embedding": game_embedding, "top_k": 5})
 
     for row in game_results:
         print(f"  [{row['score']:.4f}] {row['name']} ({row['cmsId']})")
 
+    question_cache.close()
     print(f"\n{'─' * 60}")
     print("  All queries complete.")
     print(f"{'─' * 60}")
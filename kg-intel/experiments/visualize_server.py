@@ -2,19 +2,51 @@
 Lightweight visualization server for the knowledge graph.
 Serves the 3D graph HTML and proxies Cypher queries to Neo4j.
 
+Each HTTP/1.1 keep-alive connection is read by its own lightweight thread
+(at most MAX_CONNECTIONS; idle ones close after KEEP_ALIVE_TIMEOUT), but only
+SERVER_WORKERS requests are handled at once and at most MAX_QUEUED wait for
+a worker, so idle browser tabs never hold a worker and a slow /api/nl-query
+no longer blocks static files or other users. The expensive endpoints also
+get their own concurrency limit (ENDPOINT_LIMITS). A request that finds the
+queue full, or cannot get a worker or endpoint slot within QUEUE_TIMEOUT
+seconds, is answered 503 with Retry-After instead of piling up.
+Cypher runs with a transaction timeout and OpenAI calls with a client timeout.
+
+/api/nl-query reuses translations of earlier (or near-identical) questions
+and, like /api/query, serves repeated Cypher from a result cache that is
+invalidated when the graph version changes. GET /api/stats reports the hit
+rates. Every query first passes kg_intel.cypher_guard (read-only, EXPLAIN
+cost check, enforced LIMIT); rejected NL queries are retried with the plan.
+/api/query with format=ndjson streams rows as chunked NDJSON while the driver
+fetches them, up to STREAM_MAX_ROWS / STREAM_MAX_BYTES, and ends with a
+summary line carrying time-to-first-row and rows/sec.
+
 Usage:
     python visualize_server.py
     Open http://localhost:7474 in your browser
 """
 
 import os
+import sys
 import json
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+import time
+import itertools
+import threading
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
 from dotenv import load_dotenv
-from neo4j import GraphDatabase
+from neo4j import GraphDatabase, Query, READ_ACCESS
 from openai import OpenAI
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from kg_intel.embeddings import OpenAIEmbedder
+from kg_intel.query_embeddings import QueryEmbeddingCache, semantic_search
+from kg_intel.vector_index import VECTOR_INDEXES
+from kg_intel.graph_api import PAGE_SIZE, decode_cursor, iter_graph, fetch_graph, to_columnar, strip_vectors
+from kg_intel.graph_cache import GraphSnapshotCache
+from kg_intel.query_cache import TranslationCache, ResultCache
+from kg_intel.cypher_guard import QueryRejected, check_query
+
 ENV_PATH = os.path.join(os.path.dirname(__file__), '..', '.env')
 load_dotenv(ENV_PATH)
 
@@ -23,11 +55,42 @@ NEO4J_USERNAME = os.environ["NEO4J_USERNAME"]
 NEO4J_PASSWORD = os.environ["NEO4J_PASSWORD"]
 OPENAI_API_KEY = os.environ["OPENAI_API_KEY"]
 
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
-
 PORT = 7475
+SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", 32))
+# Requests waiting for a worker beyond this are refused immediately
+MAX_QUEUED = int(os.environ.get("MAX_QUEUED", 64))
+MAX_CONNECTIONS = int(os.environ.get("MAX_CONNECTIONS", 512))
+# Concurrent requests per endpoint; the rest wait up to QUEUE_TIMEOUT for a slot
+ENDPOINT_LIMITS = {
+    "/api/nl-query": 4,
+    "/api/semantic-search": 8,
+    "/api/query": 8,
+    "/api/graph": 8,
+}
+QUEUE_TIMEOUT = 10
+# Idle keep-alive connections (and stalled reads) are dropped after this many seconds
+KEEP_ALIVE_TIMEOUT = 5
+CYPHER_TIMEOUT = 30
+OPENAI_TIMEOUT = 30
+# Streamed /api/query results (format=ndjson): server-side caps, lowered per request with maxRows / maxBytes
+STREAM_MAX_ROWS = int(os.environ.get("STREAM_MAX_ROWS", 100_000))
+STREAM_MAX_BYTES = int(os.environ.get("STREAM_MAX_BYTES", 64 * 1024 * 1024))
+STREAM_TIMEOUT = 120
+STREAM_CHUNK_BYTES = 64 * 1024
+
+POST_ENDPOINTS = ("/api/query", "/api/semantic-search", "/api/nl-query")
+ENDPOINT_SLOTS = {path: threading.BoundedSemaphore(n) for path, n in ENDPOINT_LIMITS.items()}
+
+openai_client = OpenAI(api_key=OPENAI_API_KEY, timeout=OPENAI_TIMEOUT)
+# Repeated search questions skip the embedding round-trip
+question_cache = QueryEmbeddingCache(OpenAIEmbedder(api_key=OPENAI_API_KEY))
 
 driver = None
+# Default /api/graph view, rebuilt in the background whenever a builder bumps the graph version
+graph_cache = None
+# question → Cypher that ran, and (Cypher, params) → rows for the current graph version
+translation_cache = TranslationCache(question_cache)
+result_cache = ResultCache(lambda: graph_cache.version if graph_cache is not None else None)
 
 
 def get_driver():
@@ -39,62 +102,32 @@ def get_driver():
     return driver
 
 
-def run_cypher(query, params=None):
+def run_cypher(query, params=None, columnar=False):
+    """
+    Rows as dicts, or {"columns", "rows"} with value lists when columnar; embeddings are dropped.
+    Raises QueryRejected if the guard refuses the query.
+    """
     d = get_driver()
-    with d.session() as session:
-        result = session.run(query, params or {})
-        return [record.data() for record in result]
-
-
-def fetch_full_graph():
-    """Fetch all nodes and relationships for 3D visualization."""
-    nodes_raw = run_cypher("""
-        MATCH (n)
-        RETURN id(n) AS id, labels(n) AS labels, properties(n) AS props
-    """)
-
-    rels_raw = run_cypher("""
-        MATCH (a)-[r]->(b)
-        RETURN id(a) AS source, id(b) AS target, type(r) AS type
-    """)
-
-    nodes = []
-    for n in nodes_raw:
-        label = n["labels"][0] if n["labels"] else "Unknown"
-        props = n["props"]
-
-        # Strip embedding vectors from props (they're huge float arrays)
-        props = {k: v for k, v in props.items()
-                 if not k.endswith("Embedding")}
-
-        if label == "Session":
-            sid = props.get("sessionId", "")
-            display_name = sid[:24] + "..." if len(sid) > 24 else sid
-        else:
-            display_name = (
-                props.get("friendlyName")
-                or props.get("name")
-                or props.get("type")
-                or props.get("eventType")
-                or label
-            )
-
-        nodes.append({
-            "id": n["id"],
-            "label": label,
-            "name": display_name,
-            "props": props,
-        })
-
-    links = []
-    for r in rels_raw:
-        links.append({
-            "source": r["source"],
-            "target": r["target"],
-            "type": r["type"],
-        })
-
-    return {"nodes": nodes, "links": links}
+    query = check_query(d, query, params)
+    with d.session(default_access_mode=READ_ACCESS) as session:
+        result = session.run(Query(query, timeout=CYPHER_TIMEOUT), params or {})
+        if columnar:
+            return {"columns": list(result.keys()),
+                    "rows": [[strip_vectors(v) for v in record.data().values()] for record in result]}
+        return [strip_vectors(record.data()) for record in result]
+
+
+def cached_cypher(query, params=None, columnar=False):
+    """run_cypher through result_cache; returns (results, served_from_cache)."""
+    key = ResultCache.key(query, params, columnar=columnar)
+    results = result_cache.get(key)
+    if results is not None:
+        return results, True
+    # Read the version first: if the graph changes mid-query the entry is already stale
+    version = graph_cache.version if graph_cache is not None else None
+    results = run_cypher(query, params, columnar=columnar)
+    result_cache.put(key, results, version, size=len(results["rows"]) if columnar else None)
+    return results, False
 
 
 GRAPH_SCHEMA = """
@@ -126,6 +159,8 @@ RELATIONSHIPS (Analytics):
 - (AnalyticsEvent)-[:ON_GAME]->(Game)
 - (AnalyticsEvent)-[:IN_SESSION]->(Session)
 - (Session)-[:VISITED]->(Game)
+- (Game)-[:CO_VISITED {weight, count, jaccard, pmi}]->(Game)  — precomputed top related games; count is
+  shared sessions. Use it for "games played together" / "related games" instead of joining via Session.
 
 PROMOTION NODE TYPES AND PROPERTIES:
 - (:Promotion {promoId, name, description, group, startDate, endDate, published})
@@ -139,7 +174,10 @@ RULES:
 - Return ONLY the Cypher query, no explanation, no markdown fences.
 - Use friendlyName for display (not cmsId) when showing game names.
 - For variant comparisons, group by variant type (A vs B).
-- Keep queries efficient — use LIMIT when returning many rows.
+- Keep queries efficient — use LIMIT when returning many rows. Queries are read-only, and ones the
+  planner estimates at millions of rows (unlabelled scans, cartesian products) are rejected.
+- Return the properties you need (e.g. g.friendlyName AS game), never whole nodes — Game, ABTest and
+  Promotion nodes carry large embedding vectors.
 - For "which variant won/performed better", compare event counts.
 - NEVER use GROUP BY — Cypher does NOT have GROUP BY. Aggregation is implicit via non-aggregated columns in RETURN.
 - NEVER use SQL syntax. Use only valid Neo4j Cypher.
@@ -148,16 +186,21 @@ RULES:
 """.strip()
 
 
-def nl_to_cypher(question, error_context=None):
-    messages = [
-        {"role": "system", "content": GRAPH_SCHEMA},
-        {"role": "user", "content": question},
-    ]
+def nl_to_cypher(question, error_context=None, example=None):
+    messages = [{"role": "system", "content": GRAPH_SCHEMA}]
+    if example:
+        # A similar cached question whose literals differ: shown as a worked example to adapt
+        example_question, example_cypher = example
+        messages.append({"role": "user", "content": example_question})
+        messages.append({"role": "assistant", "content": example_cypher})
+    messages.append({"role": "user", "content": question})
     if error_context:
         messages.append({"role": "assistant", "content": error_context["cypher"]})
+        plan = error_context.get("plan")
         messages.append({"role": "user", "content":
             f"That Cypher query failed with error: {error_context['error']}\n"
-            "Please fix the query. Return ONLY the corrected Cypher."
+            + (f"Its EXPLAIN plan (operator, estimated rows, details):\n{plan}\n" if plan else "")
+            + "Please fix the query. Return ONLY the corrected Cypher."
         })
 
     response = openai_client.chat.completions.create(
@@ -168,7 +211,68 @@ def nl_to_cypher(question, error_context=None):
     return response.choices[0].message.content.strip()
 
 
+BUSY_RESPONSE = (b"HTTP/1.1 503 Service Unavailable\r\nRetry-After: 2\r\nContent-Length: 0\r\n"
+                 b"Connection: close\r\n\r\n")
+
+
+class PooledHTTPServer(ThreadingHTTPServer):
+    """
+    One cheap reader thread per connection (capped at max_connections), with
+    request handling limited to `workers` at a time and `max_queued` waiting.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler_class, workers=SERVER_WORKERS, max_queued=MAX_QUEUED,
+                 max_connections=MAX_CONNECTIONS):
+        super().__init__(server_address, handler_class)
+        self.workers = threading.BoundedSemaphore(workers)
+        self.max_queued = max_queued
+        self.queued = 0
+        self.queue_lock = threading.Lock()
+        self.connections = threading.BoundedSemaphore(max_connections)
+
+    def process_request(self, request, client_address):
+        if not self.connections.acquire(blocking=False):
+            try:
+                request.sendall(BUSY_RESPONSE)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        super().process_request(request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self.connections.release()
+
+    def acquire_worker(self, timeout=QUEUE_TIMEOUT):
+        """Wait for a free worker; False if the wait queue is full or none frees up within `timeout`."""
+        if self.workers.acquire(blocking=False):
+            return True
+        with self.queue_lock:
+            if self.queued >= self.max_queued:
+                return False
+            self.queued += 1
+        try:
+            return self.workers.acquire(timeout=timeout)
+        finally:
+            with self.queue_lock:
+                self.queued -= 1
+
+    def release_worker(self):
+        self.workers.release()
+
+
 class GraphHandler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    timeout = KEEP_ALIVE_TIMEOUT
+    # Headers and body go out as separate writes; without this, keep-alive clients hit delayed-ACK stalls
+    disable_nagle_algorithm = True
+
     def __init__(self, *args, **kwargs):
         super().__init__(
             *args,
@@ -177,6 +281,25 @@ class GraphHandler(SimpleHTTPRequestHandler):
         )
 
     def do_GET(self):
+        self._in_pool(self._get)
+
+    def do_POST(self):
+        self._in_pool(self._post)
+
+    def _in_pool(self, handler):
+        """Handle the request (already read off the connection) holding one of the server's workers."""
+        if not self.server.acquire_worker():
+            # The unread request body would corrupt the next request on this connection
+            self.close_connection = True
+            self._json_response({"error": "Server busy, retry shortly"}, status=503,
+                                headers={"Retry-After": "2", "Connection": "close"})
+            return
+        try:
+            handler()
+        finally:
+            self.server.release_worker()
+
+    def _get(self):
         parsed = urlparse(self.path)
 
         if parsed.path == "/":
@@ -184,29 +307,85 @@ class GraphHandler(SimpleHTTPRequestHandler):
             return super().do_GET()
 
         if parsed.path == "/api/graph":
-            data = fetch_full_graph()
-            self._json_response(data)
+            self._limited(parsed.path, self._graph_response, parse_qs(parsed.query))
+            return
+
+        if parsed.path == "/api/stats":
+            snapshot = graph_cache.snapshot if graph_cache is not None else None
+            self._json_response({
+                "translations": translation_cache.stats(),
+                "results": result_cache.stats(),
+                "questionEmbeddings": question_cache.stats(),
+                "graph": {
+                    "version": graph_cache.version if graph_cache is not None else None,
+                    "snapshotVersion": snapshot.version if snapshot is not None else None,
+                    "rebuilds": graph_cache.rebuilds if graph_cache is not None else 0,
+                },
+            })
             return
 
         return super().do_GET()
 
-    def do_POST(self):
+    def _post(self):
         parsed = urlparse(self.path)
         length = int(self.headers.get("Content-Length", 0))
         body = json.loads(self.rfile.read(length)) if length else {}
 
-        if parsed.path == "/api/query":
+        if parsed.path not in POST_ENDPOINTS:
+            self._json_response({"error": f"Unknown endpoint: {parsed.path}"}, status=404)
+            return
+        self._limited(parsed.path, self._post_response, parsed.path, body)
+
+    def _limited(self, endpoint, handler, *args):
+        """Run handler(*args) holding one of the endpoint's slots, or answer 503 if none frees up."""
+        slots = ENDPOINT_SLOTS.get(endpoint)
+        if slots is not None and not slots.acquire(timeout=QUEUE_TIMEOUT):
+            self._json_response({"error": f"{endpoint} is busy, retry shortly"}, status=503,
+                                headers={"Retry-After": "2"})
+            return
+        try:
+            handler(*args)
+        finally:
+            if slots is not None:
+                slots.release()
+
+    def _post_response(self, path, body):
+        if path == "/api/query":
             cypher = body.get("query", "")
             params = body.get("params", {})
 
+            if body.get("format") == "ndjson" or "application/x-ndjson" in self.headers.get("Accept", ""):
+                self._stream_query(cypher, params, body.get("maxRows"), body.get("maxBytes"))
+                return
+            try:
+                if body.get("format") == "columnar":
+                    results, _ = cached_cypher(cypher, params, columnar=True)
+                    self._json_response(results)
+                    return
+                results, cached = cached_cypher(cypher, params)
+                self._json_response({"results": results, "cached": cached})
+            except QueryRejected as e:
+                self._json_response({"error": e.reason, "plan": e.plan}, status=422)
+            except Exception as e:
+                self._json_response({"error": str(e)}, status=400)
+            return
+
+        if path == "/api/semantic-search":
+            question = body.get("question", "")
+            index = body.get("index", "abtest_desc_embeddings")
+            if not question or index not in VECTOR_INDEXES:
+                self._json_response({"error": "Provide a question and one of: "
+                                              + ", ".join(sorted(VECTOR_INDEXES))}, status=400)
+                return
             try:
-                results = run_cypher(cypher, params)
-                self._json_response({"results": results})
+                results = semantic_search(get_driver(), question_cache, index, question,
+                                          k=min(int(body.get("k", 10)), 100))
+                self._json_response({"results": results, "cache": question_cache.stats()})
             except Exception as e:
                 self._json_response({"error": str(e)}, status=400)
             return
 
-        if parsed.path == "/api/nl-query":
+        if path == "/api/nl-query":
             question = body.get("question", "")
             if not question:
                 self._json_response({"error": "No question provided"}, status=400)
@@ -214,21 +393,34 @@ class GraphHandler(SimpleHTTPRequestHandler):
 
             cypher = None
             try:
-                cypher = nl_to_cypher(question)
+                cypher, translation, example = translation_cache.get(question)
+                if cypher is None:
+                    cypher = nl_to_cypher(question, example=example)
                 try:
-                    results = run_cypher(cypher)
+                    results, cached = cached_cypher(cypher)
                 except Exception as first_err:
-                    # Auto-retry: ask OpenAI to fix the broken Cypher
-                    cypher = nl_to_cypher(question, error_context={
+                    # Auto-retry: ask OpenAI to fix the broken (or too expensive) Cypher
+                    cypher = nl_to_cypher(question, example=example, error_context={
                         "cypher": cypher,
                         "error": str(first_err),
+                        "plan": getattr(first_err, "plan", None),
                     })
-                    results = run_cypher(cypher)
+                    translation = "miss"
+                    results, cached = cached_cypher(cypher)
+                # Only Cypher that actually ran is remembered
+                translation_cache.put(question, cypher)
 
                 self._json_response({
                     "cypher": cypher,
                     "results": results,
+                    "cache": {"translation": translation, "results": cached},
                 })
+            except QueryRejected as e:
+                self._json_response({
+                    "error": e.reason,
+                    "plan": e.plan,
+                    "cypher": cypher,
+                }, status=422)
             except Exception as e:
                 self._json_response({
                     "error": str(e),
@@ -236,11 +428,211 @@ class GraphHandler(SimpleHTTPRequestHandler):
                 }, status=400)
             return
 
-    def _json_response(self, data, status=200):
+    def _graph_response(self, query):
+        """
+        /api/graph?labels=Game,ABTest&linkTo=Session&lod=1&game=<cmsId>&cursor=...&limit=N&format=json|ndjson|columnar
+
+        Links are only sent to nodes of the requested labels, or of the linkTo
+        labels the client already has. lod (default 1) replaces event nodes
+        with aggregate links; format=ndjson
+        streams one {"type": "node"|"link"|"cursor", ...} object per line (a
+        failure after the first line ends the stream with {"type": "error", ...})
+        and format=columnar returns graph_api.to_columnar() arrays. The unfiltered
+        lod view is answered from graph_cache with an ETag, without touching Neo4j.
+        """
+        first = lambda key, default=None: query.get(key, [default])[0]
+        try:
+            labels = [label for label in (first("labels") or "").split(",") if label] or None
+            link_labels = [label for label in (first("linkTo") or "").split(",") if label] or None
+            limit = int(first("limit")) if first("limit") else None
+            options = {
+                "labels": labels,
+                "lod": first("lod", "1") not in ("0", "false"),
+                "game": first("game"),
+                "cursor": first("cursor"),
+                "limit": min(limit, PAGE_SIZE * 10) if limit else None,
+                "link_labels": link_labels,
+            }
+            if options["cursor"]:
+                decode_cursor(options["cursor"])
+        except ValueError as e:
+            self._json_response({"error": f"Bad graph query: {e}"}, status=400)
+            return
+
+        fmt = first("format") or ("ndjson" if "application/x-ndjson" in self.headers.get("Accept", "") else "json")
+        default_view = options["lod"] and not any(options[k] for k in ("labels", "game", "cursor", "limit"))
+        snapshot = graph_cache.snapshot if graph_cache is not None else None
+        if default_view and snapshot is not None and fmt in snapshot.bodies:
+            self._snapshot_response(snapshot, fmt)
+            return
+
+        if fmt != "ndjson":
+            try:
+                graph = fetch_graph(get_driver(), **options)
+            except Exception as e:
+                self._json_response({"error": str(e)}, status=400)
+                return
+            self._json_response(to_columnar(graph) if fmt == "columnar" else graph)
+            return
+
+        # Lines are sent as Neo4j streams them; the first item is read before the headers,
+        # so a failure to start (e.g. Neo4j unavailable) still gets a plain error response
+        items = iter_graph(get_driver(), **options)
+        try:
+            first_item = next(items)
+        except Exception as e:
+            self._json_response({"error": str(e)}, status=400)
+            return
+
+        self._start_stream()
+        buffer = bytearray()
+        try:
+            for kind, item in itertools.chain([first_item], items):
+                line = {"type": kind, "cursor": item} if kind == "cursor" else {"type": kind, **item}
+                buffer += json.dumps(line, default=str).encode("utf-8") + b"\n"
+                if len(buffer) >= STREAM_CHUNK_BYTES:
+                    self._write_chunk(buffer)
+                    buffer.clear()
+        except Exception as e:
+            # Headers are already out; an error line tells the client the page is incomplete
+            buffer += json.dumps({"type": "error", "error": str(e)}).encode("utf-8") + b"\n"
+        self._write_chunk(buffer)
+        self._end_stream()
+
+    def _stream_query(self, cypher, params, max_rows=None, max_bytes=None):
+        """
+        Stream a Cypher result as NDJSON:
+
+            {"type": "columns", "columns": [...]}
+            {"type": "row", "row": {...}}                      one per record
+            {"type": "summary", "rows", "bytes", "truncated", "timeToFirstRowMs", "elapsedMs", "rowsPerSec"}
+
+        `truncated` is "maxRows" / "maxBytes" when a cap stopped the stream early.
+        Failures before the first line get a plain JSON error; later ones still
+        end the stream with the summary line, carrying an "error" field.
+        """
+        try:
+            max_rows = min(int(max_rows or STREAM_MAX_ROWS), STREAM_MAX_ROWS)
+            max_bytes = min(int(max_bytes or STREAM_MAX_BYTES), STREAM_MAX_BYTES)
+            d = get_driver()
+            # One row past the cap tells a truncated result from one that fits exactly
+            query = check_query(d, cypher, params, max_rows=max_rows + 1)
+        except QueryRejected as e:
+            self._json_response({"error": e.reason, "plan": e.plan}, status=422)
+            return
+        except Exception as e:
+            self._json_response({"error": str(e)}, status=400)
+            return
+
+        start = time.perf_counter()
+        first_row = None
+        rows = sent = 0
+        truncated = None
+        error = None
+        buffer = bytearray()
+        session = d.session(default_access_mode=READ_ACCESS)
+        try:
+            try:
+                result = session.run(Query(query, timeout=STREAM_TIMEOUT), params or {})
+                columns = list(result.keys())
+            except Exception as e:
+                self._json_response({"error": str(e)}, status=400)
+                return
+
+            self._start_stream()
+            buffer += json.dumps({"type": "columns", "columns": columns}).encode("utf-8") + b"\n"
+            try:
+                for record in result:
+                    if rows >= max_rows:
+                        truncated = "maxRows"
+                        break
+                    line = json.dumps({"type": "row", "row": strip_vectors(record.data())},
+                                      default=str).encode("utf-8") + b"\n"
+                    if sent + len(buffer) + len(line) > max_bytes:
+                        truncated = "maxBytes"
+                        break
+                    buffer += line
+                    rows += 1
+                    # Send the first row at once so the client sees it without waiting for a full chunk
+                    if first_row is None or len(buffer) >= STREAM_CHUNK_BYTES:
+                        first_row = first_row or time.perf_counter() - start
+                        self._write_chunk(buffer)
+                        sent += len(buffer)
+                        buffer.clear()
+                # Discards the rest of a truncated result instead of fetching it
+                result.consume()
+            except Exception as e:
+                # Headers are already out, so failures mid-stream are reported in the summary line
+                error = str(e)
+        finally:
+            try:
+                session.close()
+            except Exception as e:
+                error = error or str(e)
+
+        elapsed = time.perf_counter() - start
+        summary = {
+            "type": "summary",
+            "rows": rows,
+            "bytes": sent + len(buffer),
+            "truncated": truncated,
+            "timeToFirstRowMs": round(first_row * 1000, 1) if first_row is not None else None,
+            "elapsedMs": round(elapsed * 1000, 1),
+            "rowsPerSec": round(rows / elapsed) if elapsed > 0 else None,
+        }
+        if error:
+            summary["error"] = error
+        buffer += json.dumps(summary).encode("utf-8") + b"\n"
+        self._write_chunk(buffer)
+        self._end_stream()
+        print(f"  /api/query streamed {rows} rows, {summary['bytes'] / 1024:.0f} KB in {elapsed * 1000:.0f} ms "
+              f"(first row {summary['timeToFirstRowMs']} ms, {summary['rowsPerSec']} rows/s)"
+              + (f", truncated at {truncated}" if truncated else ""))
+
+    def _start_stream(self, content_type="application/x-ndjson"):
+        """Chunked response headers: the body length is unknown but the connection stays reusable."""
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, data):
+        if data:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+    def _end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _snapshot_response(self, snapshot, fmt):
+        """Serve the cached default graph, or 304 if the client already has this version."""
+        etag = snapshot.etag(fmt)
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        encoding, payload = snapshot.body(fmt, self.headers.get("Accept-Encoding", ""))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson" if fmt == "ndjson" else "application/json")
+        self.send_header("Content-Length", len(payload))
+        self.send_header("ETag", etag)
+        # Always revalidate: a new graph version must show up on the next load
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+        if encoding != "identity":
+            self.send_header("Content-Encoding", encoding)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _json_response(self, data, status=200, headers=None):
         payload = json.dumps(data, default=str).encode("utf-8")
         self.send_response(status)
         self.send_header("Content-Type", "application/json")
         self.send_header("Content-Length", len(payload))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
         self.end_headers()
         self.wfile.write(payload)
 
@@ -250,16 +642,19 @@ class GraphHandler(SimpleHTTPRequestHandler):
 
 
 def main():
-    get_driver()
-    server = HTTPServer(("0.0.0.0", PORT), GraphHandler)
-    print(f"Visualization server running at http://localhost:{PORT}")
+    global graph_cache
+    graph_cache = GraphSnapshotCache(get_driver()).start()
+    server = PooledHTTPServer(("0.0.0.0", PORT), GraphHandler)
+    print(f"Visualization server running at http://localhost:{PORT} ({SERVER_WORKERS} workers, {MAX_QUEUED} queued)")
     try:
         server.serve_forever()
     except KeyboardInterrupt:
         print("\nShutting down...")
     finally:
+        graph_cache.stop()
         if driver:
             driver.close()
+        question_cache.close()
         server.server_close()
 
 
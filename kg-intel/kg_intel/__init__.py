@@ -0,0 +1,6 @@
+"""
+Shared core of the kg-intel graph builders.
+
+`python -m kg_intel` runs the build pipeline (see kg_intel.pipeline); the
+per-domain builder scripts are thin wrappers around it.
+"""
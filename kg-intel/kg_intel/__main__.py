@@ -0,0 +1,3 @@
+from kg_intel.pipeline import main
+
+main()
@@ -0,0 +1,83 @@
+"""
+Connection settings and shared clients for the graph pipeline.
+
+Settings are read from the environment after loading kg-intel/.env. The Neo4j
+driver and the MongoDB client are created once per process and shared: the
+driver pools its connections, so every stage and every ParallelLoader worker
+borrows sessions from the same pool instead of opening a driver of its own.
+"""
+
+import os
+import threading
+from urllib.parse import quote_plus
+
+ENV_PATH = os.path.join(os.path.dirname(__file__), '..', '.env')
+
+NEO4J_MAX_POOL_SIZE = 50
+
+_lock = threading.Lock()
+_driver = None
+_mongo_client = None
+
+
+def load_env():
+    from dotenv import load_dotenv
+
+    load_dotenv(ENV_PATH)
+
+
+def mongo_uri(db_name=None):
+    """MONGO_URI if set, otherwise the Atlas URI built from the DB_* settings."""
+    if os.getenv("MONGO_URI"):
+        return os.environ["MONGO_URI"]
+    return (f"mongodb+srv://{os.environ['DB_USER']}:{quote_plus(os.environ['DB_PASSWORD'])}"
+            f"@{os.environ['DB_HOST']}/{db_name or os.environ['DB_NAME']}")
+
+
+def get_driver():
+    """The process-wide pooled Neo4j driver, connected on first use."""
+    global _driver
+    with _lock:
+        if _driver is None:
+            from neo4j import GraphDatabase
+
+            uri = os.environ["NEO4J_URI"]
+            driver = GraphDatabase.driver(
+                uri,
+                auth=(os.environ["NEO4J_USERNAME"], os.environ["NEO4J_PASSWORD"]),
+                max_connection_pool_size=int(os.getenv("NEO4J_MAX_POOL_SIZE", NEO4J_MAX_POOL_SIZE)),
+            )
+            driver.verify_connectivity()
+            print(f"Connected to Neo4j ({uri})")
+            _driver = driver
+        return _driver
+
+
+def get_mongo_db(db_name=None):
+    """The named (default DB_NAME) database on the process-wide MongoDB client."""
+    global _mongo_client
+    db_name = db_name or os.environ["DB_NAME"]
+    with _lock:
+        if _mongo_client is None:
+            from pymongo import MongoClient
+
+            _mongo_client = MongoClient(mongo_uri(db_name))
+            print(f"Connected to MongoDB ({os.getenv('DB_HOST', 'MONGO_URI')}/{db_name})")
+        return _mongo_client[db_name]
+
+
+def close_connections():
+    global _driver, _mongo_client
+    with _lock:
+        if _driver is not None:
+            _driver.close()
+            _driver = None
+        if _mongo_client is not None:
+            _mongo_client.close()
+            _mongo_client = None
+
+
+def run_cypher(driver, query, parameters=None):
+    with driver.session() as session:
+        result = session.run(query, parameters or {})
+        return [record.data() for record in result]
@@ -0,0 +1,125 @@
+"""
+Precomputed "related games" from sessions that visited more than one game.
+
+Reads every (Session)-[:VISITED]->(Game) edge once into a sparse
+sessions × games matrix X, so C = XᵀX holds the number of sessions each
+pair of games shares, and its diagonal holds the sessions per game. From C
+every pair gets two normalised scores:
+
+    jaccard = shared / (sessions_a + sessions_b - shared)
+    pmi     = log(shared * total_sessions / (sessions_a * sessions_b))
+
+and the top-K neighbours of each game are written as
+
+    (:Game)-[:CO_VISITED {weight, count, jaccard, pmi}]->(:Game)
+
+with weight = the chosen metric. A related-games lookup is then a single
+expansion over at most K relationships instead of a Session self-join whose
+cost grows with the square of the games per session. The relationships are
+replaced wholesale on every run.
+
+Requires numpy and scipy (pip install numpy scipy).
+"""
+
+from kg_intel.connections import run_cypher
+
+COVISIT_TOP_K = 20
+# Pairs sharing fewer sessions are noise (and make PMI explode)
+COVISIT_MIN_SHARED = 2
+COVISIT_METRIC = "jaccard"
+COVISIT_WRITE_BATCH_SIZE = 1000
+
+COVISITED_UPSERT = """
+    UNWIND $rows AS row
+    MATCH (a:Game {cmsId: row.source}), (b:Game {cmsId: row.target})
+    MERGE (a)-[r:CO_VISITED]->(b)
+    SET r.weight = row.weight, r.count = row.count, r.jaccard = row.jaccard, r.pmi = row.pmi
+"""
+
+
+def _require_scipy():
+    try:
+        import numpy as np
+        from scipy import sparse
+    except ImportError:
+        raise Exception("numpy and scipy are required for co-visitation (pip install numpy scipy)")
+    return np, sparse
+
+
+def visit_matrix(edges):
+    """Binary sessions × games CSR matrix from (sessionId, cmsId) pairs; returns (matrix, game ids)."""
+    np, sparse = _require_scipy()
+    sessions, games = {}, {}
+    rows, cols = [], []
+    for session_id, cms_id in edges:
+        rows.append(sessions.setdefault(session_id, len(sessions)))
+        cols.append(games.setdefault(cms_id, len(games)))
+    matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)),
+                               shape=(len(sessions), len(games)))
+    # Duplicate edges would be summed; visits are a set
+    matrix.data[:] = 1
+    return matrix, list(games)
+
+
+def top_neighbours(matrix, game_ids, k=COVISIT_TOP_K, min_shared=COVISIT_MIN_SHARED, metric=COVISIT_METRIC):
+    """CO_VISITED rows {source, target, weight, count, jaccard, pmi}: the top-k pairs per game by `metric`."""
+    np, sparse = _require_scipy()
+    if metric not in ("jaccard", "pmi"):
+        raise ValueError(f"Unknown co-visitation metric: {metric} (choose jaccard or pmi)")
+
+    total = matrix.shape[0]
+    shared = (matrix.T @ matrix).tocoo()
+    visits = np.asarray(matrix.sum(axis=0)).ravel()
+
+    keep = (shared.row != shared.col) & (shared.data >= min_shared)
+    a, b, count = shared.row[keep], shared.col[keep], shared.data[keep].astype(np.float64)
+    jaccard = count / (visits[a] + visits[b] - count)
+    pmi = np.log(count * total / (visits[a] * visits[b]))
+    weight = jaccard if metric == "jaccard" else pmi
+
+    # Rank each game's neighbours: sort by game, then by descending weight, and keep the first k per game
+    order = np.lexsort((-weight, a))
+    a, b, count, jaccard, pmi, weight = (x[order] for x in (a, b, count, jaccard, pmi, weight))
+    starts = np.searchsorted(a, a, side="left")
+    top = np.arange(len(a)) - starts < k
+
+    return [
+        {"source": game_ids[s], "target": game_ids[t], "weight": float(w), "count": int(c),
+         "jaccard": float(j), "pmi": float(p)}
+        for s, t, w, c, j, p in zip(a[top], b[top], weight[top], count[top], jaccard[top], pmi[top])
+    ]
+
+
+def clear_covisitation(driver):
+    # Deleted in batches so a large graph doesn't need one huge transaction
+    while run_cypher(driver, f"""
+        MATCH ()-[r:CO_VISITED]->() WITH r LIMIT {COVISIT_WRITE_BATCH_SIZE}
+        DELETE r RETURN count(*) AS deleted
+    """)[0]["deleted"]:
+        pass
+
+
+def build_covisitation(driver, k=COVISIT_TOP_K, min_shared=COVISIT_MIN_SHARED, metric=COVISIT_METRIC):
+    """Recompute every CO_VISITED relationship from the Session → Game edges; returns the count written."""
+    print(f"\n── Co-visitation (top {k} by {metric}) ──")
+    with driver.session() as session:
+        edges = [(r["session"], r["game"]) for r in session.run("""
+            MATCH (s:Session)-[:VISITED]->(g:Game)
+            RETURN s.sessionId AS session, g.cmsId AS game
+        """)]
+    if not edges:
+        clear_covisitation(driver)
+        print("  No session visits, skipped")
+        return 0
+
+    matrix, game_ids = visit_matrix(edges)
+    rows = top_neighbours(matrix, game_ids, k=k, min_shared=min_shared, metric=metric)
+
+    clear_covisitation(driver)
+    with driver.session() as session:
+        for start in range(0, len(rows), COVISIT_WRITE_BATCH_SIZE):
+            batch = rows[start:start + COVISIT_WRITE_BATCH_SIZE]
+            session.execute_write(lambda tx: tx.run(COVISITED_UPSERT, {"rows": batch}).consume())
+    print(f"  {len(rows)} CO_VISITED relationships across {len(game_ids)} games "
+          f"from {matrix.shape[0]} sessions ({len(edges)} visits)")
+    return len(rows)
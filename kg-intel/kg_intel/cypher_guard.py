@@ -0,0 +1,133 @@
+"""
+Checks ad-hoc and LLM-generated Cypher before it is allowed to run.
+
+check_query() rejects anything that writes, runs EXPLAIN (which plans the
+query without executing it) and walks the plan: an AllNodesScan or a
+CartesianProduct over many rows, or any operator the planner expects to
+produce more than MAX_ESTIMATED_ROWS rows, is refused with a QueryRejected
+that carries a one-line-per-operator summary of the plan. That summary is
+what the NL retry path shows the model so it can rewrite the query.
+
+Queries that pass get a LIMIT of at most `max_rows` appended (or an existing
+larger LIMIT lowered). Callers should still execute them in a READ_ACCESS
+session with a QUERY_TIMEOUT transaction timeout, so even a misjudged plan
+cannot write or run forever.
+"""
+
+import re
+
+from neo4j import Query, READ_ACCESS
+
+MAX_ROWS = 1000
+MAX_ESTIMATED_ROWS = 5_000_000
+# Full-graph scans and cartesian products are fine on small inputs only
+MAX_SCAN_ROWS = 100_000
+MAX_CARTESIAN_ROWS = 100_000
+QUERY_TIMEOUT = 30
+
+# Whole clause keywords only, not parts of names such as apoc.create.uuid() or n.set
+WRITE_CLAUSES = re.compile(
+    r"(?<![\w.$`])(CREATE|MERGE|DELETE|DETACH|SET|REMOVE|DROP|FOREACH|LOAD\s+CSV|IN\s+TRANSACTIONS)(?![\w.`])",
+    re.IGNORECASE)
+STRING_LITERALS = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+# Strings are matched first so a "//" inside a literal (e.g. an assetUrl) is not taken for a comment
+COMMENTS = re.compile(r"('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")|//[^\n]*|/\*.*?\*/", re.DOTALL)
+TRAILING_LIMIT = re.compile(r"\bLIMIT\s+(\d+|\$\w+)\s*$", re.IGNORECASE)
+
+
+class QueryRejected(ValueError):
+    def __init__(self, reason, plan=None):
+        super().__init__(reason)
+        self.reason = reason
+        self.plan = plan
+
+
+def _operator(plan):
+    return plan["operatorType"].split("@")[0]
+
+
+def _args(plan):
+    # The driver's plan dicts carry operator arguments under "args" (Bolt naming)
+    return plan.get("args") or {}
+
+
+def _estimated_rows(plan):
+    return float(_args(plan).get("EstimatedRows", 0))
+
+
+def _walk(plan):
+    yield plan
+    for child in plan.get("children", []):
+        yield from _walk(child)
+
+
+def summarize_plan(plan, depth=0):
+    """Indented "Operator  ~rows  details" lines, root first."""
+    details = _args(plan).get("Details", "")
+    lines = [f"{'  ' * depth}{_operator(plan)}  ~{_estimated_rows(plan):,.0f} rows  {details}".rstrip()]
+    for child in plan.get("children", []):
+        lines.extend(summarize_plan(child, depth + 1))
+    return lines if depth else "\n".join(lines)
+
+
+def plan_problems(plan):
+    """Why a plan is too expensive to run, as a list of sentences (empty if it is fine)."""
+    problems = []
+    for op in _walk(plan):
+        name, rows = _operator(op), _estimated_rows(op)
+        if name == "AllNodesScan" and rows > MAX_SCAN_ROWS:
+            problems.append(f"AllNodesScan over ~{rows:,.0f} nodes: match a label, e.g. (n:Game)")
+        elif name == "CartesianProduct" and rows > MAX_CARTESIAN_ROWS:
+            problems.append(f"CartesianProduct producing ~{rows:,.0f} rows: connect the patterns with a "
+                            "relationship or a WHERE join")
+        elif rows > MAX_ESTIMATED_ROWS:
+            problems.append(f"{name} is estimated at ~{rows:,.0f} rows: filter earlier or aggregate")
+    return problems
+
+
+def strip_comments(cypher):
+    return COMMENTS.sub(lambda m: m.group(1) or " ", cypher)
+
+
+def _code(cypher):
+    """The query with comments and string literals blanked, for keyword checks."""
+    return STRING_LITERALS.sub("''", strip_comments(cypher))
+
+
+def enforce_limit(cypher, max_rows=MAX_ROWS, params=None):
+    """Append LIMIT max_rows to a RETURN query, or lower a larger trailing LIMIT (literal or $param)."""
+    # A trailing comment would hide an existing LIMIT (and swallow an appended one)
+    cypher = strip_comments(cypher).rstrip().rstrip(";").rstrip()
+    code = _code(cypher)
+    if not re.search(r"\bRETURN\b", code, re.IGNORECASE) or re.search(r"\bUNION\b", code, re.IGNORECASE):
+        return cypher
+    match = TRAILING_LIMIT.search(cypher)
+    if match is None:
+        return f"{cypher}\nLIMIT {max_rows}"
+    limit = match.group(1)
+    limit = (params or {}).get(limit[1:]) if limit.startswith("$") else int(limit)
+    if not isinstance(limit, int) or limit > max_rows:
+        return cypher[:match.start()] + f"LIMIT {max_rows}"
+    return cypher
+
+
+def check_query(driver, cypher, params=None, max_rows=MAX_ROWS):
+    """The query to execute (with its LIMIT enforced); raises QueryRejected if it writes or plans too big."""
+    cypher = strip_comments(cypher).strip().rstrip(";").strip()
+    if not cypher:
+        raise QueryRejected("Empty query")
+    write = WRITE_CLAUSES.search(_code(cypher))
+    if write:
+        raise QueryRejected(f"Read-only: {write.group(1).upper()} is not allowed")
+    if re.match(r"\s*(EXPLAIN|PROFILE)\b", cypher, re.IGNORECASE):
+        raise QueryRejected("Send the query without EXPLAIN / PROFILE")
+
+    cypher = enforce_limit(cypher, max_rows, params)
+    with driver.session(default_access_mode=READ_ACCESS) as session:
+        plan = session.run(Query("EXPLAIN " + cypher, timeout=QUERY_TIMEOUT), params or {}).consume().plan
+    if plan:
+        problems = plan_problems(plan)
+        if problems:
+            raise QueryRejected("Query plan too expensive: " + "; ".join(problems), summarize_plan(plan))
+    return cypher
+
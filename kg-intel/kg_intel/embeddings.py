@@ -0,0 +1,193 @@
+"""
+Client-side text embeddings for the vector indexes.
+
+Each embedded node stores a content hash of its source text next to the
+vector, so a build only embeds nodes whose text changed since the last run.
+Texts that still need a vector are first looked up in a local SQLite cache
+(keyed by model + text hash, shared across builds and databases), and the
+rest are sent to the embedding API in multi-input requests from a small
+thread pool. Vectors are written back with one UNWIND per batch.
+
+FakeEmbedder returns deterministic unit vectors derived from the text, for
+offline builds and tests (`python -m kg_intel --fake-embeddings`).
+"""
+
+import os
+import math
+import array
+import random
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from kg_intel.connections import run_cypher
+from kg_intel.ingest import iter_batches, upsert_rows
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 1536
+EMBEDDING_BATCH_SIZE = 256
+EMBEDDING_CONCURRENCY = 4
+CACHE_PATH = os.path.join(os.path.dirname(__file__), '..', '.cache', 'embeddings.sqlite')
+
+# (index, label, key property, embedding property, Cypher text expression over n)
+EMBEDDINGS = [
+    ("game_name_embeddings", "Game", "cmsId", "nameEmbedding", "n.friendlyName"),
+    ("abtest_desc_embeddings", "ABTest", "testId", "descriptionEmbedding",
+     "CASE WHEN n.description <> '' THEN n.name + ' ' + n.description END"),
+    ("promo_desc_embeddings", "Promotion", "promoId", "descriptionEmbedding",
+     "CASE WHEN n.description <> '' THEN n.name + ' ' + n.description END"),
+]
+
+
+def content_hash(model, text):
+    return hashlib.sha256(f"{model}\n{text}".encode()).hexdigest()
+
+
+class OpenAIEmbedder:
+    """Multi-input OpenAI embedding requests, at most `concurrency` in flight."""
+
+    def __init__(self, model=EMBEDDING_MODEL, dimensions=EMBEDDING_DIMENSIONS, batch_size=EMBEDDING_BATCH_SIZE,
+                 concurrency=EMBEDDING_CONCURRENCY, api_key=None, endpoint=None):
+        try:
+            from openai import OpenAI
+        except ImportError:
+            raise Exception("openai is required for embeddings (pip install openai)")
+
+        endpoint = endpoint or os.getenv("OPENAI_ENDPOINT")
+        # OPENAI_ENDPOINT may be the full embeddings URL used by ai.text.embed
+        base_url = endpoint.rstrip("/").removesuffix("/embeddings") if endpoint else None
+        self.client = OpenAI(api_key=api_key or os.environ["OPENAI_API_KEY"], base_url=base_url)
+        self.model = model
+        self.dimensions = dimensions
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+
+    def _request(self, texts):
+        response = self.client.embeddings.create(model=self.model, input=texts, dimensions=self.dimensions)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    def embed(self, texts):
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            return [vector for vectors in pool.map(self._request, batches) for vector in vectors]
+
+
+class FakeEmbedder:
+    """Deterministic pseudo-random unit vectors seeded by the text; no network."""
+
+    def __init__(self, model="fake", dimensions=EMBEDDING_DIMENSIONS):
+        self.model = model
+        self.dimensions = dimensions
+        self.requests = 0
+
+    def embed(self, texts):
+        self.requests += 1
+        vectors = []
+        for text in texts:
+            rng = random.Random(hashlib.sha256(text.encode()).digest())
+            vector = [rng.gauss(0.0, 1.0) for _ in range(self.dimensions)]
+            norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+            vectors.append([v / norm for v in vector])
+        return vectors
+
+
+class EmbeddingCache:
+    """Persistent content-hash → vector store (float32 blobs in SQLite)."""
+
+    def __init__(self, path=CACHE_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS embeddings (hash TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self.conn.commit()
+
+    def get_many(self, hashes):
+        found = {}
+        with self.lock:
+            for chunk in iter_batches(hashes, 500):
+                placeholders = ",".join("?" * len(chunk))
+                for key, blob in self.conn.execute(
+                        f"SELECT hash, vector FROM embeddings WHERE hash IN ({placeholders})", chunk):
+                    found[key] = array.array("f", blob).tolist()
+        return found
+
+    def put_many(self, vectors):
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (hash, vector) VALUES (?, ?)",
+                [(key, array.array("f", vector).tobytes()) for key, vector in vectors.items()],
+            )
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def _create_index(driver, index, label, prop, dimensions):
+    run_cypher(driver, f"""
+        CREATE VECTOR INDEX {index} IF NOT EXISTS
+        FOR (n:{label}) ON (n.{prop})
+        OPTIONS {{
+            indexConfig: {{
+                `vector.dimensions`: {dimensions},
+                `vector.similarity_function`: 'cosine'
+            }}
+        }}
+    """)
+
+
+def embed_label(driver, embedder, cache, index, label, key, prop, text):
+    """Embed the nodes of one label whose text hash changed; returns (changed, from_cache, requested)."""
+    _create_index(driver, index, label, prop, embedder.dimensions)
+    nodes = run_cypher(driver, f"""
+        MATCH (n:{label})
+        WITH n, {text} AS text
+        WHERE text IS NOT NULL AND text <> ''
+        RETURN n.{key} AS key, text, n.{prop}Hash AS hash, n.{prop} IS NULL AS missing
+    """)
+
+    stale = {}
+    for node in nodes:
+        digest = content_hash(embedder.model, node["text"])
+        if node["missing"] or node["hash"] != digest:
+            stale[node["key"]] = (digest, node["text"])
+    if not stale:
+        print(f"  {label}: {len(nodes)} embeddings up to date")
+        return 0, 0, 0
+
+    hashes = list({digest for digest, _ in stale.values()})
+    vectors = cache.get_many(hashes)
+    texts = {digest: text for digest, text in stale.values() if digest not in vectors}
+    if texts:
+        fresh = dict(zip(texts, embedder.embed(list(texts.values()))))
+        cache.put_many(fresh)
+        vectors.update(fresh)
+
+    rows = [{"key": k, "hash": digest, "vector": vectors[digest]} for k, (digest, _) in stale.items()]
+    upsert_rows(driver, f"""
+        UNWIND $rows AS row
+        MATCH (n:{label} {{{key}: row.key}})
+        CALL db.create.setNodeVectorProperty(n, '{prop}', row.vector)
+        SET n.{prop}Hash = row.hash
+        REMOVE n.{prop}Source
+    """, rows, batch_size=200)
+    print(f"  {label}: embedded {len(stale)} changed of {len(nodes)} "
+          f"({len(hashes) - len(texts)} from cache, {len(texts)} requested)")
+    return len(stale), len(hashes) - len(texts), len(texts)
+
+
+def create_embeddings(driver, embedder=None, cache_path=CACHE_PATH):
+    print("\n── Creating vector indexes and embeddings ──")
+    embedder = embedder or OpenAIEmbedder()
+    cache = EmbeddingCache(cache_path)
+    try:
+        for spec in EMBEDDINGS:
+            embed_label(driver, embedder, cache, *spec)
+    finally:
+        cache.close()
+
+    for idx in run_cypher(driver, "SHOW VECTOR INDEXES"):
+        print(f"  Index: {idx.get('name')} — state: {idx.get('state')}")
@@ -0,0 +1,237 @@
+"""
+Graph export for the visualization server's /api/graph.
+
+The graph is read label by label and yielded as ("node", dict) and
+("link", dict) items straight off the Bolt result stream, so callers can
+write NDJSON as records arrive instead of building the whole graph in
+memory. Three knobs keep large graphs usable:
+
+- labels: only these labels are exported (internal bookkeeping labels such
+  as SyncState and the rollup nodes never are), and only links whose both
+  ends carry one of them, so the client never gets a dangling edge.
+  link_labels widens the allowed link targets to labels the client already
+  holds, e.g. Game and Session when drilling into a game's events.
+- cursor / limit: pages of at most `limit` nodes ordered by label and node
+  id; the last item of a page is ("cursor", next_cursor or None).
+- level of detail: with lod=True the ABTestEvent / AnalyticsEvent nodes are
+  left out and replaced by aggregate Variant→Game EVENTS links and per-game
+  event counts taken from the rollups. Passing `game` with lod=False
+  drills into the event nodes of a single game.
+
+Node properties are projected in Cypher from the NODE_PROPERTIES allow-list,
+so the 1536-float embedding vectors on Game / ABTest / Promotion never leave
+Neo4j. Labels without an allow-list get every key except the embedding ones,
+again filtered server-side. `to_columnar` packs a fetched page into column
+arrays grouped by label, which repeats no property names and compresses well.
+"""
+
+INTERNAL_LABELS = ("SyncState", "GameDaily", "VariantDaily")
+EVENT_LABELS = ("ABTestEvent", "AnalyticsEvent")
+PAGE_SIZE = 5000
+
+# label → properties shipped to the browser (mirrors the SETs in kg_intel.mappings)
+NODE_PROPERTIES = {
+    "Game": ("cmsId", "friendlyName", "group", "publishedType", "animate", "hover", "analytics", "mongoId"),
+    "ABTest": ("testId", "name", "description", "startDate", "endDate", "startTime", "endTime", "published",
+               "group", "mongoId"),
+    "Variant": ("testId", "type", "image", "video"),
+    "ABTestEvent": ("eventId", "eventType", "device", "timestamp", "date", "gameId", "distributionWeight",
+                    "mongoId"),
+    "Session": ("sessionId", "userId", "accountId", "firstEvent", "lastEvent", "eventCount", "device"),
+    "AnalyticsEvent": ("eventId", "eventType", "assetType", "assetUrl", "timestamp", "date", "gameId", "device",
+                       "mongoId"),
+    "Promotion": ("promoId", "name", "description", "group", "startDate", "endDate", "published", "mongoId"),
+    "PromoGame": ("promoId", "gameCmsId", "friendlyName", "promoVideo"),
+}
+VECTOR_SUFFIXES = ("Embedding", "EmbeddingHash")
+
+
+def encode_cursor(label, last_id):
+    return f"{label}:{last_id}"
+
+
+def decode_cursor(cursor):
+    label, _, last_id = cursor.rpartition(":")
+    return label, int(last_id)
+
+
+def graph_labels(driver, lod=True):
+    """Labels shown in the visualization, in export order."""
+    excluded = set(INTERNAL_LABELS) | (set(EVENT_LABELS) if lod else set())
+    with driver.session() as session:
+        labels = [r["label"] for r in session.run("CALL db.labels() YIELD label RETURN label")]
+    return sorted(label for label in labels if label not in excluded)
+
+
+def display_name(label, props):
+    if label == "Session":
+        sid = props.get("sessionId", "")
+        return sid[:24] + "..." if len(sid) > 24 else sid
+    return (
+        props.get("friendlyName")
+        or props.get("name")
+        or props.get("type")
+        or props.get("eventType")
+        or label
+    )
+
+
+def projection(label, var="n"):
+    """Cypher expression for the shipped properties of a `label` node bound to `var`."""
+    props = NODE_PROPERTIES.get(label)
+    if props:
+        return var + " {" + ", ".join(f"`{p}`: {var}.`{p}`" for p in props) + "}"
+    # Unknown label: every key except the vectors, as [key, value] pairs
+    excluded = " OR ".join(f"k ENDS WITH '{suffix}'" for suffix in VECTOR_SUFFIXES)
+    return f"[k IN keys({var}) WHERE NOT ({excluded}) | [k, {var}[k]]]"
+
+
+def strip_vectors(value):
+    """Drop embedding properties from a node / relationship / dict (and lists of them) for display."""
+    if isinstance(value, list):
+        return [strip_vectors(v) for v in value]
+    if hasattr(value, "items"):
+        return {k: strip_vectors(v) for k, v in value.items() if not k.endswith(VECTOR_SUFFIXES)}
+    return value
+
+
+def _node(record):
+    label = record["labels"][0] if record["labels"] else "Unknown"
+    props = record["props"]
+    if isinstance(props, list):
+        props = dict(props)
+    props = {k: v for k, v in props.items() if v is not None}
+    return {"id": record["id"], "label": label, "name": display_name(label, props), "props": props}
+
+
+def _game_event_counts(session):
+    """Analytics and A/B test event totals per game, summed from the GameDaily rollups."""
+    counts = {}
+    for r in session.run("""
+        MATCH (gd:GameDaily)
+        RETURN gd.cmsId AS cmsId, gd.source AS source, sum(gd.count) AS events
+    """):
+        counts.setdefault(r["cmsId"], {})[f"{r['source']}Events"] = r["events"]
+    return counts
+
+
+def _aggregate_links(session):
+    """One EVENTS link per Variant→Game carrying the variant's event count."""
+    for r in session.run("""
+        MATCH (t:ABTest)-[:HAS_VARIANT]->(v:Variant), (t)-[:TESTS]->(g:Game)
+        OPTIONAL MATCH (vd:VariantDaily {testId: v.testId, variant: v.type})
+        WITH v, g, sum(vd.count) AS events
+        RETURN id(v) AS source, id(g) AS target, events
+    """):
+        yield {"source": r["source"], "target": r["target"], "type": "EVENTS", "count": r["events"],
+               "aggregate": True}
+
+
+def iter_graph(driver, labels=None, lod=True, game=None, cursor=None, limit=None, link_labels=None):
+    """Yield ("node", ...), ("link", ...) and finally ("cursor", next_or_None) items."""
+    all_labels = graph_labels(driver, lod=lod)
+    hidden = set(INTERNAL_LABELS) | (set(EVENT_LABELS) if lod else set())
+    labels = sorted(label for label in (labels or all_labels) if label not in hidden)
+    # Link targets must be exported too (or already held by the client, link_labels); this is
+    # the full selection, before the cursor narrows it
+    shown = sorted(set(labels) | {label for label in link_labels or () if label not in hidden})
+
+    aggregate = lod and "Variant" in labels and "Game" in labels
+
+    start_label, after = decode_cursor(cursor) if cursor else (None, -1)
+    if start_label is not None:
+        labels = [label for label in labels if label >= start_label]
+
+    remaining = limit
+    with driver.session() as session:
+        game_counts = _game_event_counts(session) if lod and "Game" in labels else {}
+
+        for label in labels:
+            after_id = after if label == start_label else -1
+            # Drilling into one game only narrows the event labels
+            game_filter = "AND (n)-[:ON_GAME]->(:Game {cmsId: $game})" if game and label in EVENT_LABELS else ""
+            page = f"ORDER BY id(n) LIMIT {int(remaining)}" if remaining is not None else ""
+            records = session.run(f"""
+                MATCH (n:`{label}`) WHERE id(n) > $after {game_filter}
+                RETURN id(n) AS id, labels(n) AS labels, {projection(label)} AS props
+                {page}
+            """, {"after": after_id, "game": game})
+
+            ids = []
+            for record in records:
+                node = _node(record)
+                if label == "Game" and game_counts:
+                    node["props"].update(game_counts.get(node["props"].get("cmsId"), {}))
+                ids.append(node["id"])
+                yield "node", node
+
+            if not ids:
+                continue
+            if remaining is None:
+                links = session.run(f"""
+                    MATCH (n:`{label}`)-[r]->(b) WHERE id(n) > $after {game_filter}
+                      AND any(l IN labels(b) WHERE l IN $shown)
+                    RETURN id(n) AS source, id(b) AS target, type(r) AS type
+                """, {"after": after_id, "game": game, "shown": shown})
+            else:
+                links = session.run("""
+                    MATCH (a)-[r]->(b) WHERE id(a) IN $ids AND any(l IN labels(b) WHERE l IN $shown)
+                    RETURN id(a) AS source, id(b) AS target, type(r) AS type
+                """, {"ids": ids, "shown": shown})
+            for r in links:
+                yield "link", {"source": r["source"], "target": r["target"], "type": r["type"]}
+
+            if remaining is not None:
+                remaining -= len(ids)
+                if remaining <= 0:
+                    yield "cursor", encode_cursor(label, ids[-1])
+                    return
+
+        if aggregate:
+            for link in _aggregate_links(session):
+                yield "link", link
+    yield "cursor", None
+
+
+def fetch_graph(driver, **options):
+    """The whole (filtered) page as one {nodes, links, cursor} dict."""
+    graph = {"nodes": [], "links": [], "cursor": None}
+    for kind, item in iter_graph(driver, **options):
+        if kind == "cursor":
+            graph["cursor"] = item
+        else:
+            graph[kind + "s"].append(item)
+    return graph
+
+
+def to_columnar(graph):
+    """
+    Pack a fetch_graph() page into columns:
+
+        {"nodes": {label: {"id": [...], "name": [...], "props": {prop: [...]}}},
+         "links": {"types": [...], "source": [...], "target": [...], "type": [type index], "count": [...]},
+         "cursor": ...}
+    """
+    nodes = {}
+    for node in graph["nodes"]:
+        group = nodes.setdefault(node["label"], {"id": [], "name": [], "props": {}})
+        row = len(group["id"])
+        group["id"].append(node["id"])
+        group["name"].append(node["name"])
+        for prop, value in node["props"].items():
+            group["props"].setdefault(prop, [None] * row).append(value)
+        for column in group["props"].values():
+            if len(column) <= row:
+                column.append(None)
+
+    types = {}
+    links = {"types": [], "source": [], "target": [], "type": [], "count": []}
+    for link in graph["links"]:
+        if link["type"] not in types:
+            types[link["type"]] = len(types)
+            links["types"].append(link["type"])
+        links["source"].append(link["source"])
+        links["target"].append(link["target"])
+        links["type"].append(types[link["type"]])
+        links["count"].append(link.get("count"))
+    return {"nodes": nodes, "links": links, "cursor": graph["cursor"]}
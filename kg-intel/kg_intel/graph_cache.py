@@ -0,0 +1,114 @@
+"""
+Pre-serialized, compressed snapshot of the default /api/graph payload.
+
+The browser's first load always asks for the same view (lod=1, no filters),
+and the graph only changes when a builder or the live updater bumps the
+graph version on SyncState. GraphSnapshotCache keeps that view encoded as
+JSON, NDJSON and columnar JSON, each also gzip- (and, if the brotli package
+is installed, brotli-) compressed, tagged with an ETag derived from the
+version. A daemon thread polls the version and rebuilds the snapshot in the
+background, swapping it in only once it is complete, so requests are served
+from memory and never wait for Neo4j.
+"""
+
+import gzip
+import json
+import threading
+
+from kg_intel.graph_api import fetch_graph, to_columnar
+from kg_intel.sync_state import load_graph_version
+
+VERSION_POLL_SECONDS = 5
+FORMATS = ("json", "ndjson", "columnar")
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def encode_graph(graph, fmt):
+    if fmt == "columnar":
+        return json.dumps(to_columnar(graph), default=str).encode("utf-8")
+    if fmt == "ndjson":
+        lines = [json.dumps({"type": "node", **n}, default=str) for n in graph["nodes"]]
+        lines += [json.dumps({"type": "link", **l}, default=str) for l in graph["links"]]
+        lines.append(json.dumps({"type": "cursor", "cursor": graph["cursor"]}))
+        return ("\n".join(lines) + "\n").encode("utf-8")
+    return json.dumps(graph, default=str).encode("utf-8")
+
+
+class GraphSnapshot:
+    """One graph version's payloads: {format: {"identity"|"gzip"|"br": bytes}}."""
+
+    def __init__(self, version, graph):
+        self.version = version
+        self.nodes = len(graph["nodes"])
+        self.links = len(graph["links"])
+        brotli = _brotli()
+        self.bodies = {}
+        for fmt in FORMATS:
+            raw = encode_graph(graph, fmt)
+            bodies = {"identity": raw, "gzip": gzip.compress(raw, compresslevel=6)}
+            if brotli is not None:
+                bodies["br"] = brotli.compress(raw, quality=5)
+            self.bodies[fmt] = bodies
+
+    def etag(self, fmt):
+        return f'"g{self.version or 0}-{fmt}"'
+
+    def body(self, fmt, accept_encoding=""):
+        """(content encoding, bytes) for the best encoding the client accepts."""
+        accepted = {part.split(";")[0].strip() for part in accept_encoding.split(",")}
+        bodies = self.bodies[fmt]
+        for encoding in ("br", "gzip"):
+            if encoding in bodies and encoding in accepted:
+                return encoding, bodies[encoding]
+        return "identity", bodies["identity"]
+
+
+class GraphSnapshotCache:
+    def __init__(self, driver, poll_seconds=VERSION_POLL_SECONDS):
+        self.driver = driver
+        self.poll_seconds = poll_seconds
+        self.snapshot = None
+        # Last graph version seen by the poller; also used to expire cached query results
+        self.version = None
+        self.rebuilds = 0
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def refresh(self):
+        """Rebuild if the graph version moved; returns True when a new snapshot was swapped in."""
+        version = self.version = load_graph_version(self.driver)
+        current = self.snapshot
+        if current is not None and current.version == version:
+            return False
+        snapshot = GraphSnapshot(version, fetch_graph(self.driver, lod=True))
+        # A plain attribute swap: readers see either the old or the new snapshot, never a partial one
+        self.snapshot = snapshot
+        self.rebuilds += 1
+        print(f"  Graph snapshot v{version}: {snapshot.nodes} nodes, {snapshot.links} links, "
+              f"{len(snapshot.bodies['json']['gzip']) / 1024:.0f} KB gzipped")
+        return True
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"  Graph snapshot refresh failed: {e}")
+            self._stopping.wait(self.poll_seconds)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="graph-snapshot", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_seconds)
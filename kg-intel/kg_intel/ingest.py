@@ -0,0 +1,182 @@
+"""
+Batched writes for the graph builders.
+
+Rows are grouped into UNWIND batches and every batch runs in its own explicit
+write transaction on a single session, so N entities cost ceil(N / batch_size)
+round-trips instead of one (or several) per entity. ParallelLoader spreads
+large event loads over several sessions.
+"""
+
+import time
+import zlib
+import queue
+import threading
+
+UPSERT_BATCH_SIZE = 1000
+
+
+def iter_batches(items, batch_size):
+    """Group any iterable into lists of batch_size without materializing it."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def unique_rows(rows, key):
+    """The last row for each value of `key`, in first-seen order (an UNWIND sees duplicates as separate rows)."""
+    latest = {}
+    for row in rows:
+        latest[row.get(key)] = row
+    return list(latest.values())
+
+
+def _write_rows(tx, query, rows):
+    tx.run(query, {"rows": rows}).consume()
+
+
+def upsert_rows(driver, query, rows, batch_size=UPSERT_BATCH_SIZE):
+    """
+    Run an `UNWIND $rows` statement over rows in batches on one session.
+
+    Each batch is an explicit transaction (retried by the driver on transient
+    errors). Returns the number of rows written.
+    """
+    written = 0
+    with driver.session() as session:
+        for batch in iter_batches(rows, batch_size):
+            session.execute_write(_write_rows, query, batch)
+            written += len(batch)
+    return written
+
+
+# ── Parallel partitioned loading ─────────────────────────────────────────────
+
+_DONE = object()
+
+
+class LoadStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rows = 0
+        self.batches = 0
+        self.retries = 0
+        self.tx_seconds = 0.0
+
+    def record(self, rows, seconds, retries):
+        with self.lock:
+            self.rows += rows
+            self.batches += 1
+            self.retries += retries
+            self.tx_seconds += seconds
+
+
+class ParallelLoader:
+    """
+    Writes `UNWIND $rows` batches from a pool of worker sessions.
+
+    Rows are partitioned by a hash of `partition_key`, so every row touching a
+    given node (e.g. one Game) is written by the same worker and workers don't
+    contend for the same relationship locks. Each worker resizes its batches
+    toward `target_seconds` per transaction; deadlocks and other transient
+    errors are retried by the driver's managed transactions. With
+    `unique_key`, each batch keeps only the last row per key value.
+    """
+
+    def __init__(self, driver, query, partition_key, workers=4, batch_size=500,
+                 target_seconds=0.5, min_batch_size=50, max_batch_size=10000, unique_key=None):
+        self.driver = driver
+        self.query = query
+        self.partition_key = partition_key
+        self.unique_key = unique_key
+        self.workers = max(1, workers)
+        self.target_seconds = target_seconds
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.stats = LoadStats()
+        self.batch_sizes = [batch_size] * self.workers
+        self.errors = []
+
+    def partition_of(self, row):
+        return zlib.crc32(str(row.get(self.partition_key, "")).encode()) % self.workers
+
+    def _next_batch_size(self, size, seconds):
+        if seconds <= 0:
+            return min(size * 2, self.max_batch_size)
+        # Move toward the target, at most doubling or halving per step
+        scaled = size * self.target_seconds / seconds
+        scaled = max(size / 2, min(size * 2, scaled))
+        return int(max(self.min_batch_size, min(self.max_batch_size, scaled)))
+
+    def _write(self, session, worker, rows):
+        if self.unique_key is not None:
+            rows = unique_rows(rows, self.unique_key)
+        attempts = [0]
+
+        def work(tx):
+            attempts[0] += 1
+            tx.run(self.query, {"rows": rows}).consume()
+
+        start = time.perf_counter()
+        session.execute_write(work)
+        elapsed = time.perf_counter() - start
+        self.stats.record(len(rows), elapsed, attempts[0] - 1)
+        self.batch_sizes[worker] = self._next_batch_size(self.batch_sizes[worker], elapsed)
+
+    def _worker(self, worker, inbox):
+        pending = []
+        with self.driver.session() as session:
+            while True:
+                row = inbox.get()
+                if row is _DONE:
+                    break
+                if self.errors:
+                    continue  # keep draining so the producer never blocks
+                pending.append(row)
+                if len(pending) >= self.batch_sizes[worker]:
+                    try:
+                        self._write(session, worker, pending)
+                    except Exception as e:
+                        self.errors.append(e)
+                    pending = []
+            if pending and not self.errors:
+                try:
+                    self._write(session, worker, pending)
+                except Exception as e:
+                    self.errors.append(e)
+
+    def load(self, rows):
+        """Partition and write every row; returns the number of rows written."""
+        inboxes = [queue.Queue(maxsize=self.max_batch_size * 2) for _ in range(self.workers)]
+        threads = [
+            threading.Thread(target=self._worker, args=(i, inbox), name=f"kg-loader-{i}", daemon=True)
+            for i, inbox in enumerate(inboxes)
+        ]
+        for thread in threads:
+            thread.start()
+
+        start = time.perf_counter()
+        try:
+            for row in rows:
+                inboxes[self.partition_of(row)].put(row)
+                if self.errors:
+                    break
+        finally:
+            for inbox in inboxes:
+                inbox.put(_DONE)
+            for thread in threads:
+                thread.join()
+        if self.errors:
+            raise self.errors[0]
+
+        elapsed = time.perf_counter() - start
+        rate = self.stats.rows / elapsed if elapsed > 0 else 0.0
+        print(f"  Wrote {self.stats.rows} rows in {self.stats.batches} batches with {self.workers} workers "
+              f"({rate:.0f} rows/s, {self.stats.retries} retried transactions, "
+              f"batch sizes now {self.batch_sizes})")
+        return self.stats.rows
+
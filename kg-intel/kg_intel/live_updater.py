@@ -0,0 +1,287 @@
+"""
+Keeps the Neo4j graph current by tailing MongoDB change streams.
+
+Watches game, abtest, abtestdata, analytics and promotion, folds the changes
+into micro-batches and applies each batch as UNWIND upserts/deletes using the
+same mappings as the batch builders. The resume token of the last applied
+change is written in the same transaction as the batch, so a crashed or
+restarted updater continues exactly where the graph left off. Each batch
+also bumps the graph version read by the visualization server's cache.
+
+Only insert / update / replace / delete events are applied. An invalidate
+event (the database was dropped or renamed) clears the stored token and runs
+a full incremental re-sync (marks reset, deletes detected) before watching
+again from the point the re-sync started.
+
+Run the batch builders (or their --incremental mode) once first; the updater
+only applies changes made after it starts.
+
+Change streams need a replica set. For local testing a single-node one works:
+    docker run -d --name kg-mongo -p 27017:27017 mongo:7 --replSet rs0
+    docker exec kg-mongo mongosh --quiet --eval "rs.initiate()"
+
+Usage:
+    python -m kg_intel.live_updater [--mongo-uri mongodb://localhost:27017/?directConnection=true]
+                                    [--db NAME] [--flush-interval 2] [--flush-size 500] [--reset]
+"""
+
+import os
+import time
+import signal
+import argparse
+
+from kg_intel.mappings import (
+    game_params, abtest_params, abtest_event_params, analytics_event_params, promotion_params,
+    GAME_UPSERT, ABTEST_UPSERT, ABTEST_EVENT_UPSERT, ANALYTICS_EVENT_UPSERT, PROMOTION_UPSERT,
+    SESSION_EVENT_INCREMENT, DELETE_BY_MONGO_ID,
+)
+from kg_intel.ingest import unique_rows
+from kg_intel.schema import ensure_schema
+from kg_intel.connections import load_env, get_driver, get_mongo_db, close_connections
+from kg_intel.sync_state import bump_graph_version
+from kg_intel.pipeline import Pipeline
+
+# Applied in this order so relationships find the nodes they point at
+COLLECTIONS = ("game", "abtest", "promotion", "abtestdata", "analytics")
+
+# Event rows are deduplicated on this key: a repeated eventId would look new twice to the rollups
+EVENT_COLLECTIONS = ("abtestdata", "analytics")
+
+MAPPINGS = {
+    "game": (game_params, GAME_UPSERT),
+    "abtest": (abtest_params, ABTEST_UPSERT),
+    "promotion": (promotion_params, PROMOTION_UPSERT),
+    "abtestdata": (abtest_event_params, ABTEST_EVENT_UPSERT),
+    "analytics": (analytics_event_params, ANALYTICS_EVENT_UPSERT),
+}
+
+RESUME_STATE_KEY = "changeStream"
+# drop / rename / dropDatabase carry no documentKey and are not per-document changes
+CHANGE_OPERATIONS = ("insert", "update", "replace", "delete")
+
+FLUSH_INTERVAL = 2.0
+FLUSH_SIZE = 500
+# Persist the token of an idle stream this often so the oplog window can't overtake it
+IDLE_CHECKPOINT_SECONDS = 60
+
+
+class ChangeBatch:
+    """Pending changes, keyed by _id so repeated updates collapse to the latest document."""
+
+    def __init__(self):
+        self.upserts = {c: {} for c in COLLECTIONS}
+        self.deletes = {c: set() for c in COLLECTIONS}
+        # Analytics inserts also bump their Session; updates must not count twice
+        self.session_events = {}
+        self.resume_token = None
+        self.size = 0
+        self.started = None
+
+    def add(self, change):
+        self.resume_token = change["_id"]
+        op = change["operationType"]
+        if op not in CHANGE_OPERATIONS:
+            return
+        coll = change["ns"]["coll"]
+        key = str(change["documentKey"]["_id"])
+        doc = change.get("fullDocument")
+
+        if op in ("insert", "update", "replace") and doc is not None:
+            self.deletes[coll].discard(key)
+            self.upserts[coll][key] = doc
+            if coll == "analytics" and op == "insert":
+                self.session_events[key] = doc
+        elif op in ("insert", "update", "replace", "delete"):
+            # A missing fullDocument means the document was deleted before the lookup
+            self.upserts[coll].pop(key, None)
+            self.session_events.pop(key, None)
+            self.deletes[coll].add(key)
+
+        self.size += 1
+        if self.started is None:
+            self.started = time.monotonic()
+
+    def due(self, flush_size, flush_interval):
+        if self.size == 0:
+            return False
+        return self.size >= flush_size or time.monotonic() - self.started >= flush_interval
+
+    def summary(self):
+        parts = []
+        for coll in COLLECTIONS:
+            if self.upserts[coll] or self.deletes[coll]:
+                parts.append(f"{coll} +{len(self.upserts[coll])}/-{len(self.deletes[coll])}")
+        return ", ".join(parts) or "no graph changes"
+
+
+def apply_batch(tx, batch):
+    for coll in COLLECTIONS:
+        if batch.deletes[coll]:
+            tx.run(DELETE_BY_MONGO_ID[coll], {"ids": list(batch.deletes[coll])}).consume()
+
+        to_params, upsert = MAPPINGS[coll]
+        # Before the event upsert, so the increment can tell new events from ones already applied
+        if coll == "analytics" and batch.session_events:
+            rows = unique_rows([analytics_event_params(batch.upserts[coll].get(key, doc))
+                                for key, doc in batch.session_events.items()], "eventId")
+            tx.run(SESSION_EVENT_INCREMENT, {"rows": rows}).consume()
+        rows = [to_params(doc) for doc in batch.upserts[coll].values()]
+        if coll in EVENT_COLLECTIONS:
+            rows = unique_rows(rows, "eventId")
+        if rows:
+            tx.run(upsert, {"rows": rows}).consume()
+
+    save_resume_token(tx, batch.resume_token)
+    bump_graph_version(tx)
+
+
+def save_resume_token(tx, token):
+    from bson import json_util
+
+    tx.run("""
+        MERGE (s:SyncState {collection: $key})
+        SET s.resumeToken = $token,
+            s.lastSyncedAt = datetime()
+    """, {"key": RESUME_STATE_KEY, "token": json_util.dumps(token)}).consume()
+
+
+def load_resume_token(driver):
+    from bson import json_util
+
+    with driver.session() as session:
+        record = session.run("""
+            MATCH (s:SyncState {collection: $key})
+            RETURN s.resumeToken AS token
+        """, {"key": RESUME_STATE_KEY}).single()
+    if record is None or not record["token"]:
+        return None
+    return json_util.loads(record["token"])
+
+
+def clear_resume_token(driver):
+    with driver.session() as session:
+        session.run("""
+            MATCH (s:SyncState {collection: $key})
+            REMOVE s.resumeToken
+        """, {"key": RESUME_STATE_KEY}).consume()
+
+
+class LiveGraphUpdater:
+    def __init__(self, driver, db, flush_interval=FLUSH_INTERVAL, flush_size=FLUSH_SIZE):
+        self.driver = driver
+        self.db = db
+        self.db_name = db.name
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.stopping = False
+        self.applied = 0
+
+    def stop(self, *_):
+        self.stopping = True
+
+    def flush(self, batch):
+        start = time.perf_counter()
+        with self.driver.session() as session:
+            session.execute_write(apply_batch, batch)
+        self.applied += batch.size
+        print(f"  Applied {batch.size} changes in {(time.perf_counter() - start) * 1000:.0f} ms "
+              f"({batch.summary()})")
+
+    def checkpoint(self, token):
+        with self.driver.session() as session:
+            session.execute_write(save_resume_token, token)
+
+    def resync(self):
+        """Re-sync every collection after the stream was invalidated; returns the cluster time it started at."""
+        print("  Change stream invalidated (database dropped or renamed), re-syncing the whole graph")
+        clear_resume_token(self.driver)
+        started_at = self.db.command("ping").get("operationTime")
+        Pipeline(incremental=True, detect_deletes=True, reset_marks=True, db_name=self.db_name).run()
+        return started_at
+
+    def run(self):
+        token = load_resume_token(self.driver)
+        print(f"Watching {', '.join(COLLECTIONS)} "
+              f"({'resuming from stored token' if token else 'starting from now'})")
+        start_at = None
+        while not self.stopping:
+            if not self.watch(token, start_at):
+                break
+            # Changes made while the re-sync runs are replayed from its start time
+            token, start_at = None, self.resync()
+        print(f"Stopped after applying {self.applied} changes")
+
+    def watch(self, token=None, start_at=None):
+        """Apply changes until stopped (returns False) or the stream is invalidated (returns True)."""
+        pipeline = [{"$match": {"$or": [
+            {"operationType": {"$in": list(CHANGE_OPERATIONS)}, "ns.coll": {"$in": list(COLLECTIONS)}},
+            {"operationType": "invalidate"},
+        ]}}]
+        # Wake up at least once per flush interval so partial batches still get flushed
+        await_ms = max(100, int(self.flush_interval * 1000))
+        batch = ChangeBatch()
+        last_checkpoint = time.monotonic()
+        invalidated = False
+
+        with self.db.watch(pipeline, full_document="updateLookup", resume_after=token,
+                           start_at_operation_time=start_at if token is None else None,
+                           max_await_time_ms=await_ms) as stream:
+            while stream.alive and not self.stopping:
+                change = stream.try_next()
+                if change is not None:
+                    if change["operationType"] == "invalidate":
+                        invalidated = True
+                        break
+                    batch.add(change)
+
+                if batch.due(self.flush_size, self.flush_interval):
+                    self.flush(batch)
+                    batch = ChangeBatch()
+                    last_checkpoint = time.monotonic()
+                elif (batch.size == 0 and stream.resume_token is not None
+                      and time.monotonic() - last_checkpoint >= IDLE_CHECKPOINT_SECONDS):
+                    self.checkpoint(stream.resume_token)
+                    last_checkpoint = time.monotonic()
+
+            if batch.size:
+                self.flush(batch)
+        return invalidated
+
+
+def main():
+    load_env()
+
+    parser = argparse.ArgumentParser(description="Apply MongoDB changes to the knowledge graph as they happen")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI"),
+                        help="MongoDB connection string (defaults to the DB_* settings in .env)")
+    parser.add_argument("--db", default=os.getenv("DB_NAME"), help="MongoDB database name")
+    parser.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL,
+                        help="Max seconds a change waits before its batch is written")
+    parser.add_argument("--flush-size", type=int, default=FLUSH_SIZE,
+                        help="Write a batch as soon as it holds this many changes")
+    parser.add_argument("--reset", action="store_true",
+                        help="Forget the stored resume token and start from the current oplog position")
+    args = parser.parse_args()
+    if args.mongo_uri:
+        os.environ["MONGO_URI"] = args.mongo_uri
+
+    driver = get_driver()
+    db = get_mongo_db(args.db)
+
+    ensure_schema(driver)
+    if args.reset:
+        clear_resume_token(driver)
+        print("Cleared stored resume token")
+
+    updater = LiveGraphUpdater(driver, db,
+                               flush_interval=args.flush_interval, flush_size=args.flush_size)
+    signal.signal(signal.SIGTERM, updater.stop)
+    signal.signal(signal.SIGINT, updater.stop)
+    try:
+        updater.run()
+    finally:
+        close_connections()
+
+
+if __name__ == "__main__":
+    main()
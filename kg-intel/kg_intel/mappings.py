@@ -0,0 +1,389 @@
+"""
+MongoDB document → Neo4j mappings shared by the batch builders and the live updater.
+
+Each *_params function turns one MongoDB document into the parameter row the
+graph uses; each *_UPSERT statement applies a list of those rows with UNWIND.
+"""
+
+
+def _mongo_id(doc):
+    return str(doc["_id"]) if doc.get("_id") is not None else ""
+
+
+# ── Game ─────────────────────────────────────────────────────────────────────
+
+def game_params(game):
+    return {
+        "cmsId": game.get("cmsId", game.get("id", "")),
+        "friendlyName": game.get("friendlyName", ""),
+        "group": game.get("group", ""),
+        "publishedType": game.get("publishedType", "default"),
+        "animate": game.get("animate", False),
+        "hover": game.get("hover", False),
+        "analytics": game.get("analytics", False),
+        "mongoId": _mongo_id(game),
+    }
+
+
+GAME_UPSERT = """
+    UNWIND $rows AS row
+    MERGE (g:Game {cmsId: row.cmsId})
+    SET g.friendlyName = row.friendlyName,
+        g.group = row.group,
+        g.publishedType = row.publishedType,
+        g.animate = row.animate,
+        g.hover = row.hover,
+        g.analytics = row.analytics,
+        g.mongoId = row.mongoId
+"""
+
+
+# ── ABTest + Variant ─────────────────────────────────────────────────────────
+
+def abtest_params(test):
+    return {
+        "testId": test.get("id", ""),
+        "name": test.get("name", ""),
+        "description": test.get("description", ""),
+        "startDate": test.get("startDate", ""),
+        "endDate": test.get("endDate", ""),
+        "startTime": test.get("startTime", ""),
+        "endTime": test.get("endTime", ""),
+        "published": test.get("published", False),
+        "group": test.get("group", ""),
+        "gameId": test.get("gameId", ""),
+        "imageA": test.get("imageVariantA", ""),
+        "videoA": test.get("videoVariantA", ""),
+        "imageB": test.get("imageVariantB", ""),
+        "videoB": test.get("videoVariantB", ""),
+        "mongoId": _mongo_id(test),
+    }
+
+
+ABTEST_UPSERT = """
+    UNWIND $rows AS row
+    MERGE (t:ABTest {testId: row.testId})
+    SET t.name = row.name,
+        t.description = row.description,
+        t.startDate = row.startDate,
+        t.endDate = row.endDate,
+        t.startTime = row.startTime,
+        t.endTime = row.endTime,
+        t.published = row.published,
+        t.group = row.group,
+        t.mongoId = row.mongoId
+
+    MERGE (va:Variant {testId: row.testId, type: 'A'})
+    SET va.image = row.imageA, va.video = row.videoA
+    MERGE (vb:Variant {testId: row.testId, type: 'B'})
+    SET vb.image = row.imageB, vb.video = row.videoB
+    MERGE (t)-[:HAS_VARIANT]->(va)
+    MERGE (t)-[:HAS_VARIANT]->(vb)
+
+    // ABTest -[:TESTS]-> Game; drop a stale link if the test moved to another game
+    WITH t, row
+    OPTIONAL MATCH (t)-[old:TESTS]->(other:Game)
+    WHERE other.cmsId <> row.gameId
+    DELETE old
+    WITH DISTINCT t, row
+    MATCH (g:Game {cmsId: row.gameId})
+    MERGE (t)-[:TESTS]->(g)
+"""
+
+
+# ── ABTestEvent ──────────────────────────────────────────────────────────────
+
+def abtest_event_params(evt):
+    return {
+        "eventId": evt.get("id", ""),
+        "eventType": evt.get("eventType", ""),
+        "device": evt.get("device", ""),
+        "timestamp": evt.get("timestamp", ""),
+        "date": str(evt.get("timestamp") or "")[:10],
+        "distributionWeight": evt.get("distributionWeight", 0),
+        "variantType": "A" if evt.get("variant") == "variantA" else "B",
+        "gameId": evt.get("gameId", ""),
+        "mongoId": _mongo_id(evt),
+    }
+
+
+# Rollups (see kg_intel.rollups) are bumped only for events created by this
+# statement, so re-ingesting or updating an event never counts it twice, and
+# only once the event's Game is matched, like the ON_GAME queries they replace.
+# Two rows with the same eventId in one batch would both look new: loaders
+# pass the rows through ingest.unique_rows(rows, "eventId") first.
+ABTEST_EVENT_UPSERT = """
+    UNWIND $rows AS evt
+    OPTIONAL MATCH (existing:ABTestEvent {eventId: evt.eventId})
+    WITH evt, existing IS NULL AS isNew
+    MERGE (e:ABTestEvent {eventId: evt.eventId})
+    SET e.eventType = evt.eventType,
+        e.device = evt.device,
+        e.timestamp = evt.timestamp,
+        e.date = evt.date,
+        e.gameId = evt.gameId,
+        e.distributionWeight = evt.distributionWeight,
+        e.mongoId = evt.mongoId
+
+    WITH e, evt, isNew
+    MATCH (g:Game {cmsId: evt.gameId})
+    MERGE (e)-[:ON_GAME]->(g)
+
+    FOREACH (_ IN CASE WHEN isNew THEN [1] ELSE [] END |
+        MERGE (gd:GameDaily {cmsId: g.cmsId, source: 'abtest', date: evt.date,
+                             device: coalesce(evt.device, ''), eventType: coalesce(evt.eventType, ''),
+                             assetType: ''})
+        ON CREATE SET gd.count = 0
+        SET gd.count = gd.count + 1
+    )
+
+    WITH e, evt, isNew
+    MATCH (t:ABTest)-[:TESTS]->(:Game {cmsId: evt.gameId})
+    MERGE (e)-[:FOR_TEST]->(t)
+
+    WITH e, evt, isNew, t
+    MATCH (v:Variant {testId: t.testId, type: evt.variantType})
+    MERGE (e)-[:FOR_VARIANT]->(v)
+
+    FOREACH (_ IN CASE WHEN isNew THEN [1] ELSE [] END |
+        MERGE (vd:VariantDaily {testId: t.testId, variant: v.type, date: evt.date,
+                                device: coalesce(evt.device, ''), eventType: coalesce(evt.eventType, '')})
+        ON CREATE SET vd.count = 0
+        SET vd.count = vd.count + 1
+    )
+"""
+
+
+# ── Session ──────────────────────────────────────────────────────────────────
+
+def session_params(s):
+    """Maps one row of the analytics $group-by-sessionId aggregation."""
+    return {
+        "sessionId": s["_id"] or "",
+        "userId": s.get("userId", ""),
+        "accountId": s.get("accountId", ""),
+        "firstEvent": s.get("firstEvent", ""),
+        "lastEvent": s.get("lastEvent", ""),
+        "eventCount": s.get("eventCount", 0),
+        "device": s.get("device", "unknown"),
+        "gameIds": s.get("gameIds", []),
+    }
+
+
+SESSION_UPSERT = """
+    UNWIND $rows AS s
+    MERGE (sess:Session {sessionId: s.sessionId})
+    SET sess.userId = s.userId,
+        sess.accountId = s.accountId,
+        sess.firstEvent = s.firstEvent,
+        sess.lastEvent = s.lastEvent,
+        sess.eventCount = s.eventCount,
+        sess.device = s.device
+
+    WITH sess, s
+    UNWIND s.gameIds AS gId
+    MATCH (g:Game {cmsId: gId})
+    MERGE (sess)-[:VISITED]->(g)
+"""
+
+
+# Fold newly inserted analytics events into their Session, matching the
+# $first / $min / $max / $sum / $addToSet semantics of the batch aggregation.
+# Must run before ANALYTICS_EVENT_UPSERT: events already in the graph (e.g. an
+# insert replayed after a re-sync counted it) are skipped, like the rollups.
+SESSION_EVENT_INCREMENT = """
+    UNWIND $rows AS evt
+    OPTIONAL MATCH (existing:AnalyticsEvent {eventId: evt.eventId})
+    WITH evt, existing
+    WHERE existing IS NULL
+    MERGE (sess:Session {sessionId: evt.sessionId})
+    ON CREATE SET sess.userId = evt.userId,
+                  sess.accountId = evt.accountId,
+                  sess.device = evt.device,
+                  sess.firstEvent = evt.timestamp,
+                  sess.lastEvent = evt.timestamp,
+                  sess.eventCount = 0
+    SET sess.eventCount = sess.eventCount + 1,
+        sess.firstEvent = CASE WHEN evt.timestamp < sess.firstEvent THEN evt.timestamp ELSE sess.firstEvent END,
+        sess.lastEvent = CASE WHEN evt.timestamp > sess.lastEvent THEN evt.timestamp ELSE sess.lastEvent END
+
+    WITH sess, evt
+    MATCH (g:Game {cmsId: evt.gameId})
+    MERGE (sess)-[:VISITED]->(g)
+"""
+
+
+# ── AnalyticsEvent ───────────────────────────────────────────────────────────
+
+def analytics_event_params(evt):
+    meta = evt.get("metadata", {})
+    return {
+        "eventId": evt.get("id", ""),
+        "eventType": evt.get("eventType", ""),
+        "assetType": evt.get("assetType", ""),
+        "assetUrl": evt.get("assetUrl", ""),
+        "timestamp": evt.get("timestamp", ""),
+        "date": str(evt.get("timestamp") or "")[:10],
+        "device": meta.get("device_type", "unknown"),
+        "gameId": evt.get("gameId", ""),
+        "sessionId": evt.get("sessionId", ""),
+        "userId": evt.get("userId", ""),
+        "accountId": evt.get("accountId", ""),
+        "mongoId": _mongo_id(evt),
+    }
+
+
+ANALYTICS_EVENT_UPSERT = """
+    UNWIND $rows AS evt
+    OPTIONAL MATCH (existing:AnalyticsEvent {eventId: evt.eventId})
+    WITH evt, existing IS NULL AS isNew
+    MERGE (e:AnalyticsEvent {eventId: evt.eventId})
+    SET e.eventType = evt.eventType,
+        e.assetType = evt.assetType,
+        e.assetUrl = evt.assetUrl,
+        e.timestamp = evt.timestamp,
+        e.date = evt.date,
+        e.gameId = evt.gameId,
+        e.device = evt.device,
+        e.mongoId = evt.mongoId
+
+    WITH e, evt, isNew
+    MATCH (g:Game {cmsId: evt.gameId})
+    MERGE (e)-[:ON_GAME]->(g)
+
+    FOREACH (_ IN CASE WHEN isNew THEN [1] ELSE [] END |
+        MERGE (gd:GameDaily {cmsId: g.cmsId, source: 'analytics', date: evt.date,
+                             device: coalesce(evt.device, ''), eventType: coalesce(evt.eventType, ''),
+                             assetType: coalesce(evt.assetType, '')})
+        ON CREATE SET gd.count = 0
+        SET gd.count = gd.count + 1
+    )
+
+    WITH e, evt
+    MATCH (s:Session {sessionId: evt.sessionId})
+    MERGE (e)-[:IN_SESSION]->(s)
+"""
+
+
+# ── Promotion + PromoGame ────────────────────────────────────────────────────
+
+def promotion_params(promo):
+    return {
+        "promoId": promo.get("id", ""),
+        "name": promo.get("name", ""),
+        "description": promo.get("description", ""),
+        "group": promo.get("group", ""),
+        "startDate": str(promo.get("startDate", "")),
+        "endDate": str(promo.get("endDate", "")),
+        "published": promo.get("published", False),
+        "mongoId": _mongo_id(promo),
+        "games": [
+            {
+                "gameCmsId": game_entry.get("gameCmsId", ""),
+                "friendlyName": game_entry.get("friendlyName", ""),
+                "promoVideo": game_entry.get("promoVideo", ""),
+            }
+            for game_entry in promo.get("games", [])
+        ],
+    }
+
+
+PROMOTION_UPSERT = """
+    UNWIND $rows AS row
+    MERGE (p:Promotion {promoId: row.promoId})
+    SET p.name = row.name,
+        p.description = row.description,
+        p.group = row.group,
+        p.startDate = row.startDate,
+        p.endDate = row.endDate,
+        p.published = row.published,
+        p.mongoId = row.mongoId
+
+    // Drop games that were removed from the promotion
+    WITH p, row
+    OPTIONAL MATCH (stale:PromoGame {promoId: row.promoId})
+    WHERE NOT stale.gameCmsId IN [game IN row.games | game.gameCmsId]
+    DETACH DELETE stale
+
+    WITH DISTINCT p, row
+    UNWIND row.games AS game
+    MERGE (pg:PromoGame {promoId: row.promoId, gameCmsId: game.gameCmsId})
+    SET pg.friendlyName = game.friendlyName,
+        pg.promoVideo = game.promoVideo
+    MERGE (p)-[:INCLUDES]->(pg)
+
+    WITH pg, game
+    MATCH (g:Game {cmsId: game.gameCmsId})
+    MERGE (pg)-[:FOR_GAME]->(g)
+"""
+
+
+# ── Deletes (keyed by the MongoDB _id, as change streams only carry documentKey) ──
+# Event deletes also take the event back out of its rollups; analytics deletes
+# undo SESSION_EVENT_INCREMENT as well (count, first/last event, VISITED).
+
+DELETE_BY_MONGO_ID = {
+    "game": """
+        UNWIND $ids AS id
+        MATCH (g:Game {mongoId: id})
+        DETACH DELETE g
+    """,
+    "abtest": """
+        UNWIND $ids AS id
+        MATCH (t:ABTest {mongoId: id})
+        OPTIONAL MATCH (v:Variant {testId: t.testId})
+        DETACH DELETE t, v
+    """,
+    "abtestdata": """
+        UNWIND $ids AS id
+        MATCH (e:ABTestEvent {mongoId: id})
+        // Only events that reached their Game were counted
+        OPTIONAL MATCH (e)-[:ON_GAME]->(g:Game)
+        OPTIONAL MATCH (gd:GameDaily {cmsId: g.cmsId, source: 'abtest', date: e.date,
+                                      device: coalesce(e.device, ''), eventType: coalesce(e.eventType, ''),
+                                      assetType: ''})
+        SET gd.count = gd.count - 1
+        WITH DISTINCT e
+        OPTIONAL MATCH (e)-[:FOR_VARIANT]->(v:Variant)
+        OPTIONAL MATCH (vd:VariantDaily {testId: v.testId, variant: v.type, date: e.date,
+                                         device: coalesce(e.device, ''), eventType: coalesce(e.eventType, '')})
+        SET vd.count = vd.count - 1
+        WITH DISTINCT e
+        DETACH DELETE e
+    """,
+    "analytics": """
+        UNWIND $ids AS id
+        MATCH (e:AnalyticsEvent {mongoId: id})
+        OPTIONAL MATCH (e)-[:ON_GAME]->(g:Game)
+        OPTIONAL MATCH (gd:GameDaily {cmsId: g.cmsId, source: 'analytics', date: e.date,
+                                      device: coalesce(e.device, ''), eventType: coalesce(e.eventType, ''),
+                                      assetType: coalesce(e.assetType, '')})
+        SET gd.count = gd.count - 1
+        WITH DISTINCT e
+        OPTIONAL MATCH (e)-[:IN_SESSION]->(sess:Session)
+        SET sess.eventCount = sess.eventCount - 1
+        WITH DISTINCT e, sess
+        DETACH DELETE e
+
+        // Recompute what the increment derived from the session's remaining events
+        WITH DISTINCT sess WHERE sess IS NOT NULL
+        OPTIONAL MATCH (sess)<-[:IN_SESSION]-(rest:AnalyticsEvent)
+        WITH sess, min(rest.timestamp) AS firstEvent, max(rest.timestamp) AS lastEvent,
+             collect(DISTINCT rest.gameId) AS gameIds
+        SET sess.firstEvent = coalesce(firstEvent, sess.firstEvent),
+            sess.lastEvent = coalesce(lastEvent, sess.lastEvent)
+        WITH sess, gameIds
+        OPTIONAL MATCH (sess)-[visit:VISITED]->(g:Game)
+        WHERE NOT g.cmsId IN gameIds
+        DELETE visit
+        WITH DISTINCT sess
+        WHERE sess.eventCount <= 0
+        DETACH DELETE sess
+    """,
+    "promotion": """
+        UNWIND $ids AS id
+        MATCH (p:Promotion {mongoId: id})
+        OPTIONAL MATCH (pg:PromoGame {promoId: p.promoId})
+        DETACH DELETE p, pg
+    """,
+}
@@ -0,0 +1,279 @@
+"""
+Runs the graph build stages in dependency order in a single process.
+
+    games → abtests → abtest_events → sessions → analytics_events → covisitation → promotions → embeddings
+
+All stages share one pooled Neo4j driver and one MongoDB client, and Game
+nodes are synced once per run no matter how many of the stages need them.
+Selecting a stage pulls in the stages it depends on unless --no-deps is
+given; "events" selects both event stages.
+
+A full (non-incremental) run clears the nodes owned by each selected stage
+before rebuilding them, or the whole graph with --wipe. With --incremental
+nothing is cleared: each stage only reads documents past its collection's
+high-water mark and prunes nodes whose documents were removed.
+--reset-marks forgets those marks first, so an incremental run re-syncs every
+document without clearing the graph.
+
+Usage:
+    python -m kg_intel [--stages games,abtests,events,...] [--no-deps] [--wipe]
+                       [--incremental [--detect-deletes] [--reset-marks]] [--rebuild-rollups]
+                       [--batch-size N] [--workers N] [--write-snapshot DIR | --from-snapshot DIR]
+                       [--embedding-cache PATH] [--fake-embeddings]
+"""
+
+import argparse
+
+from kg_intel import stages
+from kg_intel.connections import load_env, get_driver, get_mongo_db, close_connections, run_cypher
+from kg_intel.sync_state import (
+    HighWaterMark, load_high_water_mark, save_high_water_mark, clear_high_water_marks, delete_removed,
+    bump_graph_version,
+)
+from kg_intel.schema import ensure_schema
+from kg_intel.rollups import rebuild_rollups
+from kg_intel.snapshot import Snapshot
+from kg_intel.embeddings import create_embeddings, FakeEmbedder, CACHE_PATH
+from kg_intel.covisitation import build_covisitation
+
+
+class Stage:
+    """
+    One build step.
+
+    `collection` is the MongoDB collection the stage reads (its high-water
+    mark is loaded before the run and, if `saves_mark`, saved after it).
+    `clear` empties the stage's nodes before a full rebuild, `prune` deletes
+    nodes of removed documents in incremental mode, and `rollups` names the
+    rollup source to recount after deletes.
+    """
+
+    def __init__(self, name, run, requires=(), collection=None, saves_mark=True, clear=None, prune=None,
+                 rollups=None):
+        self.name = name
+        self.run = run
+        self.requires = requires
+        self.collection = collection
+        self.saves_mark = saves_mark
+        self.clear = clear
+        self.prune = prune
+        self.rollups = rollups
+
+
+def _prune_games(p):
+    delete_removed(p.driver, p.db.game, "Game", "cmsId", mongo_fields=("cmsId", "id"),
+                   key_of=lambda g: g.get("cmsId", g.get("id", "")))
+
+
+def _prune_abtests(p):
+    delete_removed(p.driver, p.db.abtest, "ABTest", "testId")
+    delete_removed(p.driver, p.db.abtest, "Variant", "testId")
+
+
+def _prune_abtest_events(p):
+    if p.detect_deletes:
+        delete_removed(p.driver, p.db.abtestdata, "ABTestEvent", "eventId")
+
+
+def _prune_analytics_events(p):
+    if p.detect_deletes:
+        delete_removed(p.driver, p.db.analytics, "AnalyticsEvent", "eventId")
+        run_cypher(p.driver, "MATCH (s:Session) WHERE NOT (s)<-[:IN_SESSION]-() DETACH DELETE s")
+
+
+def _prune_promotions(p):
+    delete_removed(p.driver, p.db.promotion, "PromoGame", "promoId")
+    delete_removed(p.driver, p.db.promotion, "Promotion", "promoId")
+
+
+STAGES = [
+    Stage("games", lambda p: stages.sync_games(p.driver, p.db, mark=p.marks["game"], snapshot=p.snapshot),
+          collection="game", prune=_prune_games),
+    Stage("abtests", lambda p: stages.create_abtest_nodes(p.driver, p.db, mark=p.marks["abtest"],
+                                                          snapshot=p.snapshot),
+          requires=("games",), collection="abtest", clear=stages.clear_abtest_nodes, prune=_prune_abtests),
+    Stage("abtest_events", lambda p: stages.create_abtest_event_nodes(
+              p.driver, p.db, batch_size=p.batch_size or stages.ABTEST_EVENT_BATCH_SIZE,
+              mark=p.marks["abtestdata"], workers=p.workers, snapshot=p.snapshot),
+          requires=("abtests",), collection="abtestdata", clear=stages.clear_abtest_event_nodes,
+          prune=_prune_abtest_events, rollups="abtest"),
+    # Sessions read the analytics mark before the event stage advances it
+    Stage("sessions", lambda p: stages.create_session_nodes(p.driver, p.db, mark=p.marks["analytics"],
+                                                            snapshot=p.snapshot),
+          requires=("games",), collection="analytics", saves_mark=False, clear=stages.clear_session_nodes),
+    Stage("analytics_events", lambda p: stages.create_analytics_event_nodes(
+              p.driver, p.db, batch_size=p.batch_size or stages.ANALYTICS_EVENT_BATCH_SIZE,
+              mark=p.marks["analytics"], workers=p.workers, snapshot=p.snapshot),
+          requires=("sessions",), collection="analytics", clear=stages.clear_analytics_event_nodes,
+          prune=_prune_analytics_events, rollups="analytics"),
+    # Derived from the VISITED edges and recomputed in full on every run, incremental or not
+    Stage("covisitation", lambda p: build_covisitation(p.driver), requires=("sessions",)),
+    Stage("promotions", lambda p: stages.create_promotion_nodes(p.driver, p.db, mark=p.marks["promotion"],
+                                                                snapshot=p.snapshot),
+          requires=("games",), collection="promotion", clear=stages.clear_promotion_nodes,
+          prune=_prune_promotions),
+    Stage("embeddings", lambda p: create_embeddings(p.driver, embedder=p.embedder,
+                                                    cache_path=p.embedding_cache)),
+]
+
+STAGE_NAMES = [stage.name for stage in STAGES]
+STAGE_GROUPS = {"events": ("abtest_events", "analytics_events")}
+
+
+def resolve_stages(names, with_deps=True):
+    """Expand groups (and dependencies), then return the Stage objects in run order."""
+    by_name = {stage.name: stage for stage in STAGES}
+    selected = set()
+    pending = []
+    for name in names:
+        pending.extend(STAGE_GROUPS.get(name, (name,)))
+    while pending:
+        name = pending.pop()
+        if name not in by_name:
+            raise ValueError(f"Unknown stage: {name} (choose from {', '.join(STAGE_NAMES + list(STAGE_GROUPS))})")
+        if name in selected:
+            continue
+        selected.add(name)
+        if with_deps:
+            pending.extend(by_name[name].requires)
+    return [stage for stage in STAGES if stage.name in selected]
+
+
+class Pipeline:
+    def __init__(self, stage_names=STAGE_NAMES, with_deps=True, wipe=False, incremental=False,
+                 detect_deletes=False, rebuild_rollups=False, batch_size=None, workers=stages.EVENT_WORKERS,
+                 write_snapshot=None, from_snapshot=None, embedder=None, embedding_cache=CACHE_PATH,
+                 reset_marks=False, db_name=None):
+        if incremental and (wipe or write_snapshot or from_snapshot):
+            raise ValueError("An incremental sync cannot wipe the graph or use a snapshot")
+        if reset_marks and not incremental:
+            raise ValueError("--reset-marks only applies to --incremental runs")
+        self.stages = resolve_stages(stage_names, with_deps)
+        self.wipe = wipe
+        self.incremental = incremental
+        self.reset_marks = reset_marks
+        self.db_name = db_name
+        self.detect_deletes = detect_deletes
+        self.rebuild_rollups = rebuild_rollups
+        self.batch_size = batch_size
+        self.workers = workers
+        self.write_snapshot = write_snapshot
+        snapshot_dir = from_snapshot or write_snapshot
+        self.snapshot = Snapshot(snapshot_dir) if snapshot_dir else None
+        self.embedder = embedder
+        self.embedding_cache = embedding_cache
+        self.driver = None
+        self.db = None
+        self.marks = {}
+
+    @property
+    def collections(self):
+        return tuple(dict.fromkeys(s.collection for s in self.stages if s.collection))
+
+    def _initial_mark(self, collection):
+        if self.incremental:
+            return load_high_water_mark(self.driver, collection)
+        if self.snapshot is not None:
+            return self.snapshot.high_water_mark(collection)
+        return HighWaterMark(collection)
+
+    def run(self):
+        print(f"Stages: {', '.join(stage.name for stage in self.stages)}")
+        self.driver = get_driver()
+        if self.snapshot is None or self.write_snapshot:
+            self.db = get_mongo_db(self.db_name)
+
+        if self.write_snapshot:
+            print("\n── Writing snapshot ──")
+            self.snapshot.write(self.db, self.collections)
+        ensure_schema(self.driver)
+
+        if self.incremental:
+            print("\n── Incremental sync ──")
+            if self.reset_marks:
+                clear_high_water_marks(self.driver, self.collections)
+                print(f"  Cleared high-water marks for {', '.join(self.collections)}")
+            for stage in self.stages:
+                if stage.prune:
+                    stage.prune(self)
+        elif self.wipe:
+            stages.wipe_graph(self.driver)
+        else:
+            for stage in self.stages:
+                if stage.clear:
+                    stage.clear(self.driver)
+
+        self.marks = {c: self._initial_mark(c) for c in self.collections}
+        for stage in self.stages:
+            stage.run(self)
+            if stage.collection and stage.saves_mark:
+                save_high_water_mark(self.driver, self.marks[stage.collection])
+            # Rollups only count events as they are created, so deletes need a recount
+            if stage.rollups and (self.rebuild_rollups or self.detect_deletes):
+                rebuild_rollups(self.driver, stage.rollups)
+
+        with self.driver.session() as session:
+            version = bump_graph_version(session)
+        print(f"\n  Graph version: {version}")
+        stages.print_summary(self.driver)
+
+
+def add_pipeline_arguments(parser):
+    """The build options shared by `python -m kg_intel` and the per-domain builder scripts."""
+    parser.add_argument("--batch-size", type=int,
+                        help="MongoDB cursor batch and initial UNWIND batch size for events (adapts per writer)")
+    parser.add_argument("--workers", type=int, default=stages.EVENT_WORKERS,
+                        help="Concurrent Neo4j writer sessions for events, partitioned by gameId")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Sync only documents changed since the last run instead of clearing and rebuilding")
+    parser.add_argument("--detect-deletes", action="store_true",
+                        help="In incremental mode, also diff event ids to delete removed events (reads every event id)")
+    parser.add_argument("--reset-marks", action="store_true",
+                        help="In incremental mode, forget the high-water marks and re-sync every document")
+    parser.add_argument("--rebuild-rollups", action="store_true",
+                        help="Recompute the GameDaily / VariantDaily rollups from the event nodes")
+    parser.add_argument("--write-snapshot", metavar="DIR",
+                        help="Export the source collections to Parquet in DIR, then build from that snapshot")
+    parser.add_argument("--from-snapshot", metavar="DIR",
+                        help="Build from a Parquet snapshot in DIR instead of MongoDB")
+    parser.add_argument("--embedding-cache", metavar="PATH", default=CACHE_PATH,
+                        help="SQLite file caching embeddings by content hash across builds")
+    parser.add_argument("--fake-embeddings", action="store_true",
+                        help="Use deterministic offline embeddings instead of the OpenAI API (tests only)")
+
+
+def run_from_args(parser, args, stage_names, with_deps=True, wipe=False):
+    """Build and run a Pipeline from parsed add_pipeline_arguments() options."""
+    load_env()
+    try:
+        pipeline = Pipeline(
+            stage_names, with_deps=with_deps, wipe=wipe and not args.incremental, incremental=args.incremental,
+            detect_deletes=args.detect_deletes, reset_marks=args.reset_marks, rebuild_rollups=args.rebuild_rollups, batch_size=args.batch_size,
+            workers=args.workers, write_snapshot=args.write_snapshot, from_snapshot=args.from_snapshot,
+            embedder=FakeEmbedder() if args.fake_embeddings else None, embedding_cache=args.embedding_cache,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        pipeline.run()
+    finally:
+        close_connections()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the knowledge graph from MongoDB")
+    parser.add_argument("--stages", default=",".join(STAGE_NAMES),
+                        help=f"Comma-separated stages to run: {', '.join(STAGE_NAMES + list(STAGE_GROUPS))}")
+    parser.add_argument("--no-deps", action="store_true",
+                        help="Run only the listed stages, without the stages they depend on")
+    parser.add_argument("--wipe", action="store_true",
+                        help="Delete the whole graph first instead of clearing only the selected stages' nodes")
+    add_pipeline_arguments(parser)
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.stages.split(",") if name.strip()]
+    run_from_args(parser, args, names, with_deps=not args.no_deps, wipe=args.wipe)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Caches for the visualization server's natural-language queries.
+
+TranslationCache maps a question to Cypher that has already run successfully:
+first by the exact text, then by its normalised form (see
+query_embeddings.normalize_question), then by embedding similarity, so
+"which variant won?" and "what variant performed best" can share one
+translation without another LLM call. Embeddings barely separate "top 5" from
+"top 10" or one game name from another, so a similar question is only served
+the cached Cypher when its literals (numbers, quoted strings, capitalised
+names) are exactly the same; otherwise the cached pair is returned as an
+example for the LLM to adapt. Translations do not depend on the data, so they
+never expire; the LRU just keeps the newest `max_entries`.
+
+ResultCache maps (Cypher, params) to rows, tagged with the graph version the
+rows were read at. An entry is served only while the graph version is
+unchanged and it is younger than `ttl` seconds, so a rebuild or live update
+invalidates every cached result at once.
+
+The similarity lookup needs numpy (pip install numpy); without it only the
+exact and normalised lookups are used.
+"""
+
+import re
+import json
+import time
+import threading
+from collections import OrderedDict
+
+from kg_intel.query_embeddings import normalize_question
+
+TRANSLATION_CACHE_SIZE = 1024
+SIMILARITY_THRESHOLD = 0.95
+LITERALS = re.compile(r"'[^']*'|\"[^\"]*\"|\d+(?:[.:/-]\d+)*|\b[A-Z][\w-]*")
+RESULT_CACHE_SIZE = 256
+RESULT_TTL = 600
+# Larger results are returned but not kept
+RESULT_CACHE_MAX_ROWS = 5000
+
+
+def question_literals(question):
+    """Numbers, quoted strings and capitalised names in a question (sentence-initial capitals excluded)."""
+    literals = []
+    for match in LITERALS.finditer(question):
+        token = match.group()
+        before = question[:match.start()].rstrip()
+        if token[0].isupper() and (not before or before[-1] in ".?!"):
+            continue
+        literals.append(token)
+    return sorted(literals)
+
+
+def _numpy():
+    try:
+        import numpy as np
+    except ImportError:
+        return None
+    return np
+
+
+class TranslationCache:
+    def __init__(self, question_cache=None, max_entries=TRANSLATION_CACHE_SIZE, threshold=SIMILARITY_THRESHOLD):
+        # question_cache (a QueryEmbeddingCache) enables the similarity lookup
+        self.question_cache = question_cache
+        self.np = _numpy() if question_cache is not None else None
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.exact = OrderedDict()
+        self.normalized = OrderedDict()
+        self.vectors = OrderedDict()
+        # normalised question → the question as asked, for comparing literals
+        self.questions = {}
+        self.lock = threading.Lock()
+        self.counts = {"exact": 0, "normalized": 0, "similar": 0, "hints": 0, "misses": 0}
+
+    def _embed(self, text):
+        np = self.np
+        vector = np.asarray(self.question_cache.embed(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _similar(self, vector):
+        """(question, cypher) of the closest cached question scoring at least the threshold, or None."""
+        with self.lock:
+            keys = list(self.vectors)
+            if not keys:
+                return None
+            matrix = self.np.stack([self.vectors[k] for k in keys])
+        scores = matrix @ vector
+        best = int(scores.argmax())
+        if scores[best] < self.threshold:
+            return None
+        with self.lock:
+            cypher = self.normalized.get(keys[best])
+            return (self.questions.get(keys[best], keys[best]), cypher) if cypher else None
+
+    def get(self, question):
+        """
+        (cypher, how, example): how is "exact" / "normalized" / "similar" with the cached Cypher, or
+        (None, "hint", (similar question, its cypher)) / (None, "miss", None) when the LLM must translate.
+        """
+        text = normalize_question(question)
+        with self.lock:
+            for how, cache, key in (("exact", self.exact, question), ("normalized", self.normalized, text)):
+                cypher = cache.get(key)
+                if cypher is not None:
+                    cache.move_to_end(key)
+                    self.counts[how] += 1
+                    return cypher, how, None
+
+        if self.np is not None:
+            match = self._similar(self._embed(text))
+            if match is not None:
+                similar_question, cypher = match
+                same = question_literals(similar_question) == question_literals(question)
+                with self.lock:
+                    self.counts["similar" if same else "hints"] += 1
+                if same:
+                    return cypher, "similar", None
+                return None, "hint", match
+
+        with self.lock:
+            self.counts["misses"] += 1
+        return None, "miss", None
+
+    def put(self, question, cypher):
+        """Remember a translation that executed successfully."""
+        text = normalize_question(question)
+        vector = self._embed(text) if self.np is not None else None
+        with self.lock:
+            for cache, key in ((self.exact, question), (self.normalized, text)):
+                cache[key] = cypher
+                cache.move_to_end(key)
+                while len(cache) > self.max_entries:
+                    cache.popitem(last=False)
+            self.questions[text] = question
+            if vector is not None:
+                self.vectors[text] = vector
+            # Keep the vectors and questions in step with the normalised entries they point at
+            for stale in [k for k in self.questions if k not in self.normalized]:
+                self.questions.pop(stale)
+                self.vectors.pop(stale, None)
+
+    def stats(self):
+        with self.lock:
+            lookups = sum(self.counts.values())
+            hits = lookups - self.counts["misses"] - self.counts["hints"]
+            return {"entries": len(self.normalized), **self.counts,
+                    "hitRate": round(hits / lookups, 3) if lookups else None}
+
+
+class ResultCache:
+    def __init__(self, version, max_entries=RESULT_CACHE_SIZE, ttl=RESULT_TTL, max_rows=RESULT_CACHE_MAX_ROWS):
+        # version() returns the current graph version (see sync_state.load_graph_version)
+        self.version = version
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    @staticmethod
+    def key(cypher, params=None, **options):
+        return json.dumps([cypher.strip(), params or {}, options], sort_keys=True, default=str)
+
+    def get(self, key):
+        version = self.version()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry_version, stored_at, rows = entry
+                if entry_version == version and time.monotonic() - stored_at < self.ttl:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return rows
+                del self.entries[key]
+                self.expired += 1
+            self.misses += 1
+        return None
+
+    def put(self, key, rows, version, size=None):
+        """Store rows read at graph `version` (taken before the query ran, so a concurrent bump wins)."""
+        if (len(rows) if size is None else size) > self.max_rows:
+            return
+        with self.lock:
+            self.entries[key] = (version, time.monotonic(), rows)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses,
+                    "expired": self.expired, "hitRate": round(self.hits / lookups, 3) if lookups else None}
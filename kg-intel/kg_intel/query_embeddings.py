@@ -0,0 +1,96 @@
+"""
+Cached embeddings for search questions.
+
+Questions are normalised (case, surrounding punctuation, whitespace) and
+looked up first in an in-memory LRU, then in the on-disk EmbeddingCache
+shared with the build's embedding stage; only a miss in both calls the
+embedding API. The resulting vector is passed to db.index.vector.queryNodes
+as a parameter instead of calling ai.text.embed inside Cypher, so repeated
+questions cost one index lookup and no OpenAI round-trip.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+
+from kg_intel.embeddings import (
+    CACHE_PATH, EMBEDDINGS, EMBEDDING_MODEL, EmbeddingCache, OpenAIEmbedder, content_hash,
+)
+from kg_intel.graph_api import projection
+
+QUERY_CACHE_SIZE = 1024
+# vector index → label of the nodes it holds
+INDEX_LABELS = {index: label for index, label, *_ in EMBEDDINGS}
+
+
+def normalize_question(text):
+    text = re.sub(r"\s+", " ", text.strip().lower())
+    return text.strip(" ?!.,;:\"'")
+
+
+class QueryEmbeddingCache:
+    def __init__(self, embedder=None, path=CACHE_PATH, max_entries=QUERY_CACHE_SIZE):
+        self._embedder = embedder
+        self.store = EmbeddingCache(path)
+        self.max_entries = max_entries
+        self.lru = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @property
+    def embedder(self):
+        # Created on first miss so a warm cache never needs API credentials
+        if self._embedder is None:
+            self._embedder = OpenAIEmbedder()
+        return self._embedder
+
+    def _remember(self, key, vector):
+        self.lru[key] = vector
+        self.lru.move_to_end(key)
+        while len(self.lru) > self.max_entries:
+            self.lru.popitem(last=False)
+
+    def embed(self, question):
+        text = normalize_question(question)
+        key = content_hash(self._embedder.model if self._embedder is not None else EMBEDDING_MODEL, text)
+        with self.lock:
+            vector = self.lru.get(key)
+            if vector is not None:
+                self.lru.move_to_end(key)
+                self.hits += 1
+                return vector
+
+        vector = self.store.get_many([key]).get(key)
+        if vector is not None:
+            with self.lock:
+                self.disk_hits += 1
+                self._remember(key, vector)
+            return vector
+
+        vector = self.embedder.embed([text])[0]
+        self.store.put_many({key: vector})
+        with self.lock:
+            self.misses += 1
+            self._remember(key, vector)
+        return vector
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.lru), "hits": self.hits, "diskHits": self.disk_hits, "misses": self.misses}
+
+    def close(self):
+        self.store.close()
+
+
+def semantic_search(driver, cache, index, question, k=5):
+    """Top-k nodes of a Neo4j vector index for a question, embedded through the cache."""
+    # Only the display properties are projected, so the stored vectors never cross Bolt
+    with driver.session() as session:
+        result = session.run(f"""
+            CALL db.index.vector.queryNodes($index, $k, $vector) YIELD node, score
+            RETURN {projection(INDEX_LABELS.get(index), "node")} AS props, score
+        """, {"index": index, "k": k, "vector": cache.embed(question)})
+        return [{**{p: v for p, v in dict(r["props"]).items() if v is not None}, "score": r["score"]}
+                for r in result]
@@ -0,0 +1,79 @@
+"""
+Pre-aggregated engagement counts.
+
+    (:GameDaily {cmsId, source, date, device, eventType, assetType, count})
+        one per game/day/dimension combination; source is 'abtest' or 'analytics'
+    (:VariantDaily {testId, variant, date, device, eventType, count})
+        one per A/B variant/day/dimension combination
+
+The event UPSERT statements in kg_intel.mappings bump these as events are
+first created, so the query scripts can sum a few rollup rows instead of
+counting every event node. Like the ON_GAME queries they replace, they
+only count events whose Game exists. rebuild_rollups() recomputes them from
+the raw events after deletes, for a graph built before rollups existed, or to
+pick up events whose Game was created after them.
+"""
+
+# Events ingested before e.date was stored fall back to the timestamp
+_EVENT_KEYS = """
+    -[:ON_GAME]->(g:Game)
+    WITH e, g.cmsId AS cmsId, coalesce(e.date, left(e.timestamp, 10), '') AS date
+"""
+
+CLEAR_QUERIES = {
+    "abtest": [
+        "MATCH (r:GameDaily {source: 'abtest'}) DETACH DELETE r",
+        "MATCH (r:VariantDaily) DETACH DELETE r",
+    ],
+    "analytics": [
+        "MATCH (r:GameDaily {source: 'analytics'}) DETACH DELETE r",
+    ],
+}
+
+BUILD_QUERIES = {
+    "abtest": [
+        "MATCH (e:ABTestEvent)" + _EVENT_KEYS + """
+        WITH cmsId, date, coalesce(e.device, '') AS device, coalesce(e.eventType, '') AS eventType,
+             count(*) AS events
+        CREATE (:GameDaily {cmsId: cmsId, source: 'abtest', date: date, device: device,
+                            eventType: eventType, assetType: '', count: events})
+        """,
+        """
+        MATCH (e:ABTestEvent)-[:FOR_VARIANT]->(v:Variant)
+        WITH v.testId AS testId, v.type AS variant, coalesce(e.date, left(e.timestamp, 10), '') AS date,
+             coalesce(e.device, '') AS device, coalesce(e.eventType, '') AS eventType, count(*) AS events
+        CREATE (:VariantDaily {testId: testId, variant: variant, date: date, device: device,
+                               eventType: eventType, count: events})
+        """,
+    ],
+    "analytics": [
+        "MATCH (e:AnalyticsEvent)" + _EVENT_KEYS + """
+        WITH cmsId, date, coalesce(e.device, '') AS device, coalesce(e.eventType, '') AS eventType,
+             coalesce(e.assetType, '') AS assetType, count(*) AS events
+        CREATE (:GameDaily {cmsId: cmsId, source: 'analytics', date: date, device: device,
+                            eventType: eventType, assetType: assetType, count: events})
+        """,
+    ],
+}
+
+
+def _run_all(tx, queries):
+    for query in queries:
+        tx.run(query).consume()
+
+
+def clear_rollups(driver, source):
+    """Drop the rollups of one source before its events are rebuilt from scratch."""
+    with driver.session() as session:
+        session.execute_write(_run_all, CLEAR_QUERIES[source])
+
+
+def rebuild_rollups(driver, source):
+    """Recompute the rollups of one source ('abtest' or 'analytics') from its event nodes."""
+    with driver.session() as session:
+        session.execute_write(_run_all, CLEAR_QUERIES[source] + BUILD_QUERIES[source])
+        count = session.run("""
+            MATCH (r) WHERE (r:GameDaily AND r.source = $source) OR ($source = 'abtest' AND r:VariantDaily)
+            RETURN count(r) AS count
+        """, {"source": source}).single()["count"]
+    print(f"  Rebuilt {count} {source} rollup nodes")
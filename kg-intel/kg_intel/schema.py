@@ -0,0 +1,77 @@
+"""
+Constraints and lookup indexes for the knowledge graph.
+
+Every builder runs ensure_schema() before ingesting, so the MERGE / MATCH
+lookups in the UNWIND batches hit an index instead of scanning the label.
+All statements use IF NOT EXISTS and are safe to run repeatedly.
+"""
+
+from neo4j.exceptions import ClientError, DatabaseError
+
+# (name, label, properties) — the MERGE keys of each node type
+UNIQUE_CONSTRAINTS = [
+    ("game_cms_id", "Game", ("cmsId",)),
+    ("abtest_test_id", "ABTest", ("testId",)),
+    ("variant_test_type", "Variant", ("testId", "type")),
+    ("abtest_event_id", "ABTestEvent", ("eventId",)),
+    ("analytics_event_id", "AnalyticsEvent", ("eventId",)),
+    ("session_id", "Session", ("sessionId",)),
+    ("promotion_promo_id", "Promotion", ("promoId",)),
+    ("promo_game_key", "PromoGame", ("promoId", "gameCmsId")),
+    ("sync_state_collection", "SyncState", ("collection",)),
+    ("game_daily_key", "GameDaily", ("cmsId", "source", "date", "device", "eventType", "assetType")),
+    ("variant_daily_key", "VariantDaily", ("testId", "variant", "date", "device", "eventType")),
+]
+
+# (name, label, property) — secondary lookups that are not MERGE keys
+LOOKUP_INDEXES = [
+    ("variant_test_id", "Variant", "testId"),
+    ("promo_game_promo_id", "PromoGame", "promoId"),
+    ("game_mongo_id", "Game", "mongoId"),
+    ("abtest_mongo_id", "ABTest", "mongoId"),
+    ("abtest_event_mongo_id", "ABTestEvent", "mongoId"),
+    ("analytics_event_mongo_id", "AnalyticsEvent", "mongoId"),
+    ("promotion_mongo_id", "Promotion", "mongoId"),
+]
+
+
+def _props(var, properties):
+    return ", ".join(f"{var}.{p}" for p in properties)
+
+
+def ensure_schema(driver):
+    """Create any missing constraints and indexes, then wait for them to come online."""
+    print("\n── Ensuring schema ──")
+    with driver.session() as session:
+        for name, label, properties in UNIQUE_CONSTRAINTS:
+            try:
+                session.run(f"""
+                    CREATE CONSTRAINT {name} IF NOT EXISTS
+                    FOR (n:{label}) REQUIRE ({_props('n', properties)}) IS UNIQUE
+                """).consume()
+            except (ClientError, DatabaseError) as e:
+                # Existing duplicate keys block the constraint; fall back to a plain index
+                print(f"  Could not create constraint {name} ({e.code}), using an index instead")
+                session.run(f"""
+                    CREATE INDEX {name} IF NOT EXISTS
+                    FOR (n:{label}) ON ({_props('n', properties)})
+                """).consume()
+
+        for name, label, prop in LOOKUP_INDEXES:
+            session.run(f"""
+                CREATE INDEX {name} IF NOT EXISTS
+                FOR (n:{label}) ON (n.{prop})
+            """).consume()
+
+        session.run("CALL db.awaitIndexes(300)").consume()
+    print(f"  {len(UNIQUE_CONSTRAINTS)} constraints and {len(LOOKUP_INDEXES)} indexes in place")
+
+
+def drop_schema(driver):
+    """Remove the constraints and indexes created by ensure_schema (benchmarks only)."""
+    with driver.session() as session:
+        for name, _, _ in UNIQUE_CONSTRAINTS:
+            session.run(f"DROP CONSTRAINT {name} IF EXISTS").consume()
+            session.run(f"DROP INDEX {name} IF EXISTS").consume()
+        for name, _, _ in LOOKUP_INDEXES:
+            session.run(f"DROP INDEX {name} IF EXISTS").consume()
@@ -0,0 +1,260 @@
+"""
+Columnar (Parquet) snapshots of the MongoDB collections the graph is built from.
+
+A snapshot is a directory with one <collection>.parquet file per collection,
+holding only the projected fields the builders use, plus a manifest.json with
+row counts and the high-water mark of each collection at export time.
+
+Builders can rebuild Neo4j from a snapshot instead of MongoDB Atlas. Rows
+are then built column-wise with pyarrow.compute, one record batch at a time,
+instead of one dict per MongoDB document. That makes dev rebuilds and
+disaster recovery independent of Atlas, and gives a reproducible dataset for
+benchmarks.
+
+Requires pyarrow >= 14 (pip install pyarrow).
+"""
+
+import os
+import json
+from datetime import datetime, timezone
+
+from kg_intel.sync_state import HighWaterMark
+
+SNAPSHOT_BATCH_SIZE = 50000
+MANIFEST = "manifest.json"
+
+# Column name → arrow type name; nested fields are flattened on export
+COLUMNS = {
+    "game": {
+        "_id": "string", "date_updated": "timestamp", "cmsId": "string", "id": "string",
+        "friendlyName": "string", "group": "string", "publishedType": "string",
+        "animate": "bool", "hover": "bool", "analytics": "bool",
+    },
+    "abtest": {
+        "_id": "string", "date_updated": "timestamp", "id": "string", "name": "string",
+        "description": "string", "startDate": "string", "endDate": "string", "startTime": "string",
+        "endTime": "string", "published": "bool", "group": "string", "gameId": "string",
+        "imageVariantA": "string", "videoVariantA": "string",
+        "imageVariantB": "string", "videoVariantB": "string",
+    },
+    "abtestdata": {
+        "_id": "string", "date_updated": "timestamp", "id": "string", "eventType": "string",
+        "device": "string", "timestamp": "string", "distributionWeight": "double",
+        "variant": "string", "gameId": "string",
+    },
+    "analytics": {
+        "_id": "string", "date_updated": "timestamp", "id": "string", "eventType": "string",
+        "assetType": "string", "assetUrl": "string", "timestamp": "string", "device_type": "string",
+        "gameId": "string", "sessionId": "string", "userId": "string", "accountId": "string",
+    },
+    "promotion": {
+        "_id": "string", "date_updated": "timestamp", "id": "string", "name": "string",
+        "description": "string", "group": "string", "startDate": "string", "endDate": "string",
+        "published": "bool", "games": "promo_games",
+    },
+}
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise Exception("pyarrow is required for graph snapshots (pip install pyarrow)")
+    return pa, pc, pq
+
+
+def _arrow_type(pa, name):
+    if name == "promo_games":
+        return pa.list_(pa.struct([
+            ("gameCmsId", pa.string()), ("friendlyName", pa.string()), ("promoVideo", pa.string()),
+        ]))
+    return {"string": pa.string(), "bool": pa.bool_(), "double": pa.float64(),
+            "timestamp": pa.timestamp("ms")}[name]
+
+
+def _flatten(collection, doc):
+    """One MongoDB document → one snapshot row (the same fields the *_params mappings read)."""
+    row = {name: doc.get(name) for name in COLUMNS[collection]}
+    row["_id"] = str(doc["_id"])
+    if collection == "analytics":
+        row["device_type"] = (doc.get("metadata") or {}).get("device_type")
+    elif collection == "promotion":
+        # Stored as text, matching promotion_params
+        row["startDate"] = str(doc.get("startDate", ""))
+        row["endDate"] = str(doc.get("endDate", ""))
+        row["games"] = [
+            {"gameCmsId": g.get("gameCmsId"), "friendlyName": g.get("friendlyName"),
+             "promoVideo": g.get("promoVideo")}
+            for g in doc.get("games", [])
+        ]
+    if collection == "abtestdata" and row["distributionWeight"] is not None:
+        row["distributionWeight"] = float(row["distributionWeight"])
+    return row
+
+
+class Snapshot:
+    def __init__(self, path):
+        self.path = path
+        self.pa, self.pc, self.pq = _require_pyarrow()
+
+    def file_for(self, collection):
+        return os.path.join(self.path, f"{collection}.parquet")
+
+    def schema(self, collection):
+        return self.pa.schema([(name, _arrow_type(self.pa, t)) for name, t in COLUMNS[collection].items()])
+
+    # ── Export ───────────────────────────────────────────────────────────────
+
+    def write(self, db, collections, batch_size=SNAPSHOT_BATCH_SIZE):
+        """Stream the projected fields of each collection from MongoDB into Parquet files."""
+        os.makedirs(self.path, exist_ok=True)
+        manifest = self.manifest() if os.path.exists(os.path.join(self.path, MANIFEST)) else {"collections": {}}
+
+        for collection in collections:
+            print(f"  Snapshotting {collection} → {self.file_for(collection)}")
+            schema = self.schema(collection)
+            projection = {name: 1 for name in COLUMNS[collection] if name != "device_type"}
+            if collection == "analytics":
+                projection["metadata.device_type"] = 1
+
+            mark = HighWaterMark(collection)
+            cursor = db[collection].find({}, projection, batch_size=min(batch_size, 10000))
+            tmp_path = self.file_for(collection) + ".part"
+            rows = []
+            try:
+                with self.pq.ParquetWriter(tmp_path, schema, compression="zstd") as writer:
+                    for doc in mark.observe(cursor):
+                        rows.append(_flatten(collection, doc))
+                        if len(rows) >= batch_size:
+                            writer.write_table(self.pa.Table.from_pylist(rows, schema=schema))
+                            rows = []
+                    if rows or mark.seen == 0:
+                        writer.write_table(self.pa.Table.from_pylist(rows, schema=schema))
+            finally:
+                cursor.close()
+            os.replace(tmp_path, self.file_for(collection))
+
+            manifest["collections"][collection] = {
+                "rows": mark.seen,
+                "updatedAt": mark.updated_at.isoformat() if mark.updated_at else None,
+                "objectId": str(mark.object_id) if mark.object_id else None,
+            }
+            print(f"    {mark.seen} rows")
+
+        manifest["createdAt"] = datetime.now(timezone.utc).isoformat()
+        with open(os.path.join(self.path, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+    def manifest(self):
+        with open(os.path.join(self.path, MANIFEST)) as f:
+            return json.load(f)
+
+    def high_water_mark(self, collection):
+        """The mark as of export time, so incremental syncs can continue after a restore."""
+        from bson import ObjectId
+
+        info = self.manifest()["collections"].get(collection, {})
+        return HighWaterMark(
+            collection,
+            datetime.fromisoformat(info["updatedAt"]) if info.get("updatedAt") else None,
+            ObjectId(info["objectId"]) if info.get("objectId") else None,
+        )
+
+    # ── Import ───────────────────────────────────────────────────────────────
+
+    def _text(self, batch, name, default=""):
+        return self.pc.fill_null(batch.column(name), default)
+
+    def _flag(self, batch, name):
+        return self.pc.fill_null(batch.column(name), False)
+
+    def _date(self, batch):
+        return self.pc.utf8_slice_codeunits(self._text(batch, "timestamp"), 0, 10)
+
+    def _params(self, collection, batch):
+        """Vectorized equivalent of the *_params mappings for one record batch."""
+        pc = self.pc
+        if collection == "game":
+            columns = {
+                "cmsId": pc.coalesce(batch.column("cmsId"), batch.column("id"), ""),
+                "friendlyName": self._text(batch, "friendlyName"),
+                "group": self._text(batch, "group"),
+                "publishedType": self._text(batch, "publishedType", "default"),
+                "animate": self._flag(batch, "animate"),
+                "hover": self._flag(batch, "hover"),
+                "analytics": self._flag(batch, "analytics"),
+            }
+        elif collection == "abtest":
+            renamed = {"testId": "id", "imageA": "imageVariantA", "videoA": "videoVariantA",
+                       "imageB": "imageVariantB", "videoB": "videoVariantB"}
+            columns = {key: self._text(batch, renamed.get(key, key)) for key in (
+                "testId", "name", "description", "startDate", "endDate", "startTime", "endTime",
+                "group", "gameId", "imageA", "videoA", "imageB", "videoB")}
+            columns["published"] = self._flag(batch, "published")
+        elif collection == "abtestdata":
+            is_a = pc.fill_null(pc.equal(batch.column("variant"), "variantA"), False)
+            columns = {
+                "eventId": self._text(batch, "id"),
+                "eventType": self._text(batch, "eventType"),
+                "device": self._text(batch, "device"),
+                "timestamp": self._text(batch, "timestamp"),
+                "date": self._date(batch),
+                "distributionWeight": pc.fill_null(batch.column("distributionWeight"), 0.0),
+                "variantType": pc.if_else(is_a, "A", "B"),
+                "gameId": self._text(batch, "gameId"),
+            }
+        elif collection == "analytics":
+            columns = {
+                "eventId": self._text(batch, "id"),
+                "eventType": self._text(batch, "eventType"),
+                "assetType": self._text(batch, "assetType"),
+                "assetUrl": self._text(batch, "assetUrl"),
+                "timestamp": self._text(batch, "timestamp"),
+                "date": self._date(batch),
+                "device": self._text(batch, "device_type", "unknown"),
+                "gameId": self._text(batch, "gameId"),
+                "sessionId": self._text(batch, "sessionId"),
+                "userId": self._text(batch, "userId"),
+                "accountId": self._text(batch, "accountId"),
+            }
+        elif collection == "promotion":
+            columns = {key: self._text(batch, key if key != "promoId" else "id") for key in (
+                "promoId", "name", "description", "group", "startDate", "endDate")}
+            columns["published"] = self._flag(batch, "published")
+            columns["games"] = batch.column("games")
+        else:
+            raise Exception(f"No snapshot mapping for collection: {collection}")
+
+        columns["mongoId"] = batch.column("_id")
+        return self.pa.table(columns)
+
+    def rows(self, collection, batch_size=SNAPSHOT_BATCH_SIZE):
+        """Yield graph parameter rows for a collection, built one record batch at a time."""
+        parquet = self.pq.ParquetFile(self.file_for(collection))
+        for batch in parquet.iter_batches(batch_size=batch_size):
+            yield from self._params(collection, batch).to_pylist()
+
+    def session_rows(self):
+        """Sessions grouped from the analytics snapshot, like the $group in create_session_nodes."""
+        table = self.pq.read_table(self.file_for("analytics"), columns=[
+            "sessionId", "userId", "accountId", "timestamp", "gameId", "device_type"])
+        grouped = table.group_by("sessionId", use_threads=False).aggregate([
+            ("userId", "first"), ("accountId", "first"), ("timestamp", "min"), ("timestamp", "max"),
+            ("sessionId", "count", self.pc.CountOptions(mode="all")), ("gameId", "distinct"),
+            ("device_type", "first"),
+        ])
+        pc = self.pc
+        sessions = self.pa.table({
+            "sessionId": pc.fill_null(grouped.column("sessionId"), ""),
+            "userId": grouped.column("userId_first"),
+            "accountId": grouped.column("accountId_first"),
+            "firstEvent": grouped.column("timestamp_min"),
+            "lastEvent": grouped.column("timestamp_max"),
+            "eventCount": grouped.column("sessionId_count"),
+            "device": grouped.column("device_type_first"),
+            "gameIds": grouped.column("gameId_distinct"),
+        })
+        for batch in sessions.to_batches(max_chunksize=SNAPSHOT_BATCH_SIZE):
+            yield from batch.to_pylist()
@@ -0,0 +1,265 @@
+"""
+The build steps of the knowledge graph, shared by every builder.
+
+Each function loads one kind of node from MongoDB (or a Parquet snapshot)
+into Neo4j through the batched UNWIND statements in kg_intel.mappings.
+kg_intel.pipeline decides which of them run, in which order, and with which
+high-water marks.
+"""
+
+from kg_intel.connections import run_cypher
+from kg_intel.sync_state import HighWaterMark
+from kg_intel.mappings import (
+    game_params, abtest_params, abtest_event_params, session_params, analytics_event_params, promotion_params,
+    GAME_UPSERT, ABTEST_UPSERT, ABTEST_EVENT_UPSERT, SESSION_UPSERT, ANALYTICS_EVENT_UPSERT, PROMOTION_UPSERT,
+)
+from kg_intel.ingest import iter_batches, upsert_rows, ParallelLoader
+from kg_intel.rollups import clear_rollups
+
+
+def _count(driver, label):
+    return run_cypher(driver, f"MATCH (n:{label}) RETURN count(n) AS count")[0]["count"]
+
+
+def _drop_vector_indexes(driver, prefix=""):
+    for idx in run_cypher(driver, "SHOW VECTOR INDEXES"):
+        name = idx.get("name") or ""
+        if name.startswith(prefix):
+            run_cypher(driver, f"DROP INDEX `{name}` IF EXISTS")
+            print(f"  Dropped vector index: {name}")
+
+
+# ── Clearing ─────────────────────────────────────────────────────────────────
+
+def wipe_graph(driver):
+    print("\n── Wiping Neo4j ──")
+    _drop_vector_indexes(driver)
+    run_cypher(driver, "MATCH (n) DETACH DELETE n")
+    print(f"  Nodes remaining: {run_cypher(driver, 'MATCH (n) RETURN count(n) AS count')[0]['count']}")
+
+
+def clear_abtest_nodes(driver):
+    print("\n── Clearing existing AB test nodes ──")
+    run_cypher(driver, "MATCH (v:Variant) DETACH DELETE v")
+    run_cypher(driver, "MATCH (t:ABTest) DETACH DELETE t")
+    print("  Cleared ABTest and Variant nodes")
+
+
+def clear_abtest_event_nodes(driver):
+    print("\n── Clearing existing AB test event nodes ──")
+    run_cypher(driver, "MATCH (e:ABTestEvent) DETACH DELETE e")
+    clear_rollups(driver, "abtest")
+    print("  Cleared ABTestEvent and AB test rollup nodes")
+
+
+def clear_session_nodes(driver):
+    print("\n── Clearing existing Session nodes ──")
+    run_cypher(driver, "MATCH (s:Session) DETACH DELETE s")
+
+
+def clear_analytics_event_nodes(driver):
+    print("\n── Clearing existing analytics nodes ──")
+    run_cypher(driver, "MATCH (e:AnalyticsEvent) DETACH DELETE e")
+    clear_rollups(driver, "analytics")
+    _drop_vector_indexes(driver, "analytics_")
+    print("  Cleared AnalyticsEvent and analytics rollup nodes")
+
+
+def clear_promotion_nodes(driver):
+    print("\n── Clearing existing promotion nodes ──")
+    run_cypher(driver, "MATCH (pg:PromoGame) DETACH DELETE pg")
+    run_cypher(driver, "MATCH (p:Promotion) DETACH DELETE p")
+    _drop_vector_indexes(driver, "promo_")
+    print("  Cleared Promotion and PromoGame nodes")
+
+
+# ── Games ────────────────────────────────────────────────────────────────────
+
+def sync_games(driver, db, mark=None, snapshot=None):
+    """Upsert Game nodes; every other stage links to them, so this runs once per pipeline."""
+    print("\n── Syncing Game nodes ──")
+    if snapshot is not None:
+        print(f"  Loading games from snapshot {snapshot.path}")
+        rows = snapshot.rows("game")
+    else:
+        mark = mark or HighWaterMark("game")
+        games = list(mark.observe(db.game.find(mark.mongo_filter())))
+        print(f"  Found {len(games)} new or changed games in MongoDB")
+        rows = map(game_params, games)
+
+    upsert_rows(driver, GAME_UPSERT, rows)
+    print(f"  {_count(driver, 'Game')} Game nodes total")
+
+
+# ── AB tests ─────────────────────────────────────────────────────────────────
+
+def create_abtest_nodes(driver, db, mark=None, snapshot=None):
+    print("\n── Creating ABTest + Variant nodes ──")
+    if snapshot is not None:
+        print(f"  Loading AB tests from snapshot {snapshot.path}")
+        rows = snapshot.rows("abtest")
+    else:
+        mark = mark or HighWaterMark("abtest")
+        abtests = list(mark.observe(db.abtest.find(mark.mongo_filter())))
+        print(f"  Found {len(abtests)} new or changed AB tests in MongoDB")
+        rows = map(abtest_params, abtests)
+
+    upsert_rows(driver, ABTEST_UPSERT, rows)
+    print(f"  Created {_count(driver, 'ABTest')} ABTest nodes, {_count(driver, 'Variant')} Variant nodes")
+
+
+ABTEST_EVENT_BATCH_SIZE = 100
+EVENT_WORKERS = 4
+
+# Only the fields the graph uses are pulled from MongoDB
+ABTEST_EVENT_PROJECTION = {
+    "_id": 1, "date_updated": 1, "id": 1, "eventType": 1, "device": 1, "timestamp": 1,
+    "distributionWeight": 1, "variant": 1, "gameId": 1,
+}
+
+
+def create_abtest_event_nodes(driver, db, batch_size=ABTEST_EVENT_BATCH_SIZE, mark=None, workers=EVENT_WORKERS,
+                              snapshot=None):
+    print("\n── Creating ABTestEvent nodes ──")
+    # Partition by game so concurrent writers never contend for the same Game's relationships
+    loader = ParallelLoader(driver, ABTEST_EVENT_UPSERT, "gameId", workers=workers, batch_size=batch_size,
+                            unique_key="eventId")
+
+    if snapshot is not None:
+        print(f"  Loading AB test events from snapshot {snapshot.path} ({workers} writers)")
+        processed = loader.load(snapshot.rows("abtestdata"))
+    else:
+        mark = mark or HighWaterMark("abtestdata")
+        total = db.abtestdata.estimated_document_count()
+        print(f"  Streaming new or changed events of ~{total} AB test events from MongoDB "
+              f"({workers} writers, initial batch size {batch_size})")
+
+        cursor = db.abtestdata.find(mark.mongo_filter(), ABTEST_EVENT_PROJECTION, batch_size=batch_size)
+        try:
+            processed = loader.load(map(abtest_event_params, mark.observe(cursor)))
+        finally:
+            cursor.close()
+
+    print(f"  Created {_count(driver, 'ABTestEvent')} ABTestEvent nodes")
+    return processed
+
+
+# ── Analytics ────────────────────────────────────────────────────────────────
+
+SESSION_BATCH_SIZE = 50
+
+
+def create_session_nodes(driver, db, batch_size=SESSION_BATCH_SIZE, mark=None, snapshot=None):
+    print("\n── Creating Session nodes ──")
+
+    if snapshot is not None:
+        processed = upsert_rows(driver, SESSION_UPSERT, snapshot.session_rows(), batch_size=batch_size)
+        print(f"  Grouped {processed} unique sessions from snapshot {snapshot.path}")
+        return
+
+    pipeline = []
+    if mark is not None and mark.mongo_filter():
+        # Recompute only sessions that received new or changed events, over all their events
+        touched = db.analytics.distinct("sessionId", mark.mongo_filter())
+        print(f"  {len(touched)} sessions touched since the last sync")
+        pipeline.append({"$match": {"sessionId": {"$in": touched}}})
+
+    pipeline += [
+        {"$group": {
+            "_id": "$sessionId",
+            "userId": {"$first": "$userId"},
+            "accountId": {"$first": "$accountId"},
+            "firstEvent": {"$min": "$timestamp"},
+            "lastEvent": {"$max": "$timestamp"},
+            "eventCount": {"$sum": 1},
+            "gameIds": {"$addToSet": "$gameId"},
+            "device": {"$first": "$metadata.device_type"},
+        }},
+    ]
+    # $group output can exceed the 100MB in-memory stage limit on large collections
+    cursor = db.analytics.aggregate(pipeline, allowDiskUse=True, batchSize=batch_size)
+
+    processed = 0
+    for params_list in iter_batches(map(session_params, cursor), batch_size):
+        run_cypher(driver, SESSION_UPSERT, {"rows": params_list})
+        processed += len(params_list)
+    cursor.close()
+    print(f"  Streamed {processed} unique sessions")
+    print(f"  Created {_count(driver, 'Session')} Session nodes")
+
+
+ANALYTICS_EVENT_BATCH_SIZE = 200
+
+# Only the fields the graph uses are pulled from MongoDB
+ANALYTICS_EVENT_PROJECTION = {
+    "_id": 1, "date_updated": 1, "id": 1, "eventType": 1, "assetType": 1, "assetUrl": 1,
+    "timestamp": 1, "metadata.device_type": 1, "gameId": 1, "sessionId": 1,
+}
+
+
+def create_analytics_event_nodes(driver, db, batch_size=ANALYTICS_EVENT_BATCH_SIZE, mark=None,
+                                 workers=EVENT_WORKERS, snapshot=None):
+    print("\n── Creating AnalyticsEvent nodes ──")
+    # Partition by game so concurrent writers never contend for the same Game's relationships
+    loader = ParallelLoader(driver, ANALYTICS_EVENT_UPSERT, "gameId", workers=workers, batch_size=batch_size,
+                            unique_key="eventId")
+
+    if snapshot is not None:
+        print(f"  Loading analytics events from snapshot {snapshot.path} ({workers} writers)")
+        processed = loader.load(snapshot.rows("analytics"))
+    else:
+        mark = mark or HighWaterMark("analytics")
+        total = db.analytics.estimated_document_count()
+        print(f"  Streaming new or changed events of ~{total} analytics events from MongoDB "
+              f"({workers} writers, initial batch size {batch_size})")
+
+        cursor = db.analytics.find(mark.mongo_filter(), ANALYTICS_EVENT_PROJECTION, batch_size=batch_size)
+        try:
+            processed = loader.load(map(analytics_event_params, mark.observe(cursor)))
+        finally:
+            cursor.close()
+
+    print(f"  Created {_count(driver, 'AnalyticsEvent')} AnalyticsEvent nodes")
+    return processed
+
+
+# ── Promotions ───────────────────────────────────────────────────────────────
+
+def create_promotion_nodes(driver, db, mark=None, snapshot=None):
+    print("\n── Creating Promotion + PromoGame nodes ──")
+    if snapshot is not None:
+        print(f"  Loading promotions from snapshot {snapshot.path}")
+        rows = snapshot.rows("promotion")
+    else:
+        mark = mark or HighWaterMark("promotion")
+        promos = list(mark.observe(db.promotion.find(mark.mongo_filter())))
+        print(f"  Found {len(promos)} new or changed promotions in MongoDB")
+        rows = map(promotion_params, promos)
+
+    # Also drops PromoGames that were removed from a changed promotion
+    upsert_rows(driver, PROMOTION_UPSERT, rows)
+    print(f"  Created {_count(driver, 'Promotion')} Promotion nodes, {_count(driver, 'PromoGame')} PromoGame nodes")
+
+
+# ── Summary ──────────────────────────────────────────────────────────────────
+
+def print_summary(driver):
+    print("\n── Graph Summary ──")
+
+    labels = run_cypher(driver, """
+        MATCH (n)
+        RETURN labels(n)[0] AS label, count(n) AS count
+        ORDER BY count DESC
+    """)
+    for row in labels:
+        print(f"  {row['label']}: {row['count']} nodes")
+
+    rels = run_cypher(driver, """
+        MATCH ()-[r]->()
+        RETURN type(r) AS type, count(r) AS count
+        ORDER BY count DESC
+    """)
+    for row in rels:
+        print(f"  {row['type']}: {row['count']} relationships")
+
+    print("\nDone.")
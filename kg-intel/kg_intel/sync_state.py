@@ -0,0 +1,137 @@
+"""
+Per-collection high-water marks for incremental graph syncs.
+
+Each synced MongoDB collection gets a (:SyncState {collection}) node holding
+the newest `date_updated` and `_id` seen so far. An incremental run only pulls
+documents past that mark, and only advances it once the stage has finished.
+
+A separate (:SyncState {collection: "__graph__"}) node carries the graph
+version: builders and the live updater bump it whenever they change the
+graph, and readers such as the visualization server's snapshot cache compare
+it to decide whether cached data is stale. The version is a millisecond
+timestamp (kept strictly increasing), so it does not repeat after a wipe.
+"""
+
+from datetime import datetime
+
+GRAPH_VERSION_KEY = "__graph__"
+
+
+class HighWaterMark:
+    """Tracks the newest date_updated / _id seen while streaming a collection."""
+
+    def __init__(self, collection, updated_at=None, object_id=None):
+        self.collection = collection
+        self.updated_at = updated_at
+        self.object_id = object_id
+        self.seen = 0
+
+    def observe(self, docs):
+        """Pass documents through unchanged while advancing the mark."""
+        for doc in docs:
+            updated_at = doc.get("date_updated")
+            if isinstance(updated_at, datetime) and (self.updated_at is None or updated_at > self.updated_at):
+                self.updated_at = updated_at
+            object_id = doc.get("_id")
+            if object_id is not None and (self.object_id is None or object_id > self.object_id):
+                self.object_id = object_id
+            self.seen += 1
+            yield doc
+
+    def mongo_filter(self):
+        """Documents updated after the mark, or (without date_updated) inserted after it."""
+        if self.updated_at is None and self.object_id is None:
+            return {}
+        clauses = []
+        if self.updated_at is not None:
+            clauses.append({"date_updated": {"$gt": self.updated_at}})
+        if self.object_id is not None:
+            clauses.append({"date_updated": {"$exists": False}, "_id": {"$gt": self.object_id}})
+        return {"$or": clauses}
+
+
+def load_high_water_mark(driver, collection):
+    from bson import ObjectId
+
+    with driver.session() as session:
+        record = session.run("""
+            MATCH (s:SyncState {collection: $collection})
+            RETURN s.updatedAt AS updatedAt, s.objectId AS objectId
+        """, {"collection": collection}).single()
+
+    if record is None:
+        return HighWaterMark(collection)
+    updated_at = datetime.fromisoformat(record["updatedAt"]) if record["updatedAt"] else None
+    object_id = ObjectId(record["objectId"]) if record["objectId"] else None
+    return HighWaterMark(collection, updated_at, object_id)
+
+
+def save_high_water_mark(driver, mark):
+    with driver.session() as session:
+        session.run("""
+            MERGE (s:SyncState {collection: $collection})
+            SET s.updatedAt = $updatedAt,
+                s.objectId = $objectId,
+                s.lastSyncedAt = datetime(),
+                s.lastSyncCount = $seen
+        """, {
+            "collection": mark.collection,
+            "updatedAt": mark.updated_at.isoformat() if mark.updated_at else None,
+            "objectId": str(mark.object_id) if mark.object_id else None,
+            "seen": mark.seen,
+        }).consume()
+    print(f"  High-water mark for {mark.collection}: {mark.updated_at} / {mark.object_id} ({mark.seen} changed)")
+
+
+def bump_graph_version(tx):
+    """Mark the graph as changed; `tx` may be a session or a transaction. Returns the new version."""
+    record = tx.run("""
+        MERGE (s:SyncState {collection: $key})
+        SET s.version = CASE WHEN timestamp() > coalesce(s.version, 0) THEN timestamp() ELSE s.version + 1 END,
+            s.lastSyncedAt = datetime()
+        RETURN s.version AS version
+    """, {"key": GRAPH_VERSION_KEY}).single()
+    return record["version"]
+
+
+def load_graph_version(driver):
+    """The current graph version, or None if no builder has recorded one yet."""
+    with driver.session() as session:
+        record = session.run("""
+            MATCH (s:SyncState {collection: $key})
+            RETURN s.version AS version
+        """, {"key": GRAPH_VERSION_KEY}).single()
+    return record["version"] if record else None
+
+
+def clear_high_water_marks(driver, collections):
+    """Forget the marks so the next incremental run re-syncs every document (pipeline --reset-marks)."""
+    with driver.session() as session:
+        session.run("""
+            MATCH (s:SyncState) WHERE s.collection IN $collections
+            DETACH DELETE s
+        """, {"collections": list(collections)}).consume()
+
+
+def delete_removed(driver, collection, label, key, mongo_fields=("id",), key_of=None):
+    """
+    Delete nodes whose key no longer exists in the MongoDB collection.
+
+    Only the key fields are read from either side. `key_of` maps a MongoDB
+    document to the node key (defaults to the first of `mongo_fields`).
+    """
+    key_of = key_of or (lambda doc: doc.get(mongo_fields[0], ""))
+    projection = {"_id": 0, **{field: 1 for field in mongo_fields}}
+    mongo_ids = {key_of(doc) for doc in collection.find({}, projection)}
+    with driver.session() as session:
+        graph_ids = [r["id"] for r in session.run(f"MATCH (n:{label}) RETURN n.{key} AS id")]
+        removed = [i for i in graph_ids if i not in mongo_ids]
+        for start in range(0, len(removed), 1000):
+            session.run(f"""
+                UNWIND $ids AS id
+                MATCH (n:{label} {{{key}: id}})
+                DETACH DELETE n
+            """, {"ids": removed[start:start + 1000]}).consume()
+    if removed:
+        print(f"  Deleted {len(removed)} removed {label} nodes")
+    return removed
@@ -0,0 +1,252 @@
+"""
+Local, in-process vector indexes over the stored node embeddings.
+
+`export` copies the nameEmbedding / descriptionEmbedding vectors of each
+Neo4j vector index into a directory:
+
+    <index>.npy       float32 (N, D) matrix of L2-normalised vectors
+    <index>.json      node keys and the metadata used for filtering / display
+    <index>.ivf.npz   optional IVF clustering (centroids + vector order per list)
+
+LocalVectorIndex memory-maps the matrix, so opening an index is cheap and
+the OS page cache is shared between processes. Search is exact cosine top-k
+by default; with an IVF file only the `n_probe` nearest lists are scanned.
+Filters on group / published are applied before ranking, so a filtered
+query still returns k results when k matches exist. Only A/B tests and
+promotions have a published flag; asking a game index for it is an error.
+
+Requires numpy (pip install numpy).
+
+Usage:
+    python -m kg_intel.vector_index export [--dir DIR] [--ivf]
+    python -m kg_intel.vector_index search "slot machine games" [--index game_name_embeddings]
+                                           [--group G] [--published] [--k 5] [--dir DIR]
+"""
+
+import os
+import json
+import argparse
+
+from kg_intel.connections import run_cypher
+
+INDEX_DIR = os.path.join(os.path.dirname(__file__), '..', '.cache', 'vector_index')
+EXPORT_BATCH_SIZE = 2000
+IVF_MIN_VECTORS = 1024
+IVF_ITERATIONS = 20
+DEFAULT_N_PROBE = 8
+
+# index → (label, key property, embedding property, display properties)
+VECTOR_INDEXES = {
+    "game_name_embeddings": ("Game", "cmsId", "nameEmbedding", ("friendlyName", "publishedType")),
+    "abtest_desc_embeddings": ("ABTest", "testId", "descriptionEmbedding", ("name", "description", "gameId")),
+    "promo_desc_embeddings": ("Promotion", "promoId", "descriptionEmbedding", ("name", "description")),
+}
+# Labels that carry a published flag (Game has publishedType, which is a display style, not a flag)
+PUBLISHED_LABELS = {"ABTest", "Promotion"}
+
+
+def _require_numpy():
+    try:
+        import numpy as np
+    except ImportError:
+        raise Exception("numpy is required for local vector indexes (pip install numpy)")
+    return np
+
+
+def _normalize(np, vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def build_ivf(vectors, n_lists=None, iterations=IVF_ITERATIONS, seed=0):
+    """Spherical k-means over normalised vectors; returns (centroids, order, offsets)."""
+    np = _require_numpy()
+    n = len(vectors)
+    n_lists = n_lists or max(1, int(np.sqrt(n)))
+    rng = np.random.default_rng(seed)
+    centroids = np.array(vectors[rng.choice(n, n_lists, replace=False)], dtype=np.float32)
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        empty = np.bincount(assign, minlength=n_lists) == 0
+        sums[empty] = centroids[empty]
+        centroids = _normalize(np, sums).astype(np.float32)
+
+    assign = np.argmax(vectors @ centroids.T, axis=1)
+    order = np.argsort(assign, kind="stable")
+    offsets = np.searchsorted(assign[order], np.arange(n_lists + 1))
+    return centroids, order, offsets
+
+
+def export_index(driver, index, directory=INDEX_DIR, ivf=False):
+    """Copy one Neo4j vector index's vectors and metadata to `directory`; returns the vector count."""
+    np = _require_numpy()
+    label, key, prop, display = VECTOR_INDEXES[index]
+    os.makedirs(directory, exist_ok=True)
+
+    fields = ", ".join(f"n.{p} AS {p}" for p in display)
+    published = "n.published" if label in PUBLISHED_LABELS else "null"
+    meta = {"index": index, "label": label, "key": key, "keys": [], "group": [],
+            "published": [] if label in PUBLISHED_LABELS else None, "display": {p: [] for p in display}}
+    chunks = []
+
+    # Page by key so each round-trip stays small; vectors are normalised as they arrive
+    last_key = None
+    while True:
+        batch = run_cypher(driver, f"""
+            MATCH (n:{label}) WHERE n.{prop} IS NOT NULL AND ($after IS NULL OR n.{key} > $after)
+            RETURN n.{key} AS key, n.{prop} AS vector, n.group AS group, {published} AS published, {fields}
+            ORDER BY n.{key} LIMIT $limit
+        """, {"after": last_key, "limit": EXPORT_BATCH_SIZE})
+        if not batch:
+            break
+        chunks.append(_normalize(np, np.asarray([r["vector"] for r in batch], dtype=np.float32)))
+        for r in batch:
+            meta["keys"].append(r["key"])
+            meta["group"].append(r["group"])
+            if meta["published"] is not None:
+                meta["published"].append(r["published"])
+            for p in display:
+                meta["display"][p].append(r[p])
+        last_key = batch[-1]["key"]
+
+    if not chunks:
+        print(f"  {index}: no vectors to export")
+        return 0
+    vectors = np.concatenate(chunks)
+    np.save(os.path.join(directory, f"{index}.npy"), vectors)
+    with open(os.path.join(directory, f"{index}.json"), "w") as f:
+        json.dump(meta, f)
+
+    ivf_path = os.path.join(directory, f"{index}.ivf.npz")
+    if ivf and len(vectors) >= IVF_MIN_VECTORS:
+        centroids, order, offsets = build_ivf(vectors)
+        np.savez(ivf_path, centroids=centroids, order=order, offsets=offsets)
+        print(f"  {index}: built IVF with {len(centroids)} lists")
+    elif os.path.exists(ivf_path):
+        os.remove(ivf_path)
+    print(f"  {index}: exported {len(vectors)} vectors")
+    return len(vectors)
+
+
+class LocalVectorIndex:
+    def __init__(self, index, directory=INDEX_DIR):
+        np = self.np = _require_numpy()
+        self.index = index
+        self.vectors = np.load(os.path.join(directory, f"{index}.npy"), mmap_mode="r")
+        with open(os.path.join(directory, f"{index}.json")) as f:
+            self.meta = json.load(f)
+        self.keys = self.meta["keys"]
+        self.groups = np.array(self.meta["group"], dtype=object)
+        # None for labels without a published flag
+        self.published = None
+        if self.meta.get("published") is not None and self.meta.get("label") in PUBLISHED_LABELS:
+            self.published = np.array([p is True for p in self.meta["published"]])
+
+        self.ivf = None
+        ivf_path = os.path.join(directory, f"{index}.ivf.npz")
+        if os.path.exists(ivf_path):
+            with np.load(ivf_path) as ivf:
+                self.ivf = (ivf["centroids"], ivf["order"], ivf["offsets"])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _candidates(self, query, n_probe):
+        """Row numbers to score: every row, or the members of the n_probe nearest IVF lists."""
+        if self.ivf is None:
+            return None
+        centroids, order, offsets = self.ivf
+        nearest = self.np.argsort(-(centroids @ query))[:n_probe]
+        return self.np.concatenate([order[offsets[i]:offsets[i + 1]] for i in nearest])
+
+    def search(self, vector, k=10, group=None, published=None, n_probe=DEFAULT_N_PROBE, exact=False):
+        """Top-k rows by cosine similarity as dicts of key, score and display metadata."""
+        np = self.np
+        if published is not None and self.published is None:
+            raise ValueError(f"{self.index} has no published flag to filter on (only {sorted(PUBLISHED_LABELS)} do)")
+        query = _normalize(np, np.asarray(vector, dtype=np.float32))
+        rows = None if exact else self._candidates(query, n_probe)
+
+        mask = None
+        if group is not None:
+            mask = self.groups == group
+        if published is not None:
+            mask = (self.published == published) if mask is None else mask & (self.published == published)
+
+        if rows is not None:
+            rows = np.sort(rows)
+            if mask is not None:
+                rows = rows[mask[rows]]
+            if len(rows) < k:
+                # Too few filtered matches in the probed lists; scan everything instead
+                rows = None
+        if rows is None and mask is not None:
+            rows = np.flatnonzero(mask)
+        scores = self.vectors @ query if rows is None else self.vectors[rows] @ query
+
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        results = []
+        for i in top:
+            row = int(rows[i]) if rows is not None else int(i)
+            hit = {"key": self.keys[row], "score": float(scores[i]), "group": self.meta["group"][row]}
+            if self.published is not None:
+                hit["published"] = self.meta["published"][row]
+            hit.update({p: values[row] for p, values in self.meta["display"].items()})
+            results.append(hit)
+        return results
+
+
+def main():
+    from kg_intel.connections import load_env, get_driver, close_connections
+    from kg_intel.embeddings import OpenAIEmbedder, FakeEmbedder
+
+    load_env()
+    parser = argparse.ArgumentParser(description="Export and query local vector indexes")
+    parser.add_argument("--dir", default=INDEX_DIR, help="Directory holding the exported indexes")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="Copy the Neo4j vector indexes to local files")
+    export.add_argument("--index", action="append", choices=sorted(VECTOR_INDEXES),
+                        help="Index to export (repeatable; default all)")
+    export.add_argument("--ivf", action="store_true",
+                        help=f"Also build an IVF clustering for indexes with at least {IVF_MIN_VECTORS} vectors")
+
+    search = sub.add_parser("search", help="Semantic search against a local index")
+    search.add_argument("question")
+    search.add_argument("--index", default="abtest_desc_embeddings", choices=sorted(VECTOR_INDEXES))
+    search.add_argument("--k", type=int, default=5)
+    search.add_argument("--group")
+    search.add_argument("--published", action="store_true", help="Only published tests / promotions")
+    search.add_argument("--exact", action="store_true", help="Ignore the IVF lists and scan every vector")
+    search.add_argument("--fake-embeddings", action="store_true",
+                        help="Embed the question with the offline FakeEmbedder")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        try:
+            for index in args.index or VECTOR_INDEXES:
+                export_index(get_driver(), index, args.dir, ivf=args.ivf)
+        finally:
+            close_connections()
+        return
+
+    if args.published and VECTOR_INDEXES[args.index][0] not in PUBLISHED_LABELS:
+        parser.error(f"--published does not apply to {args.index}")
+    embedder = FakeEmbedder() if args.fake_embeddings else OpenAIEmbedder()
+    index = LocalVectorIndex(args.index, args.dir)
+    hits = index.search(embedder.embed([args.question])[0], k=args.k, group=args.group,
+                        published=True if args.published else None, exact=args.exact)
+    for hit in hits:
+        label = hit.get("name") or hit.get("friendlyName")
+        print(f"  [{hit['score']:.4f}] {label} ({hit['key']})")
+
+
+if __name__ == "__main__":
+    main()
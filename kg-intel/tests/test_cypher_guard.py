@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+
+import pytest
+
+from kg_intel.cypher_guard import QueryRejected, check_query, enforce_limit, summarize_plan
+
+
+def op(operator, rows, details="", children=()):
+    # Shaped like neo4j.ResultSummary.plan: operator arguments live under "args"
+    return {"operatorType": f"{operator}@neo4j", "identifiers": [],
+            "args": {"EstimatedRows": float(rows), "Details": details}, "children": list(children)}
+
+
+class FakeDriver:
+    def __init__(self, plan):
+        self.plan = plan
+        self.queries = []
+
+    def session(self, **kwargs):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query, params=None):
+        self.queries.append(query.text)
+        return SimpleNamespace(consume=lambda: SimpleNamespace(plan=self.plan))
+
+
+def test_rejects_large_all_nodes_scan():
+    driver = FakeDriver(op("ProduceResults", 1000, children=[op("Limit", 1000, children=[
+        op("AllNodesScan", 2_000_000, "n")])]))
+    with pytest.raises(QueryRejected) as rejected:
+        check_query(driver, "MATCH (n) RETURN n")
+    assert "AllNodesScan" in rejected.value.reason
+    assert "~2,000,000 rows  n" in rejected.value.plan
+
+
+def test_rejects_large_cartesian_product():
+    driver = FakeDriver(op("ProduceResults", 1, children=[op("EagerAggregation", 1, children=[
+        op("CartesianProduct", 9e8, children=[op("NodeByLabelScan", 30_000, "a:AnalyticsEvent"),
+                                               op("NodeByLabelScan", 30_000, "b:AnalyticsEvent")])])]))
+    with pytest.raises(QueryRejected, match="CartesianProduct"):
+        check_query(driver, "MATCH (a:AnalyticsEvent), (b:AnalyticsEvent) RETURN count(*)")
+
+
+def test_accepts_cheap_plan_and_adds_limit():
+    driver = FakeDriver(op("ProduceResults", 50, children=[op("NodeByLabelScan", 50, "g:Game")]))
+    cypher = check_query(driver, "MATCH (g:Game) RETURN g.friendlyName")
+    assert cypher.endswith("LIMIT 1000")
+    assert driver.queries == ["EXPLAIN " + cypher]
+
+
+def test_plan_summary_has_estimates():
+    summary = summarize_plan(op("ProduceResults", 10, children=[op("NodeByLabelScan", 10, "g:Game")]))
+    assert summary.splitlines() == ["ProduceResults  ~10 rows", "  NodeByLabelScan  ~10 rows  g:Game"]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("MATCH (g:Game) RETURN g LIMIT 5 // top five", "MATCH (g:Game) RETURN g LIMIT 5"),
+    ("MATCH (g:Game) RETURN g // all games", "MATCH (g:Game) RETURN g\nLIMIT 1000"),
+    ("MATCH (g:Game) RETURN g LIMIT 50000", "MATCH (g:Game) RETURN g LIMIT 1000"),
+    ("MATCH (e:AnalyticsEvent {assetUrl: 'https://cdn/x.mp4'}) RETURN e",
+     "MATCH (e:AnalyticsEvent {assetUrl: 'https://cdn/x.mp4'}) RETURN e\nLIMIT 1000"),
+])
+def test_enforce_limit(query, expected):
+    assert enforce_limit(query) == expected
+
+
+@pytest.mark.parametrize("query", [
+    "MATCH (n) DETACH DELETE n",
+    "MATCH (g:Game) SET g.hover = true",
+    "CREATE (:Game {cmsId: 'x'})",
+])
+def test_rejects_writes(query):
+    with pytest.raises(QueryRejected, match="Read-only"):
+        check_query(FakeDriver(None), query)
+
+
+@pytest.mark.parametrize("query", [
+    "RETURN apoc.create.uuid() AS id",
+    "MATCH (n:Game) WHERE n.set = 1 RETURN n.created",
+    "MATCH (g:Game {friendlyName: 'Create & Merge'}) RETURN g",
+])
+def test_allows_names_containing_write_keywords(query):
+    assert check_query(FakeDriver(None), query).endswith("LIMIT 1000")
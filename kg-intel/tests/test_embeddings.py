@@ -0,0 +1,109 @@
+import pytest
+
+from kg_intel import embeddings
+from kg_intel.embeddings import EmbeddingCache, FakeEmbedder, content_hash, embed_label
+
+SPEC = ("game_name_embeddings", "Game", "cmsId", "nameEmbedding", "n.friendlyName")
+
+
+class FakeGraph:
+    """Game nodes as dicts, answering the two statements embed_label runs against Neo4j."""
+
+    def __init__(self, names):
+        self.nodes = {key: {"text": name} for key, name in names.items()}
+
+    def run_cypher(self, driver, query, params=None):
+        if "CREATE VECTOR INDEX" in query:
+            return []
+        return [{"key": key, "text": node["text"], "hash": node.get("nameEmbeddingHash"),
+                 "missing": "nameEmbedding" not in node} for key, node in self.nodes.items()]
+
+    def upsert_rows(self, driver, query, rows, batch_size=None):
+        for row in rows:
+            self.nodes[row["key"]].update(nameEmbedding=row["vector"], nameEmbeddingHash=row["hash"])
+        return len(rows)
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    graph = FakeGraph({"g1": "Book of Ra", "g2": "Starburst", "g3": "Starburst"})
+    monkeypatch.setattr(embeddings, "run_cypher", graph.run_cypher)
+    monkeypatch.setattr(embeddings, "upsert_rows", graph.upsert_rows)
+    return graph
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "embeddings.sqlite")
+
+
+def embed(embedder, cache_path):
+    cache = EmbeddingCache(cache_path)
+    try:
+        return embed_label(None, embedder, cache, *SPEC)
+    finally:
+        cache.close()
+
+
+def test_first_build_requests_each_distinct_text_once(graph, cache_path):
+    embedder = FakeEmbedder(dimensions=8)
+
+    # Three changed nodes, two distinct texts: no cache hits, two texts sent in one request
+    assert embed(embedder, cache_path) == (3, 0, 2)
+    assert embedder.requests == 1
+    assert graph.nodes["g2"]["nameEmbedding"] == graph.nodes["g3"]["nameEmbedding"]
+    assert graph.nodes["g1"]["nameEmbeddingHash"] == content_hash("fake", "Book of Ra")
+
+
+def test_unchanged_nodes_are_skipped(graph, cache_path):
+    embedder = FakeEmbedder(dimensions=8)
+    embed(embedder, cache_path)
+
+    assert embed(embedder, cache_path) == (0, 0, 0)
+    assert embedder.requests == 1
+
+
+def test_changed_text_invalidates_only_that_node(graph, cache_path):
+    embedder = FakeEmbedder(dimensions=8)
+    embed(embedder, cache_path)
+    before = dict(graph.nodes["g2"])
+
+    graph.nodes["g1"]["text"] = "Book of Ra Deluxe"
+
+    assert embed(embedder, cache_path) == (1, 0, 1)
+    assert graph.nodes["g1"]["nameEmbeddingHash"] == content_hash("fake", "Book of Ra Deluxe")
+    assert graph.nodes["g1"]["nameEmbedding"] == pytest.approx(embedder.embed(["Book of Ra Deluxe"])[0], abs=1e-6)
+    assert graph.nodes["g2"] == before
+
+
+def test_rebuilt_graph_is_served_from_the_sqlite_cache(graph, cache_path):
+    embed(FakeEmbedder(dimensions=8), cache_path)
+    expected = graph.nodes["g1"]["nameEmbedding"]
+
+    # A fresh database (no stored vectors) with the cache file left from the previous build
+    fresh = FakeGraph({"g1": "Book of Ra", "g2": "Starburst", "g3": "Starburst"})
+    graph.nodes = fresh.nodes
+    embedder = FakeEmbedder(dimensions=8)
+
+    assert embed(embedder, cache_path) == (3, 2, 0)
+    assert embedder.requests == 0
+    # The cache stores float32, the first build wrote the embedder's full-precision floats
+    assert graph.nodes["g1"]["nameEmbedding"] == pytest.approx(expected, abs=1e-6)
+
+
+def test_changing_model_misses_the_cache(graph, cache_path):
+    embed(FakeEmbedder(dimensions=8), cache_path)
+    embedder = FakeEmbedder(model="fake-v2", dimensions=8)
+
+    assert embed(embedder, cache_path) == (3, 0, 2)
+    assert embedder.requests == 1
+
+
+def test_cache_round_trips_vectors_as_float32(cache_path):
+    cache = EmbeddingCache(cache_path)
+    cache.put_many({"a": [0.1, -0.2, 0.3]})
+    found = cache.get_many(["a", "missing"])
+    cache.close()
+
+    assert list(found) == ["a"]
+    assert found["a"] == pytest.approx([0.1, -0.2, 0.3], abs=1e-6)
@@ -0,0 +1,64 @@
+from kg_intel.graph_api import fetch_graph
+
+
+class FakeSession:
+    """
+    A tiny graph: Game 1, Variant 2, Session 3, with links Variant→Game and
+    Session→Game plus Game→Session. Link queries filter targets by $shown the
+    way the Cypher does.
+    """
+
+    NODES = {1: "Game", 2: "Variant", 3: "Session"}
+    LINKS = [(2, 1, "FOR_GAME"), (3, 1, "VISITED"), (1, 3, "SEEN_IN")]
+
+    def __init__(self):
+        self.queries = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def session(self):
+        return self
+
+    def run(self, query, params=None):
+        params = params or {}
+        self.queries.append((query, params))
+        if "db.labels()" in query:
+            return [{"label": label} for label in sorted(set(self.NODES.values()))]
+        if "GameDaily" in query or "VariantDaily" in query:
+            return []
+        if "-[r]->" in query:
+            label = query.split("`")[1] if "`" in query else None
+            return [{"source": a, "target": b, "type": t} for a, b, t in self.LINKS
+                    if (label is None and a in params["ids"] or self.NODES[a] == label)
+                    and self.NODES[b] in params["shown"]]
+        label = query.split("`")[1]
+        return [{"id": node_id, "labels": [node_label], "props": {}}
+                for node_id, node_label in self.NODES.items() if node_label == label and node_id > params["after"]]
+
+
+def test_label_filter_drops_links_to_unselected_labels():
+    graph = fetch_graph(FakeSession(), labels=["Game", "Session"], lod=False)
+
+    assert sorted(n["id"] for n in graph["nodes"]) == [1, 3]
+    assert sorted((l["source"], l["target"]) for l in graph["links"]) == [(1, 3), (3, 1)]
+
+
+def test_paged_links_still_point_at_labels_from_earlier_pages():
+    session = FakeSession()
+    first = fetch_graph(session, labels=["Game", "Session"], lod=False, limit=1)
+    second = fetch_graph(session, labels=["Game", "Session"], lod=False, limit=1, cursor=first["cursor"])
+
+    ids = {n["id"] for n in first["nodes"] + second["nodes"]}
+    links = first["links"] + second["links"]
+    assert links and all(l["source"] in ids and l["target"] in ids for l in links)
+
+
+def test_link_labels_keep_links_to_nodes_the_client_already_has():
+    graph = fetch_graph(FakeSession(), labels=["Session"], lod=False, link_labels=["Game", "SyncState"])
+
+    assert [n["id"] for n in graph["nodes"]] == [3]
+    assert [(l["source"], l["target"]) for l in graph["links"]] == [(3, 1)]
@@ -0,0 +1,141 @@
+from collections import Counter
+from types import SimpleNamespace
+
+from kg_intel.live_updater import ChangeBatch, apply_batch
+from kg_intel.mappings import ANALYTICS_EVENT_UPSERT, DELETE_BY_MONGO_ID, SESSION_EVENT_INCREMENT
+
+
+def change(op, coll, key, doc=None, token=None):
+    event = {"_id": token or {"_data": f"{op}-{key}"}, "operationType": op, "ns": {"db": "kg", "coll": coll}}
+    if key is not None:
+        event["documentKey"] = {"_id": key}
+    if doc is not None:
+        event["fullDocument"] = {"_id": key, **doc}
+    return event
+
+
+def analytics(key, event_id, session="s1"):
+    return change("insert", "analytics", key, {"id": event_id, "sessionId": session, "gameId": "g1",
+                                                "eventType": "click", "timestamp": "2024-05-01T10:00:00"})
+
+
+class FakeTx:
+    """
+    Records every statement and models the analytics ones: AnalyticsEvent nodes
+    by eventId and Session.eventCount, with SESSION_EVENT_INCREMENT's rule that
+    events already in the graph are not counted again.
+    """
+
+    def __init__(self):
+        self.queries = []
+        self.events = {}
+        self.sessions = Counter()
+
+    def run(self, query, params=None):
+        self.queries.append((query, params))
+        rows = (params or {}).get("rows", [])
+        if query == SESSION_EVENT_INCREMENT:
+            for row in rows:
+                if row["eventId"] not in self.events:
+                    self.sessions[row["sessionId"]] += 1
+        elif query == ANALYTICS_EVENT_UPSERT:
+            for row in rows:
+                self.events[row["eventId"]] = row
+        elif query == DELETE_BY_MONGO_ID["analytics"]:
+            for event_id, row in list(self.events.items()):
+                if row["mongoId"] in params["ids"]:
+                    self.sessions[row["sessionId"]] -= 1
+                    del self.events[event_id]
+        return SimpleNamespace(consume=lambda: None, single=lambda: {"version": len(self.queries)})
+
+    def index(self, query):
+        return [q for q, _ in self.queries].index(query)
+
+
+def test_updates_collapse_to_the_latest_document():
+    batch = ChangeBatch()
+    batch.add(change("insert", "game", "a", {"cmsId": "g1", "friendlyName": "Old"}))
+    batch.add(change("update", "game", "a", {"cmsId": "g1", "friendlyName": "New"}))
+
+    assert batch.upserts["game"] == {"a": {"_id": "a", "cmsId": "g1", "friendlyName": "New"}}
+    assert batch.size == 2
+
+
+def test_delete_after_insert_only_deletes():
+    batch = ChangeBatch()
+    batch.add(analytics("a", "e1"))
+    batch.add(change("delete", "analytics", "a"))
+
+    assert batch.upserts["analytics"] == {} and batch.session_events == {}
+    assert batch.deletes["analytics"] == {"a"}
+
+
+def test_analytics_updates_do_not_count_as_session_events():
+    batch = ChangeBatch()
+    batch.add(change("update", "analytics", "a", {"id": "e1", "sessionId": "s1"}))
+
+    assert "a" in batch.upserts["analytics"] and batch.session_events == {}
+
+
+def test_non_document_events_only_advance_the_token():
+    batch = ChangeBatch()
+    batch.add(change("drop", "analytics", None, token={"_data": "drop"}))
+    batch.add(change("rename", "game", None, token={"_data": "rename"}))
+
+    assert batch.size == 0 and batch.summary() == "no graph changes"
+    assert batch.resume_token == {"_data": "rename"}
+
+
+def test_apply_batch_orders_deletes_sessions_and_upserts():
+    batch = ChangeBatch()
+    batch.add(change("delete", "analytics", "old"))
+    batch.add(analytics("a", "e1"))
+    tx = FakeTx()
+
+    apply_batch(tx, batch)
+
+    assert tx.index(DELETE_BY_MONGO_ID["analytics"]) < tx.index(SESSION_EVENT_INCREMENT) \
+        < tx.index(ANALYTICS_EVENT_UPSERT)
+    assert "resumeToken" in tx.queries[-2][0] and "s.version" in tx.queries[-1][0]
+    assert tx.sessions == {"s1": 1}
+
+
+def test_replayed_inserts_are_not_counted_twice():
+    # After a re-sync the stream is replayed from the re-sync's start, repeating inserts it already saw
+    tx = FakeTx()
+    for _ in range(2):
+        batch = ChangeBatch()
+        batch.add(analytics("a", "e1"))
+        batch.add(analytics("b", "e2"))
+        apply_batch(tx, batch)
+
+    assert tx.sessions == {"s1": 2}
+    assert "existing IS NULL" in SESSION_EVENT_INCREMENT
+
+
+def test_deleted_events_are_uncounted():
+    tx = FakeTx()
+    batch = ChangeBatch()
+    batch.add(analytics("a", "e1"))
+    batch.add(analytics("b", "e2"))
+    apply_batch(tx, batch)
+
+    batch = ChangeBatch()
+    batch.add(change("delete", "analytics", "a"))
+    apply_batch(tx, batch)
+
+    assert tx.sessions == {"s1": 1} and list(tx.events) == ["e2"]
+
+
+def test_duplicate_event_ids_in_one_batch_are_written_once():
+    # Two Mongo documents carrying the same event id would both look new to the rollups
+    tx = FakeTx()
+    batch = ChangeBatch()
+    batch.add(analytics("a", "e1"))
+    batch.add(analytics("b", "e1"))
+
+    apply_batch(tx, batch)
+
+    (rows,) = [params["rows"] for query, params in tx.queries if query == ANALYTICS_EVENT_UPSERT]
+    assert [row["mongoId"] for row in rows] == ["b"]
+    assert tx.sessions == {"s1": 1}
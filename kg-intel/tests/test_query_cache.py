@@ -0,0 +1,54 @@
+import re
+
+import pytest
+
+from kg_intel.query_cache import TranslationCache, question_literals
+
+pytest.importorskip("numpy")
+
+
+class WordEmbedder:
+    """Embeds a question by its words alone, so questions differing only in literals look identical."""
+
+    VOCABULARY = ["top", "games", "by", "impressions", "which", "variant", "of", "won", "on"]
+
+    def embed(self, text):
+        words = re.findall(r"[a-z]+", text.lower())
+        return [float(words.count(w)) for w in self.VOCABULARY]
+
+
+@pytest.mark.parametrize("question, literals", [
+    ("Top 5 games by impressions", ["5"]),
+    ("Which variant of 'Book of Ra' won on 2024-05-01?", ["'Book of Ra'", "2024-05-01"]),
+    ("Which variant of Starburst won?", ["Starburst"]),
+    ("Which variant won? Show Starburst.", ["Starburst"]),
+])
+def test_question_literals(question, literals):
+    assert question_literals(question) == literals
+
+
+def test_similar_question_with_same_literals_is_a_hit():
+    cache = TranslationCache(WordEmbedder())
+    cache.put("Top 5 games by impressions", "MATCH (g:Game) RETURN g LIMIT 5")
+
+    cypher, how, example = cache.get("top 5 games, by impressions!")
+
+    assert (cypher, how, example) == ("MATCH (g:Game) RETURN g LIMIT 5", "similar", None)
+
+
+@pytest.mark.parametrize("question", [
+    "Top 10 games by impressions",
+    "Which variant of Starburst won",
+    "Which variant of 'Book of Ra' won on 2024-06-01",
+])
+def test_similar_question_with_other_literals_is_only_a_hint(question):
+    cache = TranslationCache(WordEmbedder())
+    cache.put("Top 5 games by impressions", "MATCH (g:Game) RETURN g LIMIT 5")
+    cache.put("Which variant of Gonzo won", "MATCH (t:ABTest {game: 'Gonzo'}) RETURN t")
+    cache.put("Which variant of 'Book of Ra' won on 2024-05-01", "MATCH (t:ABTest) RETURN t")
+
+    cypher, how, example = cache.get(question)
+
+    assert cypher is None and how == "hint"
+    assert example is not None and example[0] != question
+    assert cache.stats()["hints"] == 1 and cache.stats()["similar"] == 0